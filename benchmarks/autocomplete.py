@@ -0,0 +1,52 @@
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+# Lookup latency of the autocomplete index of the current PRG snapshot (python manage.py refresh_prg_snapshot).
+# Queries are prefixes of real unit names, 1 to 8 characters long, the way they arrive while typing.
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Autocomplete lookup latency over the current PRG snapshot')
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ruby.settings')
+    import django
+    django.setup()
+
+    from ruby_api import prg_snapshot
+    from ruby_api.autocomplete import get_autocomplete
+
+    started = time.perf_counter()
+    index = get_autocomplete()
+    if index is None:
+        print('No PRG snapshot; run python manage.py refresh_prg_snapshot first')
+        sys.exit(1)
+    print(f'opened {prg_snapshot.current_dir().name} in {(time.perf_counter() - started) * 1000:.1f} ms')
+
+    rng = random.Random(args.seed)
+    names = [unit['name'] for unit in prg_snapshot.read_units(prg_snapshot.current_dir())]
+    queries = []
+    for _ in range(args.queries):
+        name = rng.choice(names)
+        queries.append(name[:rng.randint(1, min(8, len(name)))])
+
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        index.search(query, limit=args.limit)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    timings.sort()
+    print(f'{len(queries)} queries  p50={statistics.median(timings):.3f} ms  '
+          f'p99={timings[int(len(timings) * 0.99) - 1]:.3f} ms  max={timings[-1]:.3f} ms')
+
+
+if __name__ == '__main__':
+    main()
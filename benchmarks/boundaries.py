@@ -0,0 +1,56 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+
+# Point-in-polygon lookup time of the local boundary index, per level, over the current PRG snapshot
+# (python manage.py refresh_prg_snapshot). Points are drawn uniformly from the extent of each level's
+# boundaries, so some fall outside every unit, as they do in real traffic near the border.
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Boundary index lookup time over the current PRG snapshot')
+    parser.add_argument('--points', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ruby.settings')
+    import django
+    django.setup()
+    import numpy as np
+    import shapely
+
+    from ruby_api.administrative import LEVELS
+    from ruby_api.boundaries import get_boundary_index
+
+    rng = np.random.default_rng(args.seed)
+    failures = 0
+    for level in LEVELS:
+        started = time.perf_counter()
+        index = get_boundary_index(level)
+        if index is None:
+            print(f'{level:12} no boundaries in the current snapshot (or it is stale)')
+            failures += 1
+            continue
+        opened = time.perf_counter() - started
+
+        xmin, ymin, xmax, ymax = shapely.total_bounds(index.geometries)
+        points = np.column_stack([rng.uniform(xmin, xmax, args.points), rng.uniform(ymin, ymax, args.points)])
+        timings = []
+        found = 0
+        for x, y in points:
+            started = time.perf_counter()
+            found += index.find(x, y) is not None
+            timings.append((time.perf_counter() - started) * 1e6)
+
+        timings.sort()
+        print(f'{level:12} {len(index):>6} units  opened in {opened:.2f} s  found {found}/{args.points}  '
+              f'p50={statistics.median(timings):.1f}us  p99={timings[int(len(timings) * 0.99) - 1]:.1f}us  '
+              f'{args.points / (sum(timings) / 1e6):,.0f} points/s')
+
+    sys.exit(1 if failures == len(LEVELS) else 0)
+
+
+if __name__ == '__main__':
+    main()
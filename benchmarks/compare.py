@@ -0,0 +1,45 @@
+import argparse
+import json
+
+METRICS = ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps')
+
+
+def load(path):
+    with open(path, encoding='utf-8') as handle:
+        return json.load(handle)
+
+
+def delta(before, after):
+    if before in (None, 0) or after is None:
+        return ''
+    return f'{(after - before) / before * 100:+.1f}%'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare two benchmark result files')
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    args = parser.parse_args()
+
+    baseline = load(args.baseline)
+    candidate = load(args.candidate)
+    print(f"{baseline.get('commit')} -> {candidate.get('commit')}")
+
+    for name, result in candidate['endpoints'].items():
+        previous = baseline['endpoints'].get(name)
+        if previous is None:
+            continue
+        # cold/warm phases for benchmarks.run, concurrency levels for benchmarks.load
+        for phase in result:
+            if phase not in previous:
+                continue
+            cells = []
+            for metric in METRICS:
+                before = previous[phase].get(metric)
+                after = result[phase].get(metric)
+                cells.append(f'{metric}={after} ({delta(before, after)})')
+            print(f'{name:20} {phase:5} ' + ' '.join(cells))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+
+# Boundary sizes and lookup latency per simplification tolerance of the geometry pyramid of the current PRG
+# snapshot (python manage.py refresh_prg_snapshot), per level. Tolerance 0 is the full-resolution boundary,
+# converted to WKT on request.
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Geometry pyramid sizes and lookup latency over the current PRG snapshot')
+    parser.add_argument('--units', type=int, default=200, help='Units per level (the first ones by TERYT)')
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ruby.settings')
+    import django
+    django.setup()
+
+    import shapely
+    from ruby_api import prg_snapshot
+    from ruby_api.administrative import HIERARCHY
+    from ruby_api.geometry_pyramid import get_pyramid
+
+    started = time.perf_counter()
+    pyramid = get_pyramid()
+    if pyramid is None:
+        print('No geometry pyramid; run python manage.py refresh_prg_snapshot (with boundaries) first')
+        sys.exit(1)
+    print(f'opened {prg_snapshot.current_dir().name} in {(time.perf_counter() - started) * 1000:.1f} ms')
+
+    keys = [bytes(key).decode().split(':', 1) for key in pyramid.keys]
+    for level in HIERARCHY:
+        teryts = [teryt for key_level, teryt in keys if key_level == level][:args.units]
+        if not teryts:
+            continue
+        print(f'{level} ({len(teryts)} units)')
+        for tolerance in [0] + pyramid.tolerances:
+            timings, sizes, vertices = [], [], []
+            for teryt in teryts:
+                started = time.perf_counter()
+                wkt = pyramid.wkt(level, teryt, tolerance)
+                timings.append((time.perf_counter() - started) * 1000)
+                sizes.append(len(wkt))
+                vertices.append(shapely.get_num_coordinates(shapely.from_wkt(wkt)))
+            print(f'  tolerance {tolerance:>6g} m  mean {statistics.mean(sizes) / 1024:9.1f} KiB  '
+                  f'{statistics.mean(vertices):9.0f} vertices  p50={statistics.median(timings):.3f} ms  '
+                  f'max={max(timings):.3f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+import argparse
+import math
+import os
+import time
+
+from benchmarks.stats import summarize
+
+WARM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'hit-path'}}
+PARCEL_ID = '120614_2.0001.123/1'
+
+# Cache hit latency of /api/search-parcel/ with a large parcel payload primed directly into the cache,
+# served from the cached dict (DRF content negotiation + JSON rendering) vs the pre-rendered body.
+
+
+def parcel_payload(vertices, attributes):
+    ring = [(566000 + 50 * math.cos(2 * math.pi * i / vertices), 244000 + 50 * math.sin(2 * math.pi * i / vertices))
+            for i in range(vertices)]
+    ring.append(ring[0])
+    return {
+        'parcel_id': PARCEL_ID,
+        'service': {'id': 'PL.PZGiK.1', 'organization': 'Starosta Powiatu Krakowskiego', 'teryt': '1206',
+                    'url': 'https://wms.powiat.krakow.pl:1518/iip/ows'},
+        'layer_name': 'ms:dzialki',
+        'attributes': {f'ATRYBUT_{i}': f'wartość {i}' for i in range(attributes)},
+        'geometry': 'POLYGON((' + ','.join(f'{x:.2f} {y:.2f}' for x, y in ring) + '))',
+    }
+
+
+def prime(payload):
+    from django.test import RequestFactory
+    from rest_framework.request import Request
+
+    from ruby_api.http_cache import cache_response
+
+    cache_response(Request(RequestFactory().get('/')), f'parcel_{PARCEL_ID}', payload, 3600)
+
+
+def measure(requests_count, headers):
+    from django.test import Client
+
+    client = Client()
+    latencies = []
+    sizes = set()
+    started = time.perf_counter()
+    for _ in range(requests_count):
+        call_started = time.perf_counter()
+        response = client.get('/api/search-parcel/', {'parcel_id': PARCEL_ID}, headers=headers)
+        latencies.append(time.perf_counter() - call_started)
+        sizes.add(len(response.content))
+    summary = summarize(latencies, time.perf_counter() - started, [response.status_code])
+    summary['body_bytes'] = sorted(sizes)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cache hit latency: DRF rendering vs pre-rendered response bodies')
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--vertices', type=int, default=5000, help='Vertices in the parcel WKT polygon')
+    parser.add_argument('--attributes', type=int, default=40)
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ruby.settings')
+    import django
+    django.setup()
+    from django.core.cache import cache
+    from django.test import override_settings
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    payload = parcel_payload(args.vertices, args.attributes)
+
+    cases = {
+        'rendered per hit': ({'CACHE_RENDERED_RESPONSES': False}, {}),
+        'pre-rendered': ({'CACHE_RENDERED_RESPONSES': True}, {}),
+        'pre-rendered gzip': ({'CACHE_RENDERED_RESPONSES': True}, {'Accept-Encoding': 'gzip'}),
+    }
+
+    with override_settings(CACHES=WARM_CACHE):
+        for name, (overrides, headers) in cases.items():
+            with override_settings(**overrides):
+                cache.clear()
+                with override_settings(CACHE_RENDERED_RESPONSES=True):
+                    prime(payload)
+                result = measure(args.requests, headers)
+            print(f"{name:18} p50={result['p50_ms']}ms p95={result['p95_ms']}ms p99={result['p99_ms']}ms "
+                  f"{result['throughput_rps']} req/s body={result['body_bytes']} B")
+
+
+if __name__ == '__main__':
+    main()
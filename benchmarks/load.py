@@ -0,0 +1,107 @@
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+from benchmarks.run import ENDPOINTS, RESULTS_DIR, git_commit
+from benchmarks.stats import summarize
+
+# HTTP load test against a running server, e.g. the API under gunicorn pointed at the stub upstream:
+#
+#   python -m benchmarks.stub_server --latency-ms 200 &
+#   GUGIK_FEATURE_INFO_URL=... PRG_WMS_URL=... gunicorn ruby.asgi:application -c gunicorn.conf.py
+#   python -m benchmarks.load --base-url http://127.0.0.1:8000 --label asgi
+#
+# Run it once per deployment mode (ruby.wsgi with sync workers vs ruby.asgi with uvicorn workers) and
+# compare the result files with benchmarks.compare.
+
+
+async def run_level(client, base_url, path, params, requests_count, concurrency, no_cache):
+    queue = asyncio.Queue()
+    for index in range(requests_count):
+        queue.put_nowait(index)
+    latencies = []
+    statuses = []
+
+    async def worker():
+        while True:
+            try:
+                index = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            query = dict(params)
+            if no_cache:
+                # Nudge the coordinate so every request misses the response cache and goes upstream
+                if 'x' in query:
+                    query['x'] = f"{float(query['x']) + index * 0.001:.3f}"
+            started = time.perf_counter()
+            try:
+                response = await client.get(base_url + path, params=query)
+                statuses.append(response.status_code)
+            except httpx.HTTPError as e:
+                statuses.append(type(e).__name__)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - started, statuses)
+
+
+async def run(args):
+    report = {
+        'commit': git_commit(),
+        'label': args.label,
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'config': {
+            'base_url': args.base_url,
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'no_cache': args.no_cache,
+        },
+        'endpoints': {},
+    }
+
+    limits = httpx.Limits(max_connections=max(args.concurrency))
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        for name in args.endpoints:
+            path, params = ENDPOINTS[name]
+            levels = {}
+            for concurrency in args.concurrency:
+                result = await run_level(client, args.base_url, path, params, args.requests, concurrency,
+                                         args.no_cache)
+                levels[str(concurrency)] = result
+                print(f"{name:20} c={concurrency:<4} p50={result['p50_ms']}ms p95={result['p95_ms']}ms "
+                      f"p99={result['p99_ms']}ms {result['throughput_rps']} req/s {result['statuses']}")
+            report['endpoints'][name] = levels
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent HTTP load test of a running Ruby API')
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+    parser.add_argument('--endpoints', nargs='*', choices=sorted(ENDPOINTS), default=sorted(ENDPOINTS))
+    parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint and concurrency level')
+    parser.add_argument('--concurrency', type=int, nargs='*', default=[1, 4, 16, 64])
+    parser.add_argument('--no-cache', action='store_true', help='Vary coordinates so XY requests miss the cache')
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--label', default='', help='Deployment mode, e.g. wsgi or asgi')
+    parser.add_argument('--output', help='Result file (default: benchmarks/results/load-<timestamp>-<commit>.json)')
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+
+    output = Path(args.output) if args.output else RESULTS_DIR / (
+        f"load-{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')}-{report['commit']}"
+        f"{'-' + args.label if args.label else ''}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    print(f'Results written to {output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+import argparse
+import timeit
+
+from ruby_api.tests.parser_references import cases
+
+# Parsing time of the recorded fixtures: the xml.etree references the views used before ruby_api.parsers vs
+# the lxml parsers the views use now
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Microbenchmark of the XML/GML parsers against the xml.etree reference')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--number', type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'case':55} {'etree us':>10} {'lxml us':>10} {'speedup':>8}")
+    for name, content, args_, legacy, current in cases():
+        if name.startswith('malformed'):
+            continue
+        legacy_time = min(timeit.repeat(lambda: legacy(content, *args_), repeat=args.repeat, number=args.number))
+        current_time = min(timeit.repeat(lambda: current(content, *args_), repeat=args.repeat, number=args.number))
+        legacy_us = legacy_time / args.number * 1e6
+        current_us = current_time / args.number * 1e6
+        print(f'{name:55} {legacy_us:10.1f} {current_us:10.1f} {legacy_us / current_us:7.2f}x')
+
+
+if __name__ == '__main__':
+    main()
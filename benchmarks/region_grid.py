@@ -0,0 +1,63 @@
+import argparse
+import os
+import sys
+import time
+
+# Points per second of the region lookups over the current PRG snapshot: exact STRtree tests vs the
+# region grid (ruby_api.region_grid), one point at a time and vectorized. Also checks that the grid
+# resolves every point to the same obręb as the exact test.
+
+
+def rate(count, func):
+    started = time.perf_counter()
+    result = func()
+    return count / (time.perf_counter() - started), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Region grid vs STRtree lookups over the current PRG snapshot')
+    parser.add_argument('--points', type=int, default=1000000, help='Points for the vectorized lookups')
+    parser.add_argument('--single', type=int, default=20000, help='Points for the one-at-a-time lookups')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ruby.settings')
+    import django
+    django.setup()
+    import numpy as np
+    import shapely
+
+    from ruby_api.boundaries import get_region_grid
+
+    grid = get_region_grid()
+    if grid is None:
+        print('No region grid in the current PRG snapshot (needs boundaries and PRG_GRID_RESOLUTION > 0)')
+        sys.exit(1)
+
+    cells = grid.cells
+    boundary_share = (cells == grid.boundary).sum() / max((cells != 0).sum(), 1)
+    print(f'grid {cells.shape[1]} x {cells.shape[0]} cells of {grid.resolution:g} m, {cells.nbytes / 2 ** 20:.0f} MiB, '
+          f'{boundary_share:.1%} of covered cells on a boundary, {len(grid.regions)} obręby')
+
+    rng = np.random.default_rng(args.seed)
+    xmin, ymin, xmax, ymax = shapely.total_bounds(grid.regions.geometries)
+    xs, ys = rng.uniform(xmin, xmax, args.points), rng.uniform(ymin, ymax, args.points)
+
+    single = range(args.single)
+    exact_rate, exact = rate(args.single, lambda: [grid.regions.find_position(xs[i], ys[i]) for i in single])
+    grid_rate, located = rate(args.single, lambda: [grid.locate(xs[i], ys[i]) for i in single])
+    print(f'one at a time   STRtree {exact_rate:12,.0f} points/s   grid {grid_rate:12,.0f} points/s')
+
+    bulk = min(args.points, 200000)
+    exact_rate, exact_many = rate(bulk, lambda: grid.regions.find_positions(xs[:bulk], ys[:bulk]))
+    grid_rate, located_many = rate(args.points, lambda: grid.locate_many(xs, ys))
+    print(f'vectorized      STRtree {exact_rate:12,.0f} points/s   grid {grid_rate:12,.0f} points/s')
+
+    mismatches = sum((a if a is not None else -1) != (b if b is not None else -1) for a, b in zip(exact, located))
+    mismatches += int((exact_many != located_many[:bulk]).sum())
+    print(f'{mismatches} points resolved differently')
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+import argparse
+import datetime
+import decimal
+import json
+import os
+import sys
+import timeit
+
+from benchmarks.hit_path import parcel_payload
+from benchmarks.stub_server import FIXTURES_DIR
+
+# Rendering cost of the API's real payloads: DRF's stdlib-json JSONRenderer vs ruby_api.renderers.ORJSONRenderer.
+# Payloads are built the way the views build them, from the recorded upstream fixtures.
+
+
+def read(relative):
+    return (FIXTURES_DIR / relative).read_bytes()
+
+
+def county_attributes():
+    from PyQt5.QtCore import QDate, QDateTime
+
+    from ruby_api.tests.parser_references import first_wfs_feature
+
+    attributes = first_wfs_feature(read('county/dzialki.xml'), 'dzialki') or {}
+    # Types qvariant_to_python hands over for date, numeric and binary columns of county layers
+    attributes.update({
+        'DATA_UTWORZENIA': QDate(2019, 3, 14),
+        'DATA_MODYFIKACJI': QDateTime(2024, 5, 14, 10, 0, 0),
+        'DATA_POMIARU': datetime.date(2018, 6, 1),
+        'POLE_EWIDENCYJNE': decimal.Decimal('0.1234'),
+        'KW': b'KR1P/00012345/6',
+    })
+    return attributes
+
+
+def payloads(vertices):
+    from ruby_api.tests.parser_references import gml_attributes, gugik_features, wfs_features
+
+    parcel = parcel_payload(vertices, 0)
+    parcel['attributes'] = county_attributes()
+    commune = gml_attributes(read('prg_wms/A03_Granice_gmin.xml'))
+    return {
+        'parcel_by_id': parcel,
+        'parcel_by_xy_features': {
+            'coordinates': {'x': 566010.0, 'y': 244020.0, 'epsg': '2180'},
+            'features': gugik_features(read('gugik/dzialki_budynki.xml')),
+            'source': 'KrajowaIntegracjaEwidencjiGruntow',
+        },
+        'commune_by_xy': {
+            'coordinates': {'x': 566010.0, 'y': 244020.0, 'epsg': '2180'},
+            'commune': {'name': commune.get('JPT_NAZWA_', ''), 'teryt': commune.get('JPT_KOD_JE', ''),
+                        'type': commune.get('JPT_SJR_KO', ''), 'regon': commune.get('REGON', '')},
+            'source': 'PRG',
+        },
+        'region_search': {
+            'query': 'Buk',
+            'regions': [{'name': data.get('JPT_NAZWA_', ''), 'teryt': data.get('JPT_KOD_JE', ''),
+                         'regon': data.get('REGON', '')}
+                        for data in wfs_features(read('prg_wfs/A06_Granice_obrebow_ewidencyjnych.xml'),
+                                                 'A06_Granice_obrebow_ewidencyjnych')],
+            'source': 'PRG',
+        },
+    }
+
+
+def as_stdlib(data):
+    # DRF's JSONRenderer cannot encode Qt values at all; give it the plain equivalents so the timings compare
+    from ruby_api.renderers import default
+
+    if isinstance(data, dict):
+        return {key: as_stdlib(value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [as_stdlib(value) for value in data]
+    if type(data).__module__.startswith('PyQt5'):
+        return default(data)
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSON rendering time of API payloads: DRF JSONRenderer vs orjson')
+    parser.add_argument('--number', type=int, default=200, help='Renders per timing run')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--vertices', type=int, default=5000, help='Vertices in the parcel WKT polygon')
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ruby.settings')
+    import django
+    django.setup()
+    from rest_framework.renderers import JSONRenderer
+
+    from ruby_api.renderers import ORJSONRenderer
+
+    drf = JSONRenderer()
+    fast = ORJSONRenderer()
+    failures = 0
+
+    for name, payload in payloads(args.vertices).items():
+        plain = as_stdlib(payload)
+        reference = drf.render(plain, 'application/json', {})
+        rendered = fast.render(payload, 'application/json', {})
+        if json.loads(reference) != json.loads(rendered):
+            failures += 1
+            print(f'{name}: output differs from JSONRenderer')
+
+        before = min(timeit.repeat(lambda: drf.render(plain, 'application/json', {}),
+                                   number=args.number, repeat=args.repeat)) / args.number
+        after = min(timeit.repeat(lambda: fast.render(payload, 'application/json', {}),
+                                  number=args.number, repeat=args.repeat)) / args.number
+        print(f'{name:22} {len(rendered):>8} B  json={before * 1e6:9.1f}us  orjson={after * 1e6:9.1f}us  '
+              f'x{before / after:.1f}')
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+import argparse
+import json
+import os
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+
+ENDPOINTS = {
+    'parcel_by_xy': ('/api/search-parcel-xy/', {'x': '566010.0', 'y': '244020.0', 'epsg': '2180'}),
+    'parcel_by_id': ('/api/search-parcel/', {'parcel_id': '120614_2.0001.123/1'}),
+    'building_by_xy': ('/api/search-building-xy/', {'x': '566012.0', 'y': '244018.0', 'epsg': '2180'}),
+    'building_by_id': ('/api/search-building/', {'building_id': '120614_2.0001.123/1.1_BUD'}),
+    'region_by_xy': ('/api/region-xy/', {'x': '566010.0', 'y': '244020.0', 'epsg': '2180'}),
+    'commune_by_xy': ('/api/commune-xy/', {'x': '566010.0', 'y': '244020.0', 'epsg': '2180'}),
+    'county_by_xy': ('/api/county-xy/', {'x': '566010.0', 'y': '244020.0', 'epsg': '2180'}),
+    'voivodeship_by_xy': ('/api/voivodeship-xy/', {'x': '566010.0', 'y': '244020.0', 'epsg': '2180'}),
+    'point_by_xy': ('/api/point-xy/', {'x': '566010.0', 'y': '244020.0', 'epsg': '2180'}),
+    'region_by_id': ('/api/region/', {'region_id': '120614_2.0001'}),
+    'region_search': ('/api/region-search/', {'query': 'Buk'}),
+    'commune_by_id': ('/api/commune/', {'commune_id': '120614_2'}),
+    'county_by_id': ('/api/county/', {'county_id': '1206'}),
+    'voivodeship_by_id': ('/api/voivodeship/', {'voivodeship_id': '12'}),
+}
+
+COLD_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+WARM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmarks'}}
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run_phase(path, params, requests_count, concurrency):
+    from django.test import Client
+
+    local = threading.local()
+
+    def call(_):
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = Client()
+        started = time.perf_counter()
+        response = client.get(path, params)
+        return time.perf_counter() - started, response.status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(call, range(requests_count)))
+    elapsed = time.perf_counter() - started
+
+    from benchmarks.stats import summarize
+    return summarize([latency for latency, _ in results], elapsed, [status for _, status in results])
+
+
+def run_endpoint(path, params, requests_count, concurrency):
+    from django.core.cache import cache
+    from django.test import Client, override_settings
+
+    with override_settings(CACHES=COLD_CACHE):
+        cold = run_phase(path, params, requests_count, concurrency)
+
+    with override_settings(CACHES=WARM_CACHE):
+        cache.clear()
+        Client().get(path, params)
+        warm = run_phase(path, params, requests_count, concurrency)
+
+    return {'cold': cold, 'warm': warm}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline benchmark of the Ruby API against a local upstream stand-in')
+    parser.add_argument('--endpoints', nargs='*', choices=sorted(ENDPOINTS), default=sorted(ENDPOINTS))
+    parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint and cache phase')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--latency-ms', type=float, default=50.0, help='Simulated upstream latency')
+    parser.add_argument('--jitter-ms', type=float, default=10.0)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of upstream calls that fail')
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='Result file (default: benchmarks/results/<timestamp>-<commit>.json)')
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ruby.settings')
+    import django
+    django.setup()
+    from django.test import override_settings
+    from django.test.utils import setup_test_environment
+
+    from benchmarks.stub_server import StubConfig, StubServer
+
+    setup_test_environment()
+
+    config = StubConfig(args.latency_ms, args.jitter_ms, args.error_rate, args.error_status, args.seed)
+    report = {
+        'commit': git_commit(),
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'config': {
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'latency_ms': args.latency_ms,
+            'jitter_ms': args.jitter_ms,
+            'error_rate': args.error_rate,
+        },
+        'endpoints': {},
+    }
+
+    with StubServer(config=config) as server, override_settings(**server.upstream_settings()):
+        for name in args.endpoints:
+            path, params = ENDPOINTS[name]
+            result = run_endpoint(path, params, args.requests, args.concurrency)
+            report['endpoints'][name] = result
+            print(f"{name:20} cold p50={result['cold']['p50_ms']}ms p95={result['cold']['p95_ms']}ms "
+                  f"p99={result['cold']['p99_ms']}ms {result['cold']['throughput_rps']} req/s | "
+                  f"warm p50={result['warm']['p50_ms']}ms p95={result['warm']['p95_ms']}ms "
+                  f"p99={result['warm']['p99_ms']}ms {result['warm']['throughput_rps']} req/s")
+        report['upstream_hits'] = dict(config.hits)
+
+    output = Path(args.output) if args.output else RESULTS_DIR / (
+        f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')}-{report['commit']}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    print(f'Results written to {output}')
+
+
+if __name__ == '__main__':
+    main()
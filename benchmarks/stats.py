@@ -0,0 +1,30 @@
+import math
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    rank = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[rank]
+
+
+def summarize(latencies, elapsed, statuses=None):
+    ordered = sorted(latencies)
+    summary = {
+        'requests': len(ordered),
+        'throughput_rps': round(len(ordered) / elapsed, 2) if elapsed else None,
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 3) if ordered else None,
+        'p50_ms': _ms(percentile(ordered, 0.50)),
+        'p95_ms': _ms(percentile(ordered, 0.95)),
+        'p99_ms': _ms(percentile(ordered, 0.99)),
+    }
+    if statuses is not None:
+        counts = {}
+        for status in statuses:
+            counts[str(status)] = counts.get(str(status), 0) + 1
+        summary['statuses'] = counts
+    return summary
+
+
+def _ms(value):
+    return None if value is None else round(value * 1000, 3)
@@ -0,0 +1,61 @@
+import argparse
+import resource
+import time
+
+from benchmarks.stub_server import FIXTURES_DIR
+from ruby_api import parsers
+from ruby_api.tests.parser_references import legacy_parse_wfs_multi_response
+
+CHUNK_SIZE = 64 * 1024
+
+
+def synthetic_collection(layer_name, copies):
+    # Repeats the members of a recorded PRG WFS response to emulate a large multi-feature query
+    body = (FIXTURES_DIR / 'prg_wfs' / f'{layer_name}.xml').read_bytes()
+    head, rest = body.split(b'<wfs:member>', 1)
+    members, tail = rest.rsplit(b'</wfs:member>', 1)
+    member = b'<wfs:member>' + members + b'</wfs:member>'
+    return head + member * copies + tail
+
+
+def chunked(body):
+    for offset in range(0, len(body), CHUNK_SIZE):
+        yield body[offset:offset + CHUNK_SIZE]
+
+
+def max_rss():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def measure(function):
+    # libxml2 allocations are invisible to tracemalloc, so growth of the peak RSS is measured instead.
+    # Peak RSS never decreases: run the cheaper variant first.
+    before = max_rss()
+    started = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - started
+    return result, elapsed, max_rss() - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Peak memory of buffered vs streamed WFS parsing')
+    parser.add_argument('--layer', default='A01_Granice_wojewodztw')
+    parser.add_argument('--copies', type=int, default=200)
+    args = parser.parse_args()
+
+    body = synthetic_collection(args.layer, args.copies)
+    print(f'{args.layer} x{args.copies}: {len(body) / 1024 / 1024:.1f} MiB body')
+
+    streamed, streamed_time, streamed_growth = measure(
+        lambda: [data for data in parsers.iter_wfs_features(chunked(body), args.layer) if data])
+    # The whole body parsed at once, as the views did before streaming
+    buffered, buffered_time, buffered_growth = measure(
+        lambda: legacy_parse_wfs_multi_response(b''.join(chunked(body)), args.layer))
+
+    assert buffered == streamed
+    print(f'streamed: {streamed_time * 1000:8.1f} ms, peak RSS growth {streamed_growth / 1024 / 1024:7.1f} MiB')
+    print(f'buffered: {buffered_time * 1000:8.1f} ms, peak RSS growth {buffered_growth / 1024 / 1024:7.1f} MiB')
+
+
+if __name__ == '__main__':
+    main()
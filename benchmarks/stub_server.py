@@ -0,0 +1,227 @@
+import argparse
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+
+from lxml import etree
+
+FIXTURES_DIR = Path(__file__).resolve().parent / 'fixtures'
+
+
+class StubConfig:
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, error_status=503, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.hits = {}
+
+    def delay(self):
+        if not self.latency_ms and not self.jitter_ms:
+            return 0.0
+        with self.lock:
+            jitter = self.random.uniform(-self.jitter_ms, self.jitter_ms)
+        return max(0.0, self.latency_ms + jitter) / 1000
+
+    def should_fail(self):
+        if not self.error_rate:
+            return False
+        with self.lock:
+            return self.random.random() < self.error_rate
+
+    def count(self, route):
+        with self.lock:
+            self.hits[route] = self.hits.get(route, 0) + 1
+
+
+def _fixture(*parts):
+    return (FIXTURES_DIR.joinpath(*parts)).read_bytes()
+
+
+def _layer_name(value):
+    return value.split(':')[-1]
+
+
+def gugik_response(params, base_url):
+    layers = params.get('QUERY_LAYERS', params.get('LAYERS', ''))
+    if layers == 'budynki':
+        return 'text/xml', _fixture('gugik', 'budynki.xml')
+    return 'text/xml', _fixture('gugik', 'dzialki_budynki.xml')
+
+
+def prg_wms_response(params, base_url):
+    layers = params.get('QUERY_LAYERS', params.get('LAYERS', '')).split(',')
+    if len(layers) == 1:
+        return 'application/vnd.ogc.gml', _fixture('prg_wms', f'{layers[0]}.xml')
+    # Several query layers: one <LAYER_layer> element per layer that has a fixture, as MapServer does
+    output = etree.Element('msGMLOutput')
+    for layer in layers:
+        path = FIXTURES_DIR / 'prg_wms' / f'{layer}.xml'
+        if not path.exists():
+            continue
+        output.extend(etree.fromstring(path.read_bytes()))
+    return 'application/vnd.ogc.gml', etree.tostring(output, xml_declaration=True, encoding='UTF-8')
+
+
+def prg_wfs_response(params, base_url):
+    layer = _layer_name(params.get('TYPENAME', params.get('TYPENAMES', '')))
+    body = _fixture('prg_wfs', f'{layer}.xml')
+    if 'STARTINDEX' in params or 'COUNT' in params:
+        body = _page(body, int(params.get('STARTINDEX', 0)), int(params.get('COUNT', 0)) or None)
+    return 'text/xml; subtype=gml/3.2.1', body
+
+
+def _page(body, start, count):
+    # WFS 2.0 paging over the recorded features (the filter itself is not evaluated)
+    root = etree.fromstring(body)
+    members = root.findall('{http://www.opengis.net/wfs/2.0}member')
+    end = start + count if count else len(members)
+    for index, member in enumerate(members):
+        if not start <= index < end:
+            root.remove(member)
+    root.set('numberReturned', str(len(members[start:end])))
+    return etree.tostring(root, xml_declaration=True, encoding='UTF-8')
+
+
+def county_wfs_response(params, base_url):
+    request = params.get('REQUEST', '').lower()
+    if request == 'getcapabilities':
+        body = _fixture('county', 'capabilities.xml').replace(b'{base_url}', base_url.encode())
+        return 'text/xml', body
+    if request == 'describefeaturetype':
+        return 'text/xml', _fixture('county', 'schema.xsd')
+    if params.get('RESULTTYPE', '').lower() == 'hits':
+        return 'text/xml', _fixture('county', 'hits.xml')
+    layer = _layer_name(params.get('TYPENAME', params.get('TYPENAMES', '')))
+    return 'text/xml; subtype=gml/3.2.1', _fixture('county', f'{layer}.xml')
+
+
+ROUTES = {
+    '/gugik': gugik_response,
+    '/prg/wms': prg_wms_response,
+    '/prg/wfs': prg_wfs_response,
+    '/county/wfs': county_wfs_response,
+}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        handler = ROUTES.get(parsed.path)
+        if handler is None:
+            self._send(404, 'text/plain', b'unknown route')
+            return
+
+        config = self.server.config
+        config.count(parsed.path)
+
+        delay = config.delay()
+        if delay:
+            time.sleep(delay)
+
+        if config.should_fail():
+            self._send(config.error_status, 'text/plain', b'injected failure')
+            return
+
+        params = {key.upper(): values[-1] for key, values in parse_qs(parsed.query).items()}
+        base_url = f'http://{self.server.server_address[0]}:{self.server.server_address[1]}{parsed.path}'
+        try:
+            content_type, body = handler(params, base_url)
+        except FileNotFoundError:
+            self._send(404, 'text/plain', b'no recorded response')
+            return
+        self._send(200, content_type, body)
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients that stop reading early (streamed parsing, size limits) reset the connection
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class StubServer:
+    def __init__(self, host='127.0.0.1', port=0, config=None):
+        self.httpd = StubHTTPServer((host, port), StubHandler)
+        self.httpd.config = config or StubConfig()
+        self.thread = None
+
+    @property
+    def config(self):
+        return self.httpd.config
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def upstream_settings(self):
+        return {
+            'GUGIK_FEATURE_INFO_URL': f'{self.base_url}/gugik',
+            'PRG_WMS_URL': f'{self.base_url}/prg/wms',
+            'PRG_WFS_URL': f'{self.base_url}/prg/wfs',
+            'COUNTY_WFS_URL': f'{self.base_url}/county/wfs',
+            # The recorded GML lists easting first despite its urn:ogc:def:crs:EPSG::2180 srsName
+            'PRG_WFS_SWAP_COORDINATES': 'NO',
+        }
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for GUGiK, PRG and county WFS services')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--error-status', type=int, default=503)
+    args = parser.parse_args()
+
+    config = StubConfig(args.latency_ms, args.jitter_ms, args.error_rate, args.error_status)
+    server = StubServer(args.host, args.port, config)
+    for name, value in server.upstream_settings().items():
+        print(f'{name}={value}')
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,10 @@
+import os
+
+# The API is served over ASGI: upstream-bound views are async and wait on GUGiK/PRG without
+# holding a worker thread. Each uvicorn worker runs one event loop.
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', '4'))
+worker_class = 'uvicorn_worker.UvicornWorker'
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+graceful_timeout = 30
+keepalive = 5
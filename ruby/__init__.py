@@ -1,6 +1,3 @@
 from .celery import app as celery_app
-from .qgis_manager import QGISManager
 
 __all__ = ('celery_app',)
-
-QGISManager()
\ No newline at end of file
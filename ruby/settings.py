@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 import os
 from pathlib import Path
 
+from celery.schedules import crontab
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -54,6 +55,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'ruby_api.middleware.ServerTimingMiddleware',
 ]
 
 ROOT_URLCONF = 'ruby.urls'
@@ -143,6 +145,23 @@ REDIS_URL = os.getenv('REDIS_URL', 'redis://redis:6379/0')
 
 CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', REDIS_URL)
 CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', REDIS_URL)
+CELERY_BEAT_SCHEDULE = {
+    # Full PRG download (boundaries included) into a new snapshot version, weekly
+    'refresh-prg-snapshot': {
+        'task': 'ruby_api.tasks.refresh_prg_snapshot',
+        'schedule': crontab(hour=2, minute=30, day_of_week='sunday'),
+    },
+    # Voivodeships, counties and communes only, attributes only: a few requests
+    'refresh-teryt-dictionary': {
+        'task': 'ruby_api.tasks.refresh_teryt_dictionary',
+        'schedule': crontab(hour=2, minute=0),
+    },
+    # Refills every administrative by-ID cache entry well before ADMINISTRATIVE_CACHE_TIMEOUT runs out
+    'warm-administrative-cache': {
+        'task': 'ruby_api.tasks.warm_administrative_cache',
+        'schedule': crontab(hour=3, minute=15, day_of_week='sunday'),
+    },
+}
 
 CACHES = {
     'default': {
@@ -151,8 +170,108 @@ CACHES = {
     }
 }
 
+# PRG boundaries change about once a year, so administrative responses are cached (and advertised to
+# clients through Cache-Control max-age) for much longer than parcel/building data
+ADMINISTRATIVE_CACHE_TIMEOUT = int(os.getenv('ADMINISTRATIVE_CACHE_TIMEOUT', str(30 * 24 * 3600)))
+# Features per PRG WFS request when warming the administrative caches (manage.py warm_admin_cache)
+ADMINISTRATIVE_WARMUP_PAGE_SIZE = int(os.getenv('ADMINISTRATIVE_WARMUP_PAGE_SIZE', '1000'))
+
+# Parsed GUGiK GetFeatureInfo results (parcels and buildings at a point), shared by the parcel and building
+# XY endpoints
+GUGIK_FEATURE_INFO_CACHE_TIMEOUT = int(os.getenv('GUGIK_FEATURE_INFO_CACHE_TIMEOUT', '1800'))
+
+# Parcels and buildings fetched from the county WFS services, and parcel/building lookups answered from
+# GetFeatureInfo alone (no geometry)
+ENTITY_CACHE_TIMEOUT = int(os.getenv('ENTITY_CACHE_TIMEOUT', '3600'))
+FEATURES_CACHE_TIMEOUT = int(os.getenv('FEATURES_CACHE_TIMEOUT', '1800'))
+
+# Base cache lifetime per kind of entry (ruby_api.ttl); overridable per TERYT prefix at runtime with
+# manage.py cache_ttl, and extended per key while refreshes keep returning the same content
+CACHE_TTLS = {
+    'parcel': ENTITY_CACHE_TIMEOUT,
+    'building': ENTITY_CACHE_TIMEOUT,
+    'features': FEATURES_CACHE_TIMEOUT,
+    'feature_info': GUGIK_FEATURE_INFO_CACHE_TIMEOUT,
+    'administrative': ADMINISTRATIVE_CACHE_TIMEOUT,
+}
+# Factor applied to a key's TTL each time a refresh finds its content unchanged
+CACHE_TTL_GROWTH = float(os.getenv('CACHE_TTL_GROWTH', '2'))
+# A learned TTL stays below this multiple of the base TTL, and below CACHE_TTL_CEILING seconds
+CACHE_TTL_MAX_FACTOR = float(os.getenv('CACHE_TTL_MAX_FACTOR', '24'))
+CACHE_TTL_CEILING = int(os.getenv('CACHE_TTL_CEILING', str(90 * 24 * 3600)))
+# Seconds between checks of a worker for TTL overrides set with manage.py cache_ttl
+CACHE_TTL_POLICY_CHECK_INTERVAL = float(os.getenv('CACHE_TTL_POLICY_CHECK_INTERVAL', '30'))
+# Seconds between checks of a worker for parcel/building cache invalidations of a TERYT unit
+# (manage.py invalidate_cache, POST /api/cache/invalidate/)
+CACHE_NAMESPACE_CHECK_INTERVAL = float(os.getenv('CACHE_NAMESPACE_CHECK_INTERVAL', '5'))
+
+# Cache the rendered JSON body (plain and gzip) next to each payload and serve hits from those bytes
+CACHE_RENDERED_RESPONSES = os.getenv('CACHE_RENDERED_RESPONSES', 'True') == 'True'
+
+# Local PRG snapshot (administrative unit names, codes, ...) used to answer requests without PRG round trips
+PRG_SNAPSHOT_DIR = os.getenv('PRG_SNAPSHOT_DIR', str(BASE_DIR / 'var' / 'prg'))
+# Seconds between checks whether a worker's loaded snapshot is still the current one
+PRG_SNAPSHOT_CHECK_INTERVAL = float(os.getenv('PRG_SNAPSHOT_CHECK_INTERVAL', '60'))
+# Published snapshot versions kept on disk
+PRG_SNAPSHOT_KEEP = int(os.getenv('PRG_SNAPSHOT_KEEP', '3'))
+# Older snapshots are not used for XY lookups; the endpoints go back to PRG WMS (seconds, default 90 days)
+PRG_SNAPSHOT_MAX_AGE = int(os.getenv('PRG_SNAPSHOT_MAX_AGE', str(60 * 60 * 24 * 90)))
+# Cell size in metres of the region lookup grid built with every snapshot; 0 disables it
+PRG_GRID_RESOLUTION = float(os.getenv('PRG_GRID_RESOLUTION', '100'))
+# Simplification tolerances (metres) of the boundaries served with ?include=geometry, built with every snapshot
+PRG_PYRAMID_TOLERANCES = [float(value) for value in os.getenv('PRG_PYRAMID_TOLERANCES', '2,10,50,250,1000').split(',') if value]
+# GDAL's handling of the GML axis order of PRG WFS pages: AUTO follows the srsName, YES/NO force it
+PRG_WFS_SWAP_COORDINATES = os.getenv('PRG_WFS_SWAP_COORDINATES', 'AUTO')
+
+# Upstream government services. Overridable so the API can be pointed at a local stand-in (see benchmarks/)
+GUGIK_FEATURE_INFO_URL = os.getenv(
+    'GUGIK_FEATURE_INFO_URL', 'https://integracja.gugik.gov.pl/cgi-bin/KrajowaIntegracjaEwidencjiGruntow'
+)
+PRG_WMS_URL = os.getenv('PRG_WMS_URL', 'https://mapy.geoportal.gov.pl/wss/service/PZGIK/PRG/WMS/AdministrativeBoundaries')
+PRG_WFS_URL = os.getenv('PRG_WFS_URL', 'https://mapy.geoportal.gov.pl/wss/service/PZGIK/PRG/WFS/AdministrativeBoundaries')
+# When set, replaces every county EGiB WFS url from data.wfs_data
+COUNTY_WFS_URL = os.getenv('COUNTY_WFS_URL', '')
+
+# Upstream client mode: 'live' (default), 'record' (live + archive every raw response),
+# 'replay' (serve only from the archive) or 'seed' (archive first, live + record on a miss)
+UPSTREAM_MODE = os.getenv('UPSTREAM_MODE', 'live')
+UPSTREAM_ARCHIVE_DIR = os.getenv('UPSTREAM_ARCHIVE_DIR', str(BASE_DIR / 'var' / 'upstream'))
+
+# Upstream bodies larger than this are rejected while streaming instead of being buffered
+UPSTREAM_MAX_RESPONSE_BYTES = int(os.getenv('UPSTREAM_MAX_RESPONSE_BYTES', str(64 * 1024 * 1024)))
+
+# Connection pool size of the shared async upstream client (one per event loop, used by the async views)
+UPSTREAM_ASYNC_MAX_CONNECTIONS = int(os.getenv('UPSTREAM_ASYNC_MAX_CONNECTIONS', '100'))
+# Threads per worker process that run blocking QGIS WFS lookups for the async views
+QGIS_EXECUTOR_WORKERS = int(os.getenv('QGIS_EXECUTOR_WORKERS', '4'))
+
+# Per-upstream-host concurrency limits ("bulkheads"), shared by all workers through Redis.
+# BULKHEAD_BACKEND: 'redis', 'local' (per process) or 'off'.
+# BULKHEAD_LIMITS: comma-separated host=limit pairs, e.g. "wms.powiat.krakow.pl=4,integracja.gugik.gov.pl=32"
+BULKHEAD_BACKEND = os.getenv('BULKHEAD_BACKEND', 'redis')
+BULKHEAD_REDIS_URL = os.getenv('BULKHEAD_REDIS_URL', REDIS_URL)
+BULKHEAD_DEFAULT_LIMIT = int(os.getenv('BULKHEAD_DEFAULT_LIMIT', '8'))
+BULKHEAD_LIMITS = {
+    host.strip().lower(): int(limit)
+    for host, limit in (pair.split('=') for pair in os.getenv('BULKHEAD_LIMITS', '').split(',') if '=' in pair)
+}
+# Longest time a request may queue for a slot before it is answered with 503
+BULKHEAD_MAX_WAIT = float(os.getenv('BULKHEAD_MAX_WAIT', '0.5'))
+BULKHEAD_RETRY_AFTER = int(os.getenv('BULKHEAD_RETRY_AFTER', '5'))
+# Slots held longer than this are considered leaked (must exceed the upstream timeout)
+BULKHEAD_LEASE_SECONDS = int(os.getenv('BULKHEAD_LEASE_SECONDS', '150'))
+# After a Redis error the bulkhead skips Redis (and fails open) for this long
+BULKHEAD_BREAKER_SECONDS = float(os.getenv('BULKHEAD_BREAKER_SECONDS', '5'))
+
+# Adds a `_timing` trailer (spans + upstream requests) to JSON responses requested with ?debug=timing
+SERVER_TIMING_DEBUG = os.getenv('SERVER_TIMING_DEBUG', str(DEBUG)) == 'True'
+
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_RENDERER_CLASSES': [
+        'ruby_api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
 SPECTACULAR_SETTINGS = {
@@ -0,0 +1,137 @@
+# PRG administrative levels and the payloads the by-ID views return for them. The views and the cache
+# warm-up (ruby_api.warmup) both build results here, so warmed entries are identical to lazily cached ones.
+
+VOIVODESHIP = 'voivodeship'
+COUNTY = 'county'
+COMMUNE = 'commune'
+REGION = 'region'
+CITY = 'city'
+CADASTRAL_UNIT = 'cadastral_unit'
+
+LEVELS = {
+    VOIVODESHIP: 'A01_Granice_wojewodztw',
+    COUNTY: 'A02_Granice_powiatow',
+    COMMUNE: 'A03_Granice_gmin',
+    REGION: 'A06_Granice_obrebow_ewidencyjnych',
+}
+
+# Every layer of a PRG export, by the code its layer and file names start with. The API serves the
+# LEVELS above; cities and cadastral units (jednostki ewidencyjne) are only kept in the local snapshot.
+PRG_LAYERS = {
+    'A01': VOIVODESHIP,
+    'A02': COUNTY,
+    'A03': COMMUNE,
+    'A04': CITY,
+    'A05': CADASTRAL_UNIT,
+    'A06': REGION,
+}
+
+# PRG WMS layers, for GetFeatureInfo over every level at once
+WMS_LAYERS = {
+    VOIVODESHIP: 'A01_Granice_wojewodztw',
+    COUNTY: 'A02_Granice_powiatow',
+    COMMUNE: 'A03_Granice_gmin',
+    CITY: 'A04_Granice_miast',
+    CADASTRAL_UNIT: 'A05_Granice_jednostek_ewidencyjnych',
+    REGION: 'A06_Granice_obrebow_ewidencyjnych',
+}
+
+# Top-down; a unit's TERYT code starts with the codes of the units above it
+HIERARCHY = (VOIVODESHIP, COUNTY, COMMUNE, REGION)
+
+# Attributes any of the results use; bulk requests ask for these only and skip the geometry
+PROPERTIES = ['JPT_KOD_JE', 'JPT_NAZWA_', 'JPT_SJR_KO', 'REGON']
+
+
+def cache_key(level, unit_id):
+    return f'{level}_{unit_id}'
+
+
+def xy_cache_key(level, x, y, epsg):
+    return f'{level}_xy_{x}_{y}_{epsg}'
+
+
+def parent_teryts(level, teryt):
+    # voivodeship WW, county WWPP, commune WWPPGG_R, region WWPPGG_R.OOOO
+    codes = {VOIVODESHIP: teryt[:2], COUNTY: teryt[:4], COMMUNE: teryt.split('.')[0]}
+    return {parent: codes[parent] for parent in HIERARCHY[:HIERARCHY.index(level)]}
+
+
+def region_result(region_id, data):
+    return {
+        'region_id': region_id,
+        'region': {
+            'name': data.get('JPT_NAZWA_', ''),
+            'teryt': data.get('JPT_KOD_JE', ''),
+            'regon': data.get('REGON', '')
+        },
+        'source': 'PRG'
+    }
+
+
+def commune_result(commune_id, data):
+    return {
+        'commune_id': commune_id,
+        'commune': {
+            'name': data.get('JPT_NAZWA_', ''),
+            'teryt': data.get('JPT_KOD_JE', ''),
+            'type': data.get('JPT_SJR_KO', ''),
+            'regon': data.get('REGON', '')
+        },
+        'source': 'PRG'
+    }
+
+
+def county_result(county_id, data):
+    return {
+        'county_id': county_id,
+        'county': {
+            'name': data.get('JPT_NAZWA_', ''),
+            'teryt': data.get('JPT_KOD_JE', ''),
+            'regon': data.get('REGON', '')
+        },
+        'source': 'PRG'
+    }
+
+
+def voivodeship_result(voivodeship_id, data):
+    return {
+        'voivodeship_id': voivodeship_id,
+        'voivodeship': {
+            'name': data.get('JPT_NAZWA_', ''),
+            'teryt': data.get('JPT_KOD_JE', ''),
+            'regon': data.get('REGON', '')
+        },
+        'source': 'PRG'
+    }
+
+
+RESULT_BUILDERS = {
+    VOIVODESHIP: voivodeship_result,
+    COUNTY: county_result,
+    COMMUNE: commune_result,
+    REGION: region_result,
+}
+
+
+# Fields of each level in the by-XY results, and the PRG attributes they come from
+XY_FIELDS = {
+    VOIVODESHIP: {'name': 'JPT_NAZWA_', 'teryt': 'JPT_KOD_JE', 'regon': 'REGON'},
+    COUNTY: {'name': 'JPT_NAZWA_', 'teryt': 'JPT_KOD_JE', 'regon': 'REGON'},
+    COMMUNE: {'name': 'JPT_NAZWA_', 'teryt': 'JPT_KOD_JE', 'type': 'JPT_SJR_KO', 'regon': 'REGON'},
+    CITY: {'name': 'JPT_NAZWA_', 'teryt': 'JPT_KOD_JE', 'regon': 'REGON'},
+    CADASTRAL_UNIT: {'name': 'JPT_NAZWA_', 'teryt': 'JPT_KOD_JE'},
+    REGION: {'name': 'JPT_NAZWA_', 'teryt': 'JPT_KOD_JE'},
+}
+
+
+def xy_unit(level, data):
+    return {field: data.get(attribute, '') for field, attribute in XY_FIELDS[level].items()}
+
+
+def xy_result(level, x, y, epsg, data):
+    return {
+        'coordinates': {'x': x, 'y': y, 'epsg': epsg},
+        level: xy_unit(level, data),
+        'source': 'PRG'
+    }
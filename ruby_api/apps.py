@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class RubyApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ruby_api'
+
+    def ready(self):
+        from ruby.qgis_manager import QGISManager
+
+        # Once per process, on the main thread: the QGIS executor threads of ruby_api.county_wfs only use it
+        QGISManager.get_application()
@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from urllib.parse import urlsplit, parse_qsl, urlencode, urlunsplit
+
+import requests
+from django.conf import settings
+from requests.structures import CaseInsensitiveDict
+
+# Bodies are stored decoded (as iter_content yields them), so Content-Encoding and Content-Length would
+# describe bytes the archive does not hold
+KEPT_HEADERS = ('Content-Type', 'Last-Modified', 'ETag')
+
+
+class ArchiveMiss(requests.ConnectionError):
+    pass
+
+
+def archive_dir():
+    return Path(settings.UPSTREAM_ARCHIVE_DIR)
+
+
+def canonical_url(url):
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, query, ''))
+
+
+def request_key(url):
+    return hashlib.sha256(canonical_url(url).encode('utf-8')).hexdigest()
+
+
+def _index_path(key):
+    return archive_dir() / 'requests' / key[:2] / f'{key}.json'
+
+
+def _object_path(digest):
+    return archive_dir() / 'objects' / digest[:2] / digest
+
+
+def _write_atomic(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as handle:
+            handle.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def store(url, status, headers, body):
+    digest = hashlib.sha256(body).hexdigest()
+    blob = _object_path(digest)
+    if not blob.exists():
+        _write_atomic(blob, body)
+
+    entry = {
+        'url': canonical_url(url),
+        'status': status,
+        'headers': {name: headers[name] for name in KEPT_HEADERS if name in headers},
+        'body': digest,
+        'size': len(body),
+        'recorded_at': time.time(),
+    }
+    _write_atomic(_index_path(request_key(url)), json.dumps(entry, ensure_ascii=False).encode('utf-8'))
+    return entry
+
+
+def lookup(url):
+    try:
+        entry = json.loads(_index_path(request_key(url)).read_text(encoding='utf-8'))
+    except FileNotFoundError:
+        return None
+    return entry
+
+
+def read_body(entry):
+    return _object_path(entry['body']).read_bytes()
+
+
+def replay(url):
+    entry = lookup(url)
+    if entry is None:
+        raise ArchiveMiss(f'No archived response for {canonical_url(url)}')
+
+    response = requests.Response()
+    response.status_code = entry['status']
+    response.headers = CaseInsensitiveDict(entry['headers'])
+    response.url = url
+    response.encoding = None
+    response._content = read_body(entry)
+    response._content_consumed = True
+    return response
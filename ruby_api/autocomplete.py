@@ -0,0 +1,197 @@
+import bisect
+import os
+import shutil
+
+import numpy as np
+
+from ruby_api import prg_snapshot
+from ruby_api.administrative import HIERARCHY, parent_teryts
+from ruby_api.name_index import fold
+
+# Type-ahead over the names of all PRG units. The structure is a set of flat arrays written into the
+# snapshot version directory and opened with mmap, so the workers of a host share one copy of the pages
+# and nothing is parsed at startup:
+#
+#   autocomplete/keys.npy           sorted keys (folded name, and the rest of the name from every later
+#   autocomplete/key_offsets.npy    word), concatenated, with the start of every key plus the end
+#   autocomplete/entry_units.npy    unit each key belongs to
+#   autocomplete/entry_ranks.npy    static rank of each key, lower first
+#   autocomplete/prefix.npy         first key of every two-character prefix bucket
+#   autocomplete/names.npy          unit names (UTF-8) ...
+#   autocomplete/name_offsets.npy
+#   autocomplete/teryts.npy         ... TERYT codes ...
+#   autocomplete/teryt_offsets.npy
+#   autocomplete/levels.npy         ... level (index into HIERARCHY) ...
+#   autocomplete/parents.npy        ... and the units above it, one column per level, -1 for none
+#
+# A lookup bisects inside the prefix bucket of the query, then takes the best ranked units of the
+# matching key range.
+
+DIRECTORY = 'autocomplete'
+
+# Folded names only contain these; code 0 means "end of key", so bucket order is key order
+ALPHABET = ' 0123456789abcdefghijklmnopqrstuvwxyz'
+CODES = {char: code for code, char in enumerate(ALPHABET, 1)}
+RADIX = len(ALPHABET) + 1
+
+ARRAYS = (
+    'keys', 'key_offsets', 'entry_units', 'entry_ranks', 'prefix',
+    'names', 'name_offsets', 'teryts', 'teryt_offsets', 'levels', 'parents',
+)
+
+
+def bucket(key):
+    return CODES[key[0]] * RADIX + (CODES[key[1]] if len(key) > 1 else 0)
+
+
+def _strings(values):
+    encoded = [value.encode() for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.uint32)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+
+def arrays(units):
+    units = sorted((unit for unit in units if unit['level'] in HIERARCHY), key=lambda unit: (HIERARCHY.index(unit['level']), unit['teryt']))
+    positions = {(unit['level'], unit['teryt']): position for position, unit in enumerate(units)}
+    names = [fold(unit['name']) for unit in units]
+
+    # Larger units first, then shorter names; a match on a later word ranks after every match on a name start
+    order = sorted(range(len(units)), key=lambda position: (
+        HIERARCHY.index(units[position]['level']), len(names[position]), names[position]
+    ))
+    static_rank = {position: rank for rank, position in enumerate(order)}
+
+    entries = []
+    for position, name in enumerate(names):
+        words = name.split(' ')
+        for word in range(len(words)):
+            key = ' '.join(words[word:])
+            if key:
+                entries.append((key, static_rank[position] + (len(units) if word else 0), position))
+    entries.sort()
+
+    keys, key_offsets = _strings(key for key, _, _ in entries)
+    buckets = np.array([bucket(key) for key, _, _ in entries], dtype=np.uint32)
+    parents = np.full((len(units), len(HIERARCHY) - 1), -1, dtype=np.int32)
+    for position, unit in enumerate(units):
+        for parent, teryt in parent_teryts(unit['level'], unit['teryt']).items():
+            parents[position, HIERARCHY.index(parent)] = positions.get((parent, teryt), -1)
+
+    names_blob, name_offsets = _strings(unit['name'] for unit in units)
+    teryts_blob, teryt_offsets = _strings(unit['teryt'] for unit in units)
+    return {
+        'keys': keys,
+        'key_offsets': key_offsets,
+        'entry_units': np.array([position for _, _, position in entries], dtype=np.uint32),
+        'entry_ranks': np.array([rank for _, rank, _ in entries], dtype=np.uint32),
+        'prefix': np.searchsorted(buckets, np.arange(RADIX * RADIX + 1), side='left').astype(np.uint32),
+        'names': names_blob,
+        'name_offsets': name_offsets,
+        'teryts': teryts_blob,
+        'teryt_offsets': teryt_offsets,
+        'levels': np.array([HIERARCHY.index(unit['level']) for unit in units], dtype=np.uint8),
+        'parents': parents,
+    }
+
+
+def source_digest(hashes):
+    # What build reads: the attributes of the units of the hierarchy, in any order
+    return prg_snapshot.hashes_digest(sorted(
+        (unit_id, unit_hashes[0]) for unit_id, unit_hashes in hashes.items()
+        if prg_snapshot.unit_level(unit_id) in HIERARCHY
+    ))
+
+
+def build(path):
+    # Written next to the snapshot files and renamed into place, so a reader never opens a partial index
+    target = path / DIRECTORY
+    staging = path / f'.{DIRECTORY}-{os.getpid()}'
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir()
+    try:
+        for name, values in arrays(prg_snapshot.read_units(path)).items():
+            np.save(staging / f'{name}.npy', values)
+        os.rename(staging, target)
+    except OSError:
+        shutil.rmtree(staging, ignore_errors=True)
+        # Another worker published it first
+        if not target.exists():
+            raise
+
+
+class Autocomplete:
+    def __init__(self, path):
+        directory = path / DIRECTORY
+        for name in ARRAYS:
+            # Plain ndarray views of the mapped files: slicing np.memmap objects is several times slower
+            setattr(self, name, np.asarray(np.load(directory / f'{name}.npy', mmap_mode='r')))
+        self.size = len(self.entry_units)
+
+    @classmethod
+    def open(cls, path):
+        # Snapshots published before the autocomplete index existed get it on first use
+        if not (path / DIRECTORY).exists():
+            build(path)
+        return cls(path)
+
+    def _key(self, entry):
+        return bytes(self.keys[self.key_offsets[entry]:self.key_offsets[entry + 1]])
+
+    def _range(self, folded):
+        first = CODES[folded[0]] * RADIX
+        if len(folded) > 1:
+            lo, hi = self.prefix[bucket(folded)], self.prefix[bucket(folded) + 1]
+        else:
+            lo, hi = self.prefix[first], self.prefix[first + RADIX]
+        prefix = folded.encode()
+        entries = range(self.size)
+        start = bisect.bisect_left(entries, prefix, int(lo), int(hi), key=self._key)
+        end = bisect.bisect_left(entries, prefix + b'\xff', start, int(hi), key=self._key)
+        return start, end
+
+    def _string(self, blob, offsets, position):
+        return bytes(blob[offsets[position]:offsets[position + 1]]).decode()
+
+    def unit(self, position):
+        level = HIERARCHY[self.levels[position]]
+        parents = {}
+        for column, parent in enumerate(self.parents[position]):
+            if parent >= 0:
+                parents[HIERARCHY[column]] = {
+                    'name': self._string(self.names, self.name_offsets, parent),
+                    'teryt': self._string(self.teryts, self.teryt_offsets, parent),
+                }
+        return {
+            'name': self._string(self.names, self.name_offsets, position),
+            'teryt': self._string(self.teryts, self.teryt_offsets, position),
+            'level': level,
+            'parents': parents,
+        }
+
+    def search(self, query, levels=None, limit=10):
+        folded = fold(query)
+        if not folded:
+            return []
+
+        start, end = self._range(folded)
+        units = np.asarray(self.entry_units[start:end])
+        ranks = np.asarray(self.entry_ranks[start:end])
+        if levels:
+            keep = np.isin(self.levels[units], [HIERARCHY.index(level) for level in levels])
+            units, ranks = units[keep], ranks[keep]
+
+        # A unit can match on its name and on later words; the first, best ranked entry wins
+        found = []
+        seen = set()
+        for position in units[np.argsort(ranks, kind='stable')]:
+            if position not in seen:
+                seen.add(position)
+                found.append(self.unit(position))
+                if len(found) == limit:
+                    break
+        return found
+
+
+def get_autocomplete():
+    return prg_snapshot.artifacts.get('autocomplete', Autocomplete.open)
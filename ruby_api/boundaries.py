@@ -0,0 +1,141 @@
+from functools import lru_cache, partial
+
+import numpy as np
+import shapely
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from pyproj import Transformer
+from pyproj.exceptions import CRSError
+
+from ruby_api import prg_snapshot
+from ruby_api.administrative import HIERARCHY
+from ruby_api.region_grid import RegionGrid
+from ruby_api.timing import span
+
+# Point-in-polygon lookups against the boundaries stored in the PRG snapshot, one STRtree per level.
+# A lookup is a tree query for the few boundaries whose envelope holds the point and an exact test
+# against those, prepared on first use so only boundaries that points actually fall into pay for it.
+# When the snapshot has a region grid (ruby_api.region_grid), the obręb at the point is read from it
+# and the other levels follow from its TERYT code; the trees answer only what the grid cannot.
+# Without a snapshot, without boundaries for the level, or with a snapshot older than
+# PRG_SNAPSHOT_MAX_AGE, the XY endpoints ask PRG WMS as before.
+
+
+class BoundaryIndex:
+    def __init__(self, units, geometries):
+        self.units = units
+        self.geometries = geometries
+        self.tree = shapely.STRtree(geometries)
+
+    def __len__(self):
+        return len(self.units)
+
+    @classmethod
+    def open(cls, path, level):
+        units = prg_snapshot.read_units(path)
+        positions = [position for position, unit in enumerate(units) if unit['level'] == level]
+        if not positions or not prg_snapshot.has_geometries(path):
+            return cls([], shapely.from_wkb([]))
+        geometries = prg_snapshot.read_geometries(path, positions)
+        known = ~shapely.is_missing(geometries)
+        return cls([units[position] for position, present in zip(positions, known) if present], geometries[known])
+
+    def find_position(self, x, y):
+        point = shapely.Point(x, y)
+        candidates = self.tree.query(point)
+        if not len(candidates):
+            return None
+        # Index order, so a point on a shared border always gets the same unit
+        candidates.sort()
+        geometries = self.geometries[candidates]
+        shapely.prepare(geometries)
+        hits = candidates[shapely.intersects(geometries, point)]
+        return int(hits[0]) if len(hits) else None
+
+    def find_positions(self, xs, ys):
+        # Vectorized find_position for many points; -1 where no unit
+        positions = np.full(len(xs), -1, dtype=np.int64)
+        if not len(xs):
+            return positions
+        points, units = self.tree.query(shapely.points(xs, ys), predicate='intersects')
+        # Lowest unit index per point, as in find_position
+        order = np.lexsort((units, points))
+        points, units = points[order], units[order]
+        first = np.ones(len(points), dtype=bool)
+        first[1:] = points[1:] != points[:-1]
+        positions[points[first]] = units[first]
+        return positions
+
+    def find(self, x, y):
+        position = self.find_position(x, y)
+        return self.units[position] if position is not None else None
+
+
+@lru_cache(maxsize=16)
+def _transformer(epsg):
+    return Transformer.from_crs(f'EPSG:{epsg}', f'EPSG:{prg_snapshot.SNAPSHOT_EPSG}', always_xy=True)
+
+
+def to_snapshot_crs(x, y, epsg):
+    if str(epsg) == str(prg_snapshot.SNAPSHOT_EPSG):
+        return x, y
+    return _transformer(str(epsg)).transform(x, y)
+
+
+def _name(level):
+    return f'boundaries_{level}'
+
+
+def is_fresh():
+    manifest = prg_snapshot.artifacts.get('manifest', prg_snapshot.read_manifest)
+    return manifest is not None and prg_snapshot.snapshot_age(manifest) <= settings.PRG_SNAPSHOT_MAX_AGE
+
+
+def get_boundary_index(level):
+    if not is_fresh():
+        return None
+    index = prg_snapshot.artifacts.get(_name(level), partial(BoundaryIndex.open, level=level))
+    return index if index else None
+
+
+def get_region_grid():
+    if not is_fresh():
+        return None
+    return prg_snapshot.artifacts.get('region_grid', RegionGrid.open) or None
+
+
+async def _aget(name, get, *args):
+    # The first lookup in a worker reads and indexes the boundaries (seconds for obręby), which must not
+    # happen on the event loop
+    if prg_snapshot.artifacts.peek(name) is None:
+        return await sync_to_async(get, thread_sensitive=False)(*args)
+    return get(*args)
+
+
+def unit_properties(unit):
+    return {attribute: unit[field] for field, attribute in prg_snapshot.ATTRIBUTES.items()}
+
+
+async def afind_administrative_unit(level, x, y, epsg):
+    # PRG attributes of the unit at the point, {} when there is none, None when the snapshot cannot tell
+    if not is_fresh():
+        return None
+    try:
+        x, y = to_snapshot_crs(x, y, epsg)
+    except CRSError:
+        return None
+
+    grid = await _aget('region_grid', get_region_grid) if level in HIERARCHY else None
+    if grid is not None:
+        with span('region_grid'):
+            position = grid.locate(x, y)
+            unit = grid.unit(position, level) if position is not None else None
+        if unit is not None:
+            return unit_properties(unit)
+
+    index = await _aget(_name(level), get_boundary_index, level)
+    if index is None:
+        return None
+    with span('boundary_index'):
+        unit = index.find(x, y)
+    return unit_properties(unit) if unit else {}
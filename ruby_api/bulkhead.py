@@ -0,0 +1,185 @@
+import asyncio
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager, contextmanager
+from urllib.parse import urlsplit
+
+import redis
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework.response import Response
+
+from ruby_api.timing import span
+
+# Slots are members of a sorted set scored by acquisition time (Redis server clock). Leases older than
+# BULKHEAD_LEASE_SECONDS are dropped, so a worker killed mid-request cannot hold a slot forever.
+_ACQUIRE_SCRIPT = """
+local now = redis.call('TIME')
+local now_ms = tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000)
+local lease_ms = tonumber(ARGV[1]) * 1000
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now_ms - lease_ms)
+if redis.call('ZCARD', KEYS[1]) < tonumber(ARGV[2]) then
+    redis.call('ZADD', KEYS[1], now_ms, ARGV[3])
+    redis.call('PEXPIRE', KEYS[1], lease_ms)
+    return 1
+end
+return 0
+"""
+
+
+class BulkheadFull(Exception):
+    def __init__(self, host, retry_after):
+        super().__init__(f'Too many concurrent requests to {host}')
+        self.host = host
+        self.retry_after = retry_after
+
+
+class RedisBackend:
+    def __init__(self, url):
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.script = self.client.register_script(_ACQUIRE_SCRIPT)
+
+    def try_acquire(self, host, limit):
+        token = uuid.uuid4().hex
+        if self.script(keys=[f'bulkhead:{host}'], args=[settings.BULKHEAD_LEASE_SECONDS, limit, token]):
+            return token
+        return None
+
+    def release(self, host, token):
+        self.client.zrem(f'bulkhead:{host}', token)
+
+
+class LocalBackend:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = {}
+
+    def try_acquire(self, host, limit):
+        with self.lock:
+            if self.in_flight.get(host, 0) >= limit:
+                return None
+            self.in_flight[host] = self.in_flight.get(host, 0) + 1
+            return host
+
+    def release(self, host, token):
+        with self.lock:
+            self.in_flight[host] = max(0, self.in_flight.get(host, 0) - 1)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+# After a Redis error the bulkhead fails open without calling Redis until `open_until` (monotonic clock),
+# so an outage costs one connect timeout per BULKHEAD_BREAKER_SECONDS, not one per upstream request
+_breaker = {'open_until': 0.0}
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if settings.BULKHEAD_BACKEND == 'redis':
+                    _backend = RedisBackend(settings.BULKHEAD_REDIS_URL)
+                else:
+                    _backend = LocalBackend()
+    return _backend
+
+
+def host_of(url):
+    return (urlsplit(url).hostname or '').lower()
+
+
+def limit_for(host):
+    return settings.BULKHEAD_LIMITS.get(host, settings.BULKHEAD_DEFAULT_LIMIT)
+
+
+def _trip():
+    _breaker['open_until'] = time.monotonic() + settings.BULKHEAD_BREAKER_SECONDS
+
+
+def try_acquire(host):
+    if time.monotonic() < _breaker['open_until']:
+        return ''
+    try:
+        return get_backend().try_acquire(host, limit_for(host))
+    except redis.RedisError:
+        # Fail open: losing the coordinator must not take the API down with it
+        _trip()
+        return ''
+
+
+def release(host, token):
+    # While the breaker is open the slot is left to expire with its lease
+    if not token or time.monotonic() < _breaker['open_until']:
+        return
+    try:
+        get_backend().release(host, token)
+    except redis.RedisError:
+        _trip()
+
+
+def acquire(host):
+    deadline = time.monotonic() + settings.BULKHEAD_MAX_WAIT
+    delay = 0.01
+    while True:
+        token = try_acquire(host)
+        if token is not None:
+            return token
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise BulkheadFull(host, settings.BULKHEAD_RETRY_AFTER)
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, 0.1)
+
+
+@contextmanager
+def guard(url):
+    if settings.BULKHEAD_BACKEND == 'off':
+        yield
+        return
+
+    host = host_of(url)
+    with span('bulkhead'):
+        token = acquire(host)
+    try:
+        yield
+    finally:
+        release(host, token)
+
+
+async def aacquire(host):
+    deadline = time.monotonic() + settings.BULKHEAD_MAX_WAIT
+    delay = 0.01
+    while True:
+        token = await sync_to_async(try_acquire, thread_sensitive=False)(host)
+        if token is not None:
+            return token
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise BulkheadFull(host, settings.BULKHEAD_RETRY_AFTER)
+        await asyncio.sleep(min(delay, remaining))
+        delay = min(delay * 2, 0.1)
+
+
+@asynccontextmanager
+async def aguard(url):
+    if settings.BULKHEAD_BACKEND == 'off':
+        yield
+        return
+
+    host = host_of(url)
+    with span('bulkhead'):
+        token = await aacquire(host)
+    try:
+        yield
+    finally:
+        await sync_to_async(release, thread_sensitive=False)(host, token)
+
+
+def unavailable_response(error, **extra):
+    return Response(
+        {'error': f'Upstream service {error.host} is busy, retry later', **extra},
+        status=503,
+        headers={'Retry-After': str(error.retry_after)}
+    )
@@ -0,0 +1,175 @@
+import asyncio
+import contextvars
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from qgis.core import QgsVectorLayer, QgsDataSourceUri
+
+from ruby_api import bulkhead, upstream
+from ruby_api.timing import span
+from ruby_api.utils import qvariant_to_python
+
+PARCEL_LAYERS = ['ms:dzialki', 'ewns:dzialki', 'wfs:dzialki']
+BUILDING_LAYERS = ['ms:budynki', 'ewns:budynki', 'wfs:budynki']
+
+# QGIS lookups block, so async views hand them to a small dedicated pool instead of the event loop.
+# The pool size caps how many QGIS WFS loads run at once in a worker process. The county's bulkhead slot
+# is taken before a thread is: a busy county answers 503 without occupying the pool.
+#
+# The QgsApplication these lookups need is created once, on the main thread, at startup
+# (ruby_api.apps.RubyApiConfig.ready).
+_executor = ThreadPoolExecutor(max_workers=settings.QGIS_EXECUTOR_WORKERS, thread_name_prefix='qgis')
+
+
+def _service_url(service):
+    return settings.COUNTY_WFS_URL or service['url']
+
+
+def find_feature(service, layer_names, id_field, feature_id, name_prefix):
+    url = _service_url(service)
+
+    if upstream.mode() != upstream.LIVE:
+        return _find_archived_feature(url, layer_names, id_field, feature_id, name_prefix)
+
+    with bulkhead.guard(url):
+        return _find_live_feature(url, layer_names, id_field, feature_id, name_prefix)
+
+
+def _find_live_feature(url, layer_names, id_field, feature_id, name_prefix):
+    for layer_name in layer_names:
+        with span('wfs_layer'):
+            uri = QgsDataSourceUri()
+            uri.setParam('url', url)
+            uri.setParam('version', 'auto')
+            uri.setParam('typename', layer_name)
+            uri.setParam('filter', f"{id_field}='{feature_id}'")
+            uri.setParam('ssl_verify', 'false')
+
+            layer = QgsVectorLayer(uri.uri(), f"{name_prefix}_{layer_name}", "WFS")
+
+        result = _first_feature(layer, layer_name)
+        del layer
+        if result:
+            return result
+
+    return None
+
+
+# QGIS' WFS provider does its own networking, which the upstream archive cannot see. In record/replay
+# modes the feature is fetched as a plain GetFeature through ruby_api.upstream and opened with OGR instead.
+def _get_feature_params(layer_name, id_field, feature_id):
+    return {
+        'SERVICE': 'WFS',
+        'VERSION': '2.0.0',
+        'REQUEST': 'GetFeature',
+        'TYPENAMES': layer_name,
+        'FILTER': (
+            '<fes:Filter xmlns:fes="http://www.opengis.net/fes/2.0"><fes:PropertyIsEqualTo>'
+            f'<fes:ValueReference>{id_field}</fes:ValueReference><fes:Literal>{escape(feature_id)}</fes:Literal>'
+            '</fes:PropertyIsEqualTo></fes:Filter>'
+        ),
+    }
+
+
+def _read_archived_feature(content, layer_name, name_prefix):
+    with span('wfs_layer'):
+        fd, path = tempfile.mkstemp(suffix='.gml')
+        with os.fdopen(fd, 'wb') as handle:
+            handle.write(content)
+
+        layer = QgsVectorLayer(path, f"{name_prefix}_{layer_name}", "ogr")
+
+    try:
+        return _first_feature(layer, layer_name)
+    finally:
+        del layer
+        os.unlink(path)
+
+
+def _find_archived_feature(url, layer_names, id_field, feature_id, name_prefix):
+    for layer_name in layer_names:
+        with span('wfs_layer'):
+            response = upstream.get(url, params=_get_feature_params(layer_name, id_field, feature_id), timeout=30)
+        if response.status_code != 200:
+            continue
+
+        result = _read_archived_feature(response.content, layer_name, name_prefix)
+        if result:
+            return result
+
+    return None
+
+
+async def _afind_archived_feature(url, layer_names, id_field, feature_id, name_prefix):
+    # The request goes through the async upstream client (and its bulkhead); only OGR runs on the pool
+    for layer_name in layer_names:
+        with span('wfs_layer'):
+            response = await upstream.aget(url, params=_get_feature_params(layer_name, id_field, feature_id),
+                                           timeout=30)
+        if response.status_code != 200:
+            continue
+
+        result = await arun(_read_archived_feature, response.content, layer_name, name_prefix)
+        if result:
+            return result
+
+    return None
+
+
+def _first_feature(layer, layer_name):
+    if not layer.isValid():
+        return None
+
+    with span('features'):
+        features = list(layer.getFeatures())
+
+    if not features:
+        return None
+
+    feature = features[0]
+    attributes = {field.name(): qvariant_to_python(value)
+                  for field, value in zip(layer.fields(), feature.attributes())}
+
+    with span('geometry'):
+        geometry = feature.geometry().asWkt()
+
+    return {
+        'layer_name': layer_name,
+        'attributes': attributes,
+        'geometry': geometry
+    }
+
+
+def find_parcel(service, parcel_id):
+    return find_feature(service, PARCEL_LAYERS, 'ID_DZIALKI', parcel_id, 'parcel')
+
+
+def find_building(service, building_id):
+    return find_feature(service, BUILDING_LAYERS, 'ID_BUDYNKU', building_id, 'building')
+
+
+async def arun(func, *args):
+    # copy_context keeps the request's Server-Timing spans visible to the worker thread
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(_executor, context.run, func, *args)
+
+
+async def afind_feature(service, layer_names, id_field, feature_id, name_prefix):
+    url = _service_url(service)
+
+    if upstream.mode() != upstream.LIVE:
+        return await _afind_archived_feature(url, layer_names, id_field, feature_id, name_prefix)
+
+    async with bulkhead.aguard(url):
+        return await arun(_find_live_feature, url, layer_names, id_field, feature_id, name_prefix)
+
+
+async def afind_parcel(service, parcel_id):
+    return await afind_feature(service, PARCEL_LAYERS, 'ID_DZIALKI', parcel_id, 'parcel')
+
+
+async def afind_building(service, building_id):
+    return await afind_feature(service, BUILDING_LAYERS, 'ID_BUDYNKU', building_id, 'building')
@@ -0,0 +1,174 @@
+from collections import namedtuple
+
+from django.core.cache import cache
+
+from ruby_api import namespaces
+from ruby_api.http_cache import (
+    acached_response, body_key, build_meta, cache_entries, etag_matches, fresh_rendered_response, meta_key,
+    not_modified, payload_etag, rendered_response, respond, respond_extended, serves_rendered
+)
+from ruby_api.renderers import dumps
+from ruby_api.ttl import alearn
+
+# Parcels and buildings are cached once, under their ID (parcel_<id>, building_<id>: the by-ID responses).
+# When an XY lookup ends at a parcel or building with geometry, its own key (parcel_xy_<x>_<y>_<epsg>, ...)
+# holds only an EntityPointer to that entry. One WFS fetch then serves both the XY and the by-ID endpoint,
+# whichever comes first, and the geometry is stored once. The XY answer is the entity with the point and
+# TERYT in front: its ETag is derived from the entity's and its body wraps the entity's rendered body, so a
+# hit neither serializes nor hashes the geometry again.
+#
+# The ID key carries the generation of the entity's namespace (ruby_api.namespaces) once its voivodeship,
+# county or commune was invalidated (parcel_<id>_g<generation>), so pointers to entries of an earlier
+# generation lead nowhere. XY results without an entity carry the stamp of the ID they found instead. An entity
+# whose ID has no generation has no key (None) and is not cached.
+
+PARCEL = 'parcel'
+BUILDING = 'building'
+KINDS = (PARCEL, BUILDING)
+
+EntityPointer = namedtuple('EntityPointer', ['kind', 'entity_id', 'teryt'])
+
+# Where the ID is when a result has no parcel_id/building_id (GetFeatureInfo features without geometry)
+ID_ATTRIBUTES = {PARCEL: 'Identyfikator działki', BUILDING: 'Identyfikator budynku'}
+
+
+def versioned_key(kind, entity_id, generation):
+    if generation is None:
+        return None
+    return f'{kind}_{entity_id}_g{generation}' if generation else f'{kind}_{entity_id}'
+
+
+def entity_key(kind, entity_id):
+    return versioned_key(kind, entity_id, namespaces.generation(kind, entity_id))
+
+
+async def aentity_key(kind, entity_id):
+    return versioned_key(kind, entity_id, await namespaces.ageneration(kind, entity_id))
+
+
+def result_entity_id(kind, data):
+    if data.get(f'{kind}_id'):
+        return data[f'{kind}_id']
+    for feature in data.get('features', []):
+        if feature.get(ID_ATTRIBUTES[kind]):
+            return feature[ID_ATTRIBUTES[kind]]
+    return None
+
+
+def layer_entities(layers):
+    # (kind, ID) of every parcel and building in GetFeatureInfo layers
+    return [(kind, feature[attribute]) for features in layers.values() for feature in features
+            for kind, attribute in ID_ATTRIBUTES.items() if feature.get(attribute)]
+
+
+def entity_result(kind, entity_id, service, feature):
+    return {
+        f'{kind}_id': entity_id,
+        'service': service,
+        'layer_name': feature['layer_name'],
+        'attributes': feature['attributes'],
+        'geometry': feature['geometry']
+    }
+
+
+def xy_entity_result(kind, x, y, epsg, teryt, entity):
+    # Same keys, in the same order, as xy_entity_body
+    return {'coordinates': {'x': x, 'y': y, 'epsg': epsg}, 'teryt': teryt, **entity}
+
+
+def xy_entity_body(x, y, epsg, teryt, body):
+    # xy_entity_result rendered around the entity's rendered body
+    head = dumps({'coordinates': {'x': x, 'y': y, 'epsg': epsg}, 'teryt': teryt})
+    return head[:-1] + b',' + body[1:]
+
+
+def xy_entity_meta(meta, x, y, epsg, teryt):
+    return {**meta, 'etag': payload_etag([meta['etag'], x, y, epsg, teryt])}
+
+
+async def aget_entity(kind, entity_id):
+    key = await aentity_key(kind, entity_id)
+    return await cache.aget(key) if key else None
+
+
+async def acached_xy_response(request, cache_key, x, y, epsg, extend=None):
+    # Like http_cache.acached_response, following entries that point to a cached parcel or building. A pointer
+    # is stored without a meta entry.
+    if await cache.aget(meta_key(cache_key)) is None:
+        data = await cache.aget(cache_key)
+        if data is None:
+            return None
+        if isinstance(data, EntityPointer):
+            return await acached_pointer_response(request, data, x, y, epsg, extend)
+    return await acached_response(request, cache_key, extend)
+
+
+async def acached_pointer_response(request, pointer, x, y, epsg, extend=None):
+    key = await aentity_key(pointer.kind, pointer.entity_id)
+    if key is None:
+        return None
+    if extend is None:
+        if request.headers.get('If-None-Match'):
+            meta = await cache.aget(meta_key(key))
+            if meta:
+                meta = xy_entity_meta(meta, x, y, epsg, pointer.teryt)
+                etag = etag_matches(request, meta['etag'])
+                if etag:
+                    return not_modified(meta, etag)
+
+        if serves_rendered(request):
+            entries = await cache.aget_many([meta_key(key), body_key(key, False)])
+            if len(entries) == 2:
+                body = xy_entity_body(x, y, epsg, pointer.teryt, entries[body_key(key, False)])
+                return rendered_response(body, xy_entity_meta(entries[meta_key(key)], x, y, epsg, pointer.teryt), False)
+
+    entries = await cache.aget_many([key, meta_key(key)])
+    if key not in entries:
+        # The entity expired first; look the point up again
+        return None
+    entity = entries[key]
+    # Entity written before validators existed: still give the answer an ETag, but no freshness lifetime
+    meta = entries.get(meta_key(key)) or build_meta(entity, None)
+    result = xy_entity_result(pointer.kind, x, y, epsg, pointer.teryt, entity)
+    if extend is not None:
+        return respond_extended(request, result, meta, extend)
+    return respond(request, result, xy_entity_meta(meta, x, y, epsg, pointer.teryt))
+
+
+async def acache_xy(kind, cache_key, result, timeout, entity=None):
+    # Caches a parcel or building XY result; with the entity it resolved to, as the entity plus a pointer to
+    # it. `timeout` is the base TTL of the policy (ruby_api.ttl); returns the TTL learned for the entry, with
+    # the meta and rendered bodies written for the result or the entity.
+    if entity is None:
+        entity_id = result_entity_id(kind, result)
+        stamps = await namespaces.astamps([(kind, entity_id)]) if entity_id else None
+        key, data = cache_key if namespaces.cacheable(stamps) else None, result
+    else:
+        stamps = None
+        key, data = await aentity_key(kind, entity[f'{kind}_id']), entity
+    if key is None:
+        # Not kept, as its units could not be invalidated; the answer is still made of the same meta and bodies
+        _, meta, bodies = cache_entries(cache_key, data, timeout)
+        return timeout, meta, bodies
+
+    timeout = await alearn(key, data, timeout)
+    entries, meta, bodies = cache_entries(key, data, timeout, stamps)
+    if entity is not None:
+        entries[cache_key] = EntityPointer(kind, entity[f'{kind}_id'], result['teryt'])
+    await cache.aset_many(entries, timeout=timeout)
+    return timeout, meta, bodies
+
+
+async def acache_xy_response(request, kind, cache_key, result, timeout, entity=None, extend=None):
+    timeout, meta, bodies = await acache_xy(kind, cache_key, result, timeout, entity)
+    if extend is not None:
+        return respond_extended(request, result, meta, extend)
+    if entity is None:
+        return fresh_rendered_response(request, result, meta, bodies)
+
+    # The same answer a hit on the pointer gives
+    x, y, epsg = result['coordinates']['x'], result['coordinates']['y'], result['coordinates']['epsg']
+    meta = xy_entity_meta(meta, x, y, epsg, result['teryt'])
+    if bodies and serves_rendered(request) and not etag_matches(request, meta['etag']):
+        return rendered_response(xy_entity_body(x, y, epsg, result['teryt'], bodies[False]), meta, False)
+    return respond(request, result, meta)
@@ -0,0 +1,151 @@
+import asyncio
+import weakref
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from pyproj import CRS
+from pyproj.exceptions import CRSError
+
+from ruby_api import upstream
+from ruby_api.administrative import HIERARCHY, WMS_LAYERS, xy_cache_key, xy_result
+from ruby_api.bulkhead import BulkheadFull
+from ruby_api.entities import layer_entities
+from ruby_api.http_cache import acache_results
+from ruby_api.namespaces import acurrent, astamps, cacheable
+from ruby_api.parsers import parse_gml_layers, parse_gugik_feature_info_layers
+from ruby_api.timing import span
+from ruby_api.ttl import ADMINISTRATIVE, FEATURE_INFO, alearn, apolicy
+
+# WMS GetFeatureInfo at a point, against GUGiK (parcels and buildings) and PRG WMS (administrative
+# units), for several layers in one request.
+#
+# The administrative XY endpoints share one PRG request per point: it asks for all six A01-A06 layers,
+# and every level found is cached for its endpoint at once. Clients look up several levels of the same
+# point together, so concurrent lookups of one point (coordinates rounded as below) in a worker also wait
+# for the same request.
+#
+# GUGiK is asked for parcels and buildings together, and the parsed result is cached per point
+# (gfi_<x>_<y>_<epsg>, coordinates rounded to about a centimetre), so whichever of the parcel and building
+# XY endpoints comes second for a point needs no GUGiK request. The entry holds the namespace stamps of
+# the parcels and buildings found (ruby_api.namespaces), so invalidating their unit drops it too.
+
+GUGIK_LAYERS = ('dzialki', 'budynki')
+
+# In-flight fetches per event loop: under WSGI every request thread runs its own loop, and a task can
+# only be awaited on the loop it was created on
+_pending = weakref.WeakKeyDictionary()
+
+
+@lru_cache(maxsize=64)
+def _is_geographic(epsg):
+    try:
+        return CRS.from_user_input(f'EPSG:{epsg}').is_geographic
+    except CRSError:
+        return False
+
+
+def point_key(x, y, epsg):
+    digits = 7 if _is_geographic(epsg) else 2
+    return f'{round(x, digits)}_{round(y, digits)}_{epsg}'
+
+
+async def _shared(key, fetch, *args):
+    # Concurrent calls with the same key in a worker await one fetch. Shielded, so a client that goes away
+    # does not cancel it for the others.
+    pending = _pending.setdefault(asyncio.get_running_loop(), {})
+    task = pending.get(key)
+    if task is None:
+        task = asyncio.ensure_future(fetch(*args))
+        pending[key] = task
+        task.add_done_callback(lambda _: pending.pop(key, None))
+    return await asyncio.shield(task)
+
+
+def feature_info_params(x, y, epsg, layers, buffer, info_format):
+    layers = ','.join(layers)
+    return {
+        'VERSION': '1.3.0',
+        'SERVICE': 'WMS',
+        'REQUEST': 'GetFeatureInfo',
+        'LAYERS': layers,
+        'QUERY_LAYERS': layers,
+        'CRS': f'EPSG:{epsg}',
+        'WIDTH': '101',
+        'HEIGHT': '101',
+        'I': '50',
+        'J': '50',
+        'INFO_FORMAT': info_format,
+        'BBOX': f"{x - buffer},{y - buffer},{x + buffer},{y + buffer}"
+    }
+
+
+async def afetch_gugik_features(x, y, epsg, layers=GUGIK_LAYERS):
+    # Features per GUGiK layer; request errors propagate, as the parcel and building views report them
+    params = feature_info_params(x, y, epsg, layers, 50, 'text/xml')
+    with span('gfi'):
+        response = await upstream.aget(settings.GUGIK_FEATURE_INFO_URL, params=params, timeout=30)
+    response.raise_for_status()
+    return parse_gugik_feature_info_layers(response.content)
+
+
+def _parcel_id(layers):
+    # The region the point lies in, for the TTL policy
+    for feature in layers.get('dzialki', []):
+        if feature.get('Identyfikator działki'):
+            return feature['Identyfikator działki']
+    return ''
+
+
+async def _afetch_point_features(x, y, epsg, cache_key):
+    layers = await afetch_gugik_features(x, y, epsg)
+    # Empty results are not kept, as the XY endpoints do not cache their 404s either
+    stamps = await astamps(layer_entities(layers)) if layers else None
+    if layers and cacheable(stamps):
+        timeout = await alearn(cache_key, layers, await apolicy(FEATURE_INFO, _parcel_id(layers)))
+        await cache.aset(cache_key, (layers, stamps), timeout)
+    return layers
+
+
+async def afetch_point_features(x, y, epsg):
+    # Parcel and building features at the point, per GUGiK layer, from the shared cache when present
+    cache_key = f'gfi_{point_key(x, y, epsg)}'
+    with span('cache'):
+        entry = await cache.aget(cache_key)
+        # Entries from before the stamps were added are plain dicts, and count as misses
+        if isinstance(entry, tuple) and await acurrent(entry[1]):
+            return entry[0]
+    return await _shared(cache_key, _afetch_point_features, x, y, epsg, cache_key)
+
+
+async def afetch_prg_units(x, y, epsg, layers):
+    # PRG attributes per WMS layer name; None when PRG WMS could not be asked
+    params = feature_info_params(x, y, epsg, layers, 100, 'application/vnd.ogc.gml')
+    try:
+        with span('prg_wms'):
+            response = await upstream.aget(settings.PRG_WMS_URL, params=params, timeout=30)
+        response.raise_for_status()
+        return parse_gml_layers(response.content)
+    except BulkheadFull:
+        raise
+    except Exception:
+        return None
+
+
+async def _afetch_administrative_units(x, y, epsg):
+    found = await afetch_prg_units(x, y, epsg, WMS_LAYERS.values())
+    if found is None:
+        return None
+    units = {level: found.get(layer) or None for level, layer in WMS_LAYERS.items()}
+    await acache_results([
+        (xy_cache_key(level, x, y, epsg), xy_result(level, x, y, epsg, units[level]),
+         await apolicy(ADMINISTRATIVE, units[level].get('JPT_KOD_JE', '')))
+        for level in HIERARCHY if units[level]
+    ])
+    return units
+
+
+async def afetch_administrative_units(x, y, epsg):
+    # PRG attributes per level at the point (None for levels with no unit there), with the XY endpoints'
+    # cache entries written; None when PRG WMS could not be asked
+    return await _shared(f'prg_{point_key(x, y, epsg)}', _afetch_administrative_units, x, y, epsg)
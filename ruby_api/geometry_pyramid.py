@@ -0,0 +1,174 @@
+import math
+import os
+import shutil
+
+import numpy as np
+import orjson
+import shapely
+from django.conf import settings
+
+from ruby_api import prg_snapshot
+from ruby_api.administrative import HIERARCHY
+
+# Boundaries for the administrative by-ID endpoints (?include=geometry), simplified ahead of time at the
+# tolerances of PRG_PYRAMID_TOLERANCES (metres) and written as WKT into the snapshot version directory:
+#
+#   pyramid/keys.npy               sorted "<level>:<teryt>" keys (fixed width)
+#   pyramid/positions.npy          position of each unit in units.json, for the full-resolution boundary
+#   pyramid/<tolerance>.npy        WKT in EPSG:2180 of every unit at that tolerance, concatenated ...
+#   pyramid/<tolerance>_offsets.npy  ... with the start of every one plus the end
+#   pyramid/pyramid.json           tolerances
+#
+# Each level is simplified as a coverage (shapely.coverage_simplify), so neighbouring units keep one
+# shared border and no gaps or overlaps open between them; every tolerance starts from the one below it.
+# A request picks the coarsest tolerance that still fits its `resolution` (metres per pixel) or map `zoom`,
+# and the response is read from disk as it is.
+
+DIRECTORY = 'pyramid'
+KEYS_FILE = 'keys.npy'
+POSITIONS_FILE = 'positions.npy'
+PYRAMID_FILE = 'pyramid.json'
+INCLUDE = 'geometry'
+# Decimals kept in the WKT: centimetres, well below the smallest tolerance
+PRECISION = 2
+# Web Mercator metres per pixel at zoom 0 along the parallel through the middle of Poland
+ZOOM_0_RESOLUTION = 2 * math.pi * 6378137 / 256 * math.cos(math.radians(52))
+
+
+def _key(level, teryt):
+    return prg_snapshot.unit_id({'level': level, 'teryt': teryt}).encode()
+
+
+def simplify(geometries, tolerance):
+    # Coverage simplification needs GEOS 3.12; older versions simplify each boundary on its own
+    if shapely.geos_version >= (3, 12, 0):
+        return shapely.coverage_simplify(geometries, tolerance)
+    return shapely.simplify(geometries, tolerance, preserve_topology=True)
+
+
+def _strings(values):
+    offsets = np.zeros(len(values) + 1, dtype=np.uint64)
+    np.cumsum([len(value) for value in values], out=offsets[1:])
+    return np.frombuffer(b''.join(values), dtype=np.uint8), offsets
+
+
+def source_digest(hashes):
+    # What build reads: the boundaries of the units of the hierarchy and their positions in units.json
+    units = [(position, unit_id, unit_hashes[1]) for position, (unit_id, unit_hashes) in enumerate(hashes.items())
+             if prg_snapshot.unit_level(unit_id) in HIERARCHY]
+    return prg_snapshot.hashes_digest([sorted(settings.PRG_PYRAMID_TOLERANCES), units])
+
+
+def build(path):
+    # Without tolerances only full-resolution boundaries are served
+    tolerances = sorted(settings.PRG_PYRAMID_TOLERANCES)
+    if not prg_snapshot.has_geometries(path):
+        return
+
+    units = prg_snapshot.read_units(path)
+    keys, positions, levels = [], [], {}
+    for level in HIERARCHY:
+        # Like the views, the first unit with a given code wins
+        found = {}
+        for position, unit in enumerate(units):
+            if unit['level'] == level and unit['teryt']:
+                found.setdefault(unit['teryt'], position)
+        geometries = prg_snapshot.read_geometries(path, list(found.values()))
+        known = ~shapely.is_missing(geometries)
+        levels[level] = geometries[known]
+        keys.extend(_key(level, teryt) for teryt, present in zip(found, known) if present)
+        positions.extend(position for position, present in zip(found.values(), known) if present)
+    if not keys:
+        return
+    order = sorted(range(len(keys)), key=keys.__getitem__)
+
+    staging = path / f'.{DIRECTORY}-{os.getpid()}'
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir()
+    np.save(staging / KEYS_FILE, np.array([keys[index] for index in order]))
+    np.save(staging / POSITIONS_FILE, np.array([positions[index] for index in order], dtype=np.uint32))
+    for tolerance in tolerances:
+        wkts = []
+        for level in HIERARCHY:
+            if len(levels[level]):
+                levels[level] = simplify(levels[level], tolerance)
+                wkts.extend(wkt.encode() for wkt in shapely.to_wkt(levels[level], rounding_precision=PRECISION))
+        blob, offsets = _strings([wkts[index] for index in order])
+        np.save(staging / f'{tolerance:g}.npy', blob)
+        np.save(staging / f'{tolerance:g}_offsets.npy', offsets)
+    (staging / PYRAMID_FILE).write_bytes(orjson.dumps({'tolerances': tolerances}))
+    os.rename(staging, path / DIRECTORY)
+
+
+class GeometryPyramid:
+    def __init__(self, path):
+        directory = path / DIRECTORY
+        self.path = path
+        self.tolerances = orjson.loads((directory / PYRAMID_FILE).read_bytes())['tolerances']
+        self.keys = np.asarray(np.load(directory / KEYS_FILE, mmap_mode='r'))
+        self.positions = np.asarray(np.load(directory / POSITIONS_FILE, mmap_mode='r'))
+        self.tiers = {
+            tolerance: (np.asarray(np.load(directory / f'{tolerance:g}.npy', mmap_mode='r')),
+                        np.asarray(np.load(directory / f'{tolerance:g}_offsets.npy', mmap_mode='r')))
+            for tolerance in self.tolerances
+        }
+
+    @classmethod
+    def open(cls, path):
+        # False rather than None, so a snapshot without a pyramid is remembered as such; it is built with
+        # the snapshot, never on a request
+        if not (path / DIRECTORY / PYRAMID_FILE).exists():
+            return False
+        return cls(path)
+
+    def tolerance(self, resolution):
+        # The coarsest tolerance not above the resolution, 0 (full resolution) when there is none
+        fitting = [tolerance for tolerance in self.tolerances if tolerance <= resolution]
+        return fitting[-1] if fitting else 0
+
+    def wkt(self, level, teryt, tolerance):
+        key = _key(level, teryt)
+        position = int(np.searchsorted(self.keys, key))
+        if position >= len(self.keys) or self.keys[position] != key:
+            return None
+        if not tolerance:
+            geometry = prg_snapshot.read_geometries(self.path, [int(self.positions[position])])[0]
+            return shapely.to_wkt(geometry, rounding_precision=PRECISION)
+        blob, offsets = self.tiers[tolerance]
+        return bytes(blob[offsets[position]:offsets[position + 1]]).decode()
+
+
+def get_pyramid():
+    return prg_snapshot.artifacts.get('geometry_pyramid', GeometryPyramid.open) or None
+
+
+def requested_resolution(request):
+    # Metres per pixel from ?resolution= or ?zoom=, None for full resolution; ValueError when invalid
+    resolution = request.query_params.get('resolution')
+    zoom = request.query_params.get('zoom')
+    if resolution:
+        resolution = float(resolution)
+        if not resolution > 0:
+            raise ValueError(resolution)
+        return resolution
+    if zoom:
+        zoom = float(zoom)
+        if not 0 <= zoom <= 30:
+            raise ValueError(zoom)
+        return ZOOM_0_RESOLUTION / 2 ** zoom
+    return None
+
+
+def geometry_extension(request, level):
+    # The http_cache `extend` function adding the boundary to a by-ID result, when requested
+    if INCLUDE not in request.query_params.get('include', '').split(','):
+        return None
+    resolution = requested_resolution(request)
+
+    def extend(data):
+        pyramid = get_pyramid()
+        tolerance = pyramid.tolerance(resolution) if pyramid and resolution else 0
+        wkt = pyramid.wkt(level, data[f'{level}_id'], tolerance) if pyramid else None
+        return {**data, 'geometry': wkt, 'geometry_tolerance': tolerance if wkt else None}
+
+    return extend
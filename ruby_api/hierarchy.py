@@ -0,0 +1,47 @@
+from ruby_api import prg_snapshot
+from ruby_api.administrative import COUNTY, HIERARCHY, REGION, VOIVODESHIP, parent_teryts, xy_unit
+from ruby_api.entities import result_entity_id
+
+# ?include=hierarchy on the parcel and building endpoints. A parcel or building ID starts with the TERYT
+# code of its obręb (WWPPGG_R.OOOO.<number>, e.g. 120614_2.0001.123/1), which in turn starts with the
+# codes of its commune, county and voivodeship. Names and REGON come from the units of the local PRG
+# snapshot, so the enriched response needs no upstream request.
+
+INCLUDE = 'hierarchy'
+
+
+def entity_teryts(entity_id):
+    # TERYT codes per level encoded in a parcel or building ID
+    parts = entity_id.split('.')
+    if len(parts) < 2:
+        # Not WWPPGG_R.OOOO...; the leading voivodeship and county codes are still worth a lookup
+        return {VOIVODESHIP: entity_id[:2], COUNTY: entity_id[:4]}
+    region = f'{parts[0]}.{parts[1]}'
+    return {**parent_teryts(REGION, region), REGION: region}
+
+
+def get_units():
+    return prg_snapshot.artifacts.get('units_by_teryt', prg_snapshot.units_by_teryt) or {}
+
+
+def entity_hierarchy(entity_id):
+    units = get_units()
+    codes = entity_teryts(entity_id)
+    hierarchy = {}
+    for level in HIERARCHY:
+        unit = units.get(level, {}).get(codes.get(level))
+        properties = {attribute: unit[field] for field, attribute in prg_snapshot.ATTRIBUTES.items()} if unit else None
+        hierarchy[level] = xy_unit(level, properties) if unit else None
+    return hierarchy
+
+
+def hierarchy_extension(request, kind):
+    # The http_cache `extend` function adding the hierarchy to a parcel or building result, when requested
+    if INCLUDE not in request.query_params.get('include', '').split(','):
+        return None
+
+    def extend(data):
+        entity_id = result_entity_id(kind, data)
+        return {**data, 'hierarchy': entity_hierarchy(entity_id) if entity_id else None}
+
+    return extend
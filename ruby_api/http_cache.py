@@ -0,0 +1,249 @@
+import asyncio
+import gzip
+import hashlib
+import time
+
+import orjson
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from ruby_api.namespaces import acurrent, cacheable, current
+from ruby_api.renderers import dumps
+
+# Every cached payload has a small companion entry ("<key>_meta") holding its ETag and expiry.
+# A conditional request is answered from that entry alone, without fetching and unpickling the payload.
+# It can also carry the namespace stamps of the parcels and buildings in the payload (ruby_api.namespaces);
+# once one of them was invalidated, the entry is a miss.
+META_SUFFIX = '_meta'
+
+# Next to the payload dict, the final JSON body is cached as-is and gzip-compressed. A JSON cache hit
+# returns those bytes directly: no unpickling of the dict, no DRF rendering, no compression.
+BODY_SUFFIX = '_json'
+GZIP_BODY_SUFFIX = '_json_gz'
+
+
+def meta_key(cache_key):
+    return f'{cache_key}{META_SUFFIX}'
+
+
+def body_key(cache_key, gzipped):
+    return f'{cache_key}{GZIP_BODY_SUFFIX if gzipped else BODY_SUFFIX}'
+
+
+def entry_keys(cache_key):
+    # Every entry stored for one cached response
+    return [cache_key, meta_key(cache_key), body_key(cache_key, False), body_key(cache_key, True)]
+
+
+def payload_etag(data):
+    return '"' + hashlib.sha256(dumps(data, orjson.OPT_SORT_KEYS)).hexdigest()[:32] + '"'
+
+
+def build_meta(data, timeout, stamps=None):
+    meta = {'etag': payload_etag(data), 'expires': time.time() + timeout if timeout else None}
+    if stamps:
+        meta['namespaces'] = stamps
+    return meta
+
+
+def valid(meta):
+    return current(meta.get('namespaces') if meta else None)
+
+
+async def avalid(meta):
+    return await acurrent(meta.get('namespaces') if meta else None)
+
+
+def gzip_etag(etag):
+    # The gzip body is a different representation than the identity one, so it has its own strong ETag
+    return etag[:-1] + '-gz"'
+
+
+def cache_headers(meta, etag=None):
+    headers = {'ETag': etag or meta['etag']}
+    if meta.get('expires') is not None:
+        max_age = max(0, round(meta['expires'] - time.time()))
+        headers['Cache-Control'] = f'public, max-age={max_age}'
+    return headers
+
+
+def etag_matches(request, etag):
+    # ETag of the representation (identity or gzip) the client already has, None if it has neither
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return None
+    if header.strip() == '*':
+        return etag
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored
+    candidates = {value.strip().removeprefix('W/') for value in header.split(',')}
+    for variant in (etag, gzip_etag(etag)):
+        if variant in candidates:
+            return variant
+    return None
+
+
+def accepts_gzip(request):
+    for coding in request.headers.get('Accept-Encoding', '').split(','):
+        name, _, params = coding.partition(';')
+        if name.strip().lower() in ('gzip', '*'):
+            return params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000')
+    return False
+
+
+def serves_rendered(request):
+    if not settings.CACHE_RENDERED_RESPONSES:
+        return False
+    renderer = getattr(request, 'accepted_renderer', None)
+    # The ?debug=timing trailer is added to response.data, so those requests take the regular path
+    return (renderer is not None and renderer.format == 'json'
+            and not (settings.SERVER_TIMING_DEBUG and request.GET.get('debug') == 'timing'))
+
+
+def json_renderer():
+    for renderer_class in api_settings.DEFAULT_RENDERER_CLASSES:
+        if renderer_class.format == 'json':
+            return renderer_class()
+    return None
+
+
+def render_bodies(result):
+    renderer = json_renderer()
+    if renderer is None:
+        return {}
+    body = renderer.render(result, renderer.media_type, {})
+    return {False: body, True: gzip.compress(body, compresslevel=6, mtime=0)}
+
+
+def rendered_response(body, meta, gzipped):
+    etag = gzip_etag(meta['etag']) if gzipped else None
+    response = HttpResponse(body, content_type='application/json', headers=cache_headers(meta, etag))
+    if gzipped:
+        response['Content-Encoding'] = 'gzip'
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+def not_modified(meta, etag):
+    return Response(status=304, headers=cache_headers(meta, etag))
+
+
+def respond(request, data, meta):
+    etag = etag_matches(request, meta['etag'])
+    if etag:
+        return not_modified(meta, etag)
+    return Response(data, headers=cache_headers(meta))
+
+
+def fresh_response(request, result, timeout):
+    # Same validators and lifetime as a cached response, for results that are not worth caching
+    return respond(request, result, build_meta(result, timeout))
+
+
+def respond_extended(request, data, meta, extend):
+    # A representation derived from a cached payload (e.g. ?include=hierarchy): the payload is cached as
+    # usual, the response carries the ETag of what is actually sent and the payload's expiry
+    data = extend(data)
+    return respond(request, data, {'etag': payload_etag(data), 'expires': meta.get('expires') if meta else None})
+
+
+def respond_entries(request, data, meta):
+    if not data:
+        return None
+    if meta is None:
+        # Entry written before validators existed: still give it an ETag, but no freshness lifetime
+        meta = build_meta(data, None)
+    return respond(request, data, meta)
+
+
+def cached_response(request, cache_key, extend=None):
+    if extend is not None:
+        entries = cache.get_many([cache_key, meta_key(cache_key)])
+        data, meta = entries.get(cache_key), entries.get(meta_key(cache_key))
+        return respond_extended(request, data, meta, extend) if data and valid(meta) else None
+
+    if request.headers.get('If-None-Match'):
+        meta = cache.get(meta_key(cache_key))
+        etag = etag_matches(request, meta['etag']) if meta else None
+        if etag and valid(meta):
+            return not_modified(meta, etag)
+
+    if serves_rendered(request):
+        gzipped = accepts_gzip(request)
+        entries = cache.get_many([meta_key(cache_key), body_key(cache_key, gzipped)])
+        if len(entries) == 2 and valid(entries[meta_key(cache_key)]):
+            return rendered_response(entries[body_key(cache_key, gzipped)], entries[meta_key(cache_key)], gzipped)
+
+    entries = cache.get_many([cache_key, meta_key(cache_key)])
+    meta = entries.get(meta_key(cache_key))
+    return respond_entries(request, entries.get(cache_key), meta) if valid(meta) else None
+
+
+async def acached_response(request, cache_key, extend=None):
+    if extend is not None:
+        entries = await cache.aget_many([cache_key, meta_key(cache_key)])
+        data, meta = entries.get(cache_key), entries.get(meta_key(cache_key))
+        return respond_extended(request, data, meta, extend) if data and await avalid(meta) else None
+
+    if request.headers.get('If-None-Match'):
+        meta = await cache.aget(meta_key(cache_key))
+        etag = etag_matches(request, meta['etag']) if meta else None
+        if etag and await avalid(meta):
+            return not_modified(meta, etag)
+
+    if serves_rendered(request):
+        gzipped = accepts_gzip(request)
+        entries = await cache.aget_many([meta_key(cache_key), body_key(cache_key, gzipped)])
+        if len(entries) == 2 and await avalid(entries[meta_key(cache_key)]):
+            return rendered_response(entries[body_key(cache_key, gzipped)], entries[meta_key(cache_key)], gzipped)
+
+    entries = await cache.aget_many([cache_key, meta_key(cache_key)])
+    meta = entries.get(meta_key(cache_key))
+    return respond_entries(request, entries.get(cache_key), meta) if await avalid(meta) else None
+
+
+def cache_entries(cache_key, result, timeout, stamps=None):
+    meta = build_meta(result, timeout, stamps)
+    entries = {cache_key: result, meta_key(cache_key): meta}
+    bodies = render_bodies(result) if settings.CACHE_RENDERED_RESPONSES else {}
+    for gzipped, body in bodies.items():
+        entries[body_key(cache_key, gzipped)] = body
+    return entries, meta, bodies
+
+
+def fresh_rendered_response(request, result, meta, bodies):
+    # The body was rendered for the cache already; reuse it instead of letting DRF render it again
+    if bodies and serves_rendered(request) and not etag_matches(request, meta['etag']):
+        gzipped = accepts_gzip(request)
+        return rendered_response(bodies[gzipped], meta, gzipped)
+    return respond(request, result, meta)
+
+
+def cache_response(request, cache_key, result, timeout, extend=None):
+    entries, meta, bodies = cache_entries(cache_key, result, timeout)
+    cache.set_many(entries, timeout=timeout)
+    if extend is not None:
+        return respond_extended(request, result, meta, extend)
+    return fresh_rendered_response(request, result, meta, bodies)
+
+
+async def acache_response(request, cache_key, result, timeout, extend=None, stamps=None):
+    entries, meta, bodies = cache_entries(cache_key, result, timeout, stamps)
+    # Not kept when it holds an entity whose units could not be invalidated
+    if cacheable(stamps):
+        await cache.aset_many(entries, timeout=timeout)
+    if extend is not None:
+        return respond_extended(request, result, meta, extend)
+    return fresh_rendered_response(request, result, meta, bodies)
+
+
+async def acache_results(results):
+    # Caches (cache_key, result, timeout) triples with one set_many per distinct timeout
+    groups = {}
+    for cache_key, result, timeout in results:
+        groups.setdefault(timeout, {}).update(cache_entries(cache_key, result, timeout)[0])
+    await asyncio.gather(*(cache.aset_many(entries, timeout=timeout) for timeout, entries in groups.items()))
@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ruby_api import namespaces, ttl
+
+
+class Command(BaseCommand):
+    help = ('Show or change the base cache TTL of a kind of entry, for every region or for a TERYT prefix '
+            '(voivodeship WW, county WWPP, commune WWPPGG_R). Workers pick changes up within '
+            'CACHE_TTL_POLICY_CHECK_INTERVAL seconds.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', nargs='?', choices=['show', 'set', 'unset'], default='show')
+        parser.add_argument('kind', nargs='?', help=f"One of: {', '.join(settings.CACHE_TTLS)}")
+        parser.add_argument('seconds', nargs='?', type=int, help='Base TTL (set only)')
+        parser.add_argument('--teryt', default='', help='TERYT prefix the TTL applies to (default: everywhere)')
+
+    def handle(self, *args, **options):
+        action, kind, teryt = options['action'], options['kind'], options['teryt']
+        if action != 'show':
+            if kind not in settings.CACHE_TTLS:
+                raise CommandError(f"Unknown kind {kind!r}; expected one of: {', '.join(settings.CACHE_TTLS)}")
+            # Lookups match the prefix against whole codes, so anything else would never apply
+            if teryt and namespaces.level(teryt) is None:
+                raise CommandError(f'Invalid TERYT prefix {teryt!r}; expected a voivodeship (WW), county (WWPP) '
+                                   'or commune (WWPPGG_R) code')
+            if action == 'set':
+                if options['seconds'] is None or options['seconds'] <= 0:
+                    raise CommandError('set needs a TTL in seconds greater than 0')
+                ttl.set_override(kind, options['seconds'], teryt)
+            else:
+                ttl.remove_override(kind, teryt)
+
+        overrides = ttl.overrides()
+        for name, default in settings.CACHE_TTLS.items():
+            self.stdout.write(f'{name:15} {default:>10} s')
+            for prefix, seconds in sorted(overrides.get(name, {}).items()):
+                self.stdout.write(self.style.WARNING(f"{'':15} {seconds:>10} s  {prefix or '(everywhere)'}"))
@@ -0,0 +1,29 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ruby_api.administrative import PRG_LAYERS
+from ruby_api.prg_ingest import ingest, summary
+
+
+class Command(BaseCommand):
+    help = 'Load a PRG export (GML, GeoPackage or Shapefile layers A01-A06, zipped or not) into the local PRG snapshot'
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help='Export file (.gml, .gpkg, .shp, .zip) or a directory of them')
+        parser.add_argument('--levels', nargs='*', choices=list(PRG_LAYERS.values()),
+                            help='Levels to ingest (default: every PRG layer found)')
+        parser.add_argument('--encoding', help='Attribute encoding of Shapefiles without a .cpg file, e.g. cp1250')
+        parser.add_argument('--force', action='store_true', help='Publish a new version even if nothing changed')
+        parser.add_argument('--json', action='store_true', help='Print the manifest as JSON')
+
+    def handle(self, *args, **options):
+        try:
+            manifest = ingest(options['source'], options['levels'], options['encoding'], options['force'])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        if options['json']:
+            self.stdout.write(json.dumps(manifest, indent=2))
+            return
+        self.stdout.write(self.style.SUCCESS(summary(manifest)))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ruby_api import namespaces
+from ruby_api.entities import KINDS
+
+
+class Command(BaseCommand):
+    help = ('Invalidate every cached parcel and building of a voivodeship (WW), county (WWPP) or commune (WWPPGG_R), '
+            'e.g. after an EGiB update. Takes constant time; the old entries age out. Workers pick it up within '
+            'CACHE_NAMESPACE_CHECK_INTERVAL seconds.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('teryt', nargs='+', help='TERYT codes of the units')
+        parser.add_argument('--kind', choices=KINDS, action='append', help='Only this kind of entry (default: all)')
+        parser.add_argument('--show', action='store_true', help='Only print the current generations')
+
+    def handle(self, *args, **options):
+        kinds = options['kind'] or KINDS
+        for teryt in options['teryt']:
+            level = namespaces.level(teryt)
+            if level is None:
+                raise CommandError(f'Invalid TERYT code {teryt!r}; expected WW, WWPP or WWPPGG_R')
+
+        for teryt in options['teryt']:
+            if options['show']:
+                generations = namespaces.generations(teryt, kinds)
+            else:
+                generations = namespaces.invalidate(teryt, kinds)
+            line = ', '.join(f'{kind} {generation}' for kind, generation in generations.items())
+            message = f'{namespaces.level(teryt)} {teryt}: generation {line}'
+            self.stdout.write(message if options['show'] else self.style.SUCCESS(f'Invalidated {message}'))
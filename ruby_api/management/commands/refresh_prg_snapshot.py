@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from ruby_api import prg_snapshot
+from ruby_api.prg_ingest import summary
+
+
+class Command(BaseCommand):
+    help = 'Download every administrative unit (and its boundary) from PRG WFS and publish it as a new local PRG snapshot'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, help='Features per WFS request')
+        parser.add_argument('--no-geometry', action='store_true',
+                            help='Fetch attributes only; XY lookups then keep using PRG WMS')
+        parser.add_argument('--force', action='store_true', help='Publish a new version even if nothing changed')
+
+    def handle(self, *args, **options):
+        manifest = prg_snapshot.refresh_from_wfs(options['page_size'], geometry=not options['no_geometry'],
+                                                 force=options['force'])
+        self.stdout.write(self.style.SUCCESS(summary(manifest)))
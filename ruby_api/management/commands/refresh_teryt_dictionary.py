@@ -0,0 +1,38 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ruby_api import teryt_dictionary
+from ruby_api.prg_ingest import summary
+
+
+class Command(BaseCommand):
+    help = ('Update the voivodeships, counties and communes of the local PRG snapshot (the TERYT dictionary behind '
+            'the by-ID endpoints) from PRG WFS, attributes only')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, help='Features per WFS request')
+        parser.add_argument('--force', action='store_true', help='Publish a new version even if nothing changed')
+        parser.add_argument('--check', action='store_true',
+                            help='Only compare the dictionary with PRG WFS; exits with an error when they differ')
+        parser.add_argument('--json', action='store_true', help='Print the --check report as JSON')
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            manifest = teryt_dictionary.refresh(options['page_size'], force=options['force'])
+            self.stdout.write(self.style.SUCCESS(summary(manifest)))
+            return
+
+        report = teryt_dictionary.check(options['page_size'])
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            for change in ('added', 'changed', 'removed'):
+                for unit_id in report[change]:
+                    self.stdout.write(f'{change:8} {unit_id}')
+        line = (f"TERYT dictionary {report['version']} ({report['digest']}) against {report['checked']} PRG units: "
+                f"+{len(report['added'])} added, {len(report['changed'])} changed, -{len(report['removed'])} removed, "
+                f"{report['duration_s']} s")
+        if report['drift']:
+            raise CommandError(line)
+        self.stdout.write(self.style.SUCCESS(line))
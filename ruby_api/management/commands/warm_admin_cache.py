@@ -0,0 +1,32 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from ruby_api.administrative import LEVELS
+from ruby_api.warmup import warm
+
+
+class Command(BaseCommand):
+    help = 'Prefetch every voivodeship, county, commune and obręb from PRG WFS into the by-ID view caches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--levels', nargs='*', choices=list(LEVELS), help='Levels to warm (default: all)')
+        parser.add_argument('--page-size', type=int, help='Features per WFS request')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    def handle(self, *args, **options):
+        report = warm(options['levels'], options['page_size'])
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        for result in report['levels']:
+            expected = f" of ~{result['expected']}" if result['expected'] else ''
+            line = (f"{result['level']:12} {result['fetched']:>6} fetched in {result['pages']} pages, "
+                    f"{result['cached']} cached{expected} ({result['coverage']:.1%}), {result['duration_s']} s")
+            if result['error']:
+                self.stdout.write(self.style.ERROR(f"{line} - stopped: {result['error']}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(line))
+        self.stdout.write(f"Total {report['duration_s']} s")
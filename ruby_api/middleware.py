@@ -0,0 +1,68 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from ruby_api.timing import Timing, activate, deactivate
+
+
+class ServerTimingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        timing = Timing()
+        request.timing = timing
+        token = activate(timing)
+        try:
+            response = self.get_response(request)
+        finally:
+            deactivate(token)
+
+        return self._add_header(response, timing)
+
+    async def __acall__(self, request):
+        timing = Timing()
+        request.timing = timing
+        token = activate(timing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            deactivate(token)
+
+        return self._add_header(response, timing)
+
+    @staticmethod
+    def _add_header(response, timing):
+        header = timing.header()
+        if header:
+            response['Server-Timing'] = header
+        return response
+
+    def process_template_response(self, request, response):
+        timing = getattr(request, 'timing', None)
+        if timing is None:
+            return response
+
+        if self._trailer_requested(request) and isinstance(getattr(response, 'data', None), dict):
+            response.data = {**response.data, '_timing': timing.as_dict()}
+
+        started = time.perf_counter()
+
+        def finish_render(rendered):
+            timing.add_span('render', time.perf_counter() - started)
+
+        response.add_post_render_callback(finish_render)
+        return response
+
+    @staticmethod
+    def _trailer_requested(request):
+        return settings.SERVER_TIMING_DEBUG and request.GET.get('debug') == 'timing'
@@ -0,0 +1,117 @@
+import bisect
+import heapq
+import re
+import unicodedata
+from array import array
+
+from ruby_api import prg_snapshot
+from ruby_api.administrative import COUNTY, COMMUNE, REGION
+
+# In-memory name search over the PRG snapshot: trigram postings for substring queries of 3+ characters,
+# a sorted word list for shorter (prefix) queries. Names are compared after folding case and diacritics,
+# so "lodz", "Łódź" and "ŁÓDŹ" are the same query.
+
+INDEXED_LEVELS = (COUNTY, COMMUNE, REGION)
+# Larger units first when the same name exists on several levels
+LEVEL_ORDER = {level: position for position, level in enumerate(INDEXED_LEVELS)}
+
+_UNDECOMPOSED = str.maketrans({'ł': 'l', 'Ł': 'l', 'ß': 'ss'})
+_SEPARATORS = re.compile(r'[^0-9a-z]+')
+_EMPTY = array('I')
+
+
+def fold(text):
+    text = unicodedata.normalize('NFKD', (text or '').translate(_UNDECOMPOSED).lower())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(word for word in _SEPARATORS.split(text) if word)
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class NameIndex:
+    def __init__(self, units):
+        # Positions follow the static part of the ranking (level, name length, name), so sorting matches
+        # of equal quality is a sort of plain integers
+        indexed = [(fold(unit['name']), unit) for unit in units if unit['level'] in LEVEL_ORDER]
+        indexed.sort(key=lambda item: (LEVEL_ORDER[item[1]['level']], len(item[0]), item[0], item[1]['teryt']))
+        self.units = [unit for _, unit in indexed]
+        self.names = [name for name, _ in indexed]
+
+        postings = {}
+        exact = {}
+        words = []
+        for position, name in enumerate(self.names):
+            exact.setdefault(name, []).append(position)
+            for gram in trigrams(name):
+                postings.setdefault(gram, []).append(position)
+            for word in set(name.split()):
+                words.append((word, position))
+        self.postings = {gram: array('I', positions) for gram, positions in postings.items()}
+        self.exact = exact
+
+        # Prefix lookups are a bisect over the sorted keys and a slice of the aligned positions
+        words.sort()
+        self.word_keys = [word for word, _ in words]
+        self.word_positions = array('I', [position for _, position in words])
+        names = sorted((name, position) for position, name in enumerate(self.names))
+        self.name_keys = [name for name, _ in names]
+        self.name_positions = array('I', [position for _, position in names])
+
+    def __len__(self):
+        return len(self.units)
+
+    @staticmethod
+    def _prefixed(keys, positions, prefix):
+        return positions[bisect.bisect_left(keys, prefix):bisect.bisect_left(keys, prefix + '\uffff')]
+
+    def _candidates(self, folded):
+        if len(folded) >= 3:
+            grams = trigrams(folded)
+            lists = sorted((self.postings.get(gram, _EMPTY) for gram in grams), key=len)
+            matches = set(lists[0])
+            for positions in lists[1:]:
+                if not matches:
+                    break
+                matches.intersection_update(positions)
+            if len(folded) == 3:
+                return matches
+            # Sharing all trigrams does not make the query a substring
+            return {position for position in matches if folded in self.names[position]}
+
+        # Too short for trigrams: names with a word starting with the query
+        return set(self._prefixed(self.word_keys, self.word_positions, folded))
+
+    def _ranked(self, folded, candidates, needed):
+        # Exact name, then name prefix, then word prefix, then any substring. Only the first `needed`
+        # positions are ordered; large match sets mostly fall outside the requested page.
+        exact = candidates.intersection(self.exact.get(folded, ()))
+        prefix = candidates.intersection(self._prefixed(self.name_keys, self.name_positions, folded)) - exact
+        word = candidates.intersection(self._prefixed(self.word_keys, self.word_positions, folded.split()[0]))
+        if ' ' in folded:
+            word = {position for position in word if f' {folded}' in f' {self.names[position]}'}
+        word -= exact | prefix
+        rest = candidates - exact - prefix - word
+        ranked = []
+        for bucket in (exact, prefix, word, rest):
+            if len(ranked) >= needed:
+                break
+            ranked.extend(heapq.nsmallest(needed - len(ranked), bucket))
+        return ranked
+
+    def search(self, query, levels=None, offset=0, limit=10):
+        folded = fold(query)
+        if not folded:
+            return 0, []
+
+        candidates = self._candidates(folded)
+        if levels:
+            candidates = {position for position in candidates if self.units[position]['level'] in levels}
+
+        ranked = self._ranked(folded, candidates, offset + limit)
+        return len(candidates), [self.units[position] for position in ranked[offset:]]
+
+
+def get_index():
+    return prg_snapshot.artifacts.get('name_index', lambda path: NameIndex(prg_snapshot.read_units(path)))
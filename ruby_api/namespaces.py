@@ -0,0 +1,147 @@
+import re
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from ruby_api.administrative import COMMUNE, COUNTY, REGION, VOIVODESHIP, parent_teryts
+
+# Invalidation of everything cached for a voivodeship, county or commune, e.g. when a county announces an
+# EGiB update, without scanning Redis.
+#
+# Every entity kind (parcel, building) has a generation counter per TERYT prefix, "cache_namespace_<kind>_
+# <teryt>", kept without expiry. The generation of an entity is the sum of the counters of its voivodeship,
+# county and commune, and is folded into its cache key (ruby_api.entities.entity_key). Invalidating a unit
+# increments one counter per kind, so every entity below it moves to keys nothing has written yet; the old
+# entries are never read again and age out with their TTL. Entries whose key cannot carry the generation
+# (XY lookups, whose unit is only known once they are answered) record the generations of the entities
+# they hold as stamps in their meta, and a stamp that is behind counts as a miss.
+#
+# An ID whose voivodeship, county or commune prefix is not a valid TERYT code of that level could not be
+# invalidated with its unit, so it has no generation (None) and nothing holding it is cached.
+#
+# Workers keep the counters they have read in memory. Every invalidation also increments EPOCH_KEY, which
+# workers check every CACHE_NAMESPACE_CHECK_INTERVAL seconds, dropping their counters when it changed.
+
+EPOCH_KEY = 'cache_namespaces_epoch'
+COUNTER_PREFIX = 'cache_namespace_'
+
+# The TERYT codes a unit of each level has
+LEVEL_PATTERNS = {
+    VOIVODESHIP: re.compile(r'\d{2}'),
+    COUNTY: re.compile(r'\d{4}'),
+    COMMUNE: re.compile(r'\d{6}_\d'),
+}
+
+_state = {'epoch': None, 'checked_at': None, 'generations': {}}
+
+
+def counter_key(kind, teryt):
+    return f'{COUNTER_PREFIX}{kind}_{teryt}'
+
+
+def level(teryt):
+    for name, pattern in LEVEL_PATTERNS.items():
+        if pattern.fullmatch(teryt):
+            return name
+    return None
+
+
+def _counter_keys(kind, entity_id):
+    # Voivodeship WW, county WWPP and commune WWPPGG_R an entity ID starts with; None when one is not valid
+    teryts = parent_teryts(REGION, entity_id)
+    if not all(LEVEL_PATTERNS[name].fullmatch(teryt) for name, teryt in teryts.items()):
+        return None
+    return [counter_key(kind, teryt) for teryt in teryts.values()]
+
+
+def _stale():
+    checked_at = _state['checked_at']
+    return checked_at is None or time.monotonic() - checked_at >= settings.CACHE_NAMESPACE_CHECK_INTERVAL
+
+
+def _checked(epoch):
+    if epoch != _state['epoch']:
+        _state['epoch'] = epoch
+        _state['generations'] = {}
+    _state['checked_at'] = time.monotonic()
+
+
+def _missing(keys):
+    return [key for key in keys if key not in _state['generations']]
+
+
+def _loaded(keys, found):
+    for key in keys:
+        _state['generations'][key] = found.get(key, 0)
+
+
+def _sum(keys):
+    return sum(_state['generations'][key] for key in keys)
+
+
+def generation(kind, entity_id):
+    keys = _counter_keys(kind, entity_id)
+    if keys is None:
+        return None
+    if _stale():
+        _checked(cache.get(EPOCH_KEY))
+    missing = _missing(keys)
+    if missing:
+        _loaded(missing, cache.get_many(missing))
+    return _sum(keys)
+
+
+async def ageneration(kind, entity_id):
+    keys = _counter_keys(kind, entity_id)
+    if keys is None:
+        return None
+    if _stale():
+        _checked(await cache.aget(EPOCH_KEY))
+    missing = _missing(keys)
+    if missing:
+        _loaded(missing, await cache.aget_many(missing))
+    return _sum(keys)
+
+
+async def astamps(entities):
+    # (kind, entity ID, generation) of every (kind, entity ID), for the meta of an entry holding them
+    return [(kind, entity_id, await ageneration(kind, entity_id)) for kind, entity_id in dict.fromkeys(entities)]
+
+
+def cacheable(stamps):
+    return all(stamp is not None for _, _, stamp in stamps or ())
+
+
+def current(stamps):
+    return cacheable(stamps) and all(generation(kind, entity_id) == stamp for kind, entity_id, stamp in stamps or ())
+
+
+async def acurrent(stamps):
+    if not cacheable(stamps):
+        return False
+    for kind, entity_id, stamp in stamps or ():
+        if await ageneration(kind, entity_id) != stamp:
+            return False
+    return True
+
+
+def _increment(key):
+    # Counters never expire: one that went missing would bring entries of earlier generations back
+    cache.add(key, 0, None)
+    return cache.incr(key)
+
+
+def invalidate(teryt, kinds):
+    # Generation per kind after invalidating the unit. The counter goes first, so a worker that sees the new
+    # epoch also sees the new generation.
+    generations = {kind: _increment(counter_key(kind, teryt)) for kind in kinds}
+    _increment(EPOCH_KEY)
+    _state['checked_at'] = None
+    return generations
+
+
+def generations(teryt, kinds):
+    # Counters of the unit itself, without those of the units above it
+    found = cache.get_many([counter_key(kind, teryt) for kind in kinds])
+    return {kind: found.get(counter_key(kind, teryt), 0) for kind in kinds}
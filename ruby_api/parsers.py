@@ -0,0 +1,152 @@
+from contextlib import aclosing
+
+from lxml import etree
+
+GML_NS = 'http://www.opengis.net/gml'
+WFS_NAMESPACES = {
+    'wfs': 'http://www.opengis.net/wfs/2.0',
+    'ms': 'http://mapserver.gis.umn.edu/mapserver',
+    'gml': 'http://www.opengis.net/gml/3.2'
+}
+
+GML_SKIPPED_TAGS = {'FeatureCollection', 'featureMember', 'boundedBy', 'Box', 'coordinates'}
+WFS_SKIPPED_TAGS = {'GEOMETRY', 'SHAPE', 'geometry', 'boundedBy'}
+
+PARSER_OPTIONS = {'resolve_entities': False, 'no_network': True, 'huge_tree': True}
+_PARSER = etree.XMLParser(**PARSER_OPTIONS)
+
+_FEATURE_MEMBERS = etree.XPath('.//gml:featureMember', namespaces={'gml': GML_NS})
+
+
+def _parse(xml_content):
+    return etree.fromstring(xml_content, _PARSER)
+
+
+def _local_name(tag):
+    return tag.split('}')[-1] if '}' in tag else tag
+
+
+def _gugik_feature(layer):
+    feature_data = {}
+    for attribute in layer.iterchildren(etree.Element):
+        text = (attribute.text or '').strip()
+        if text and not text.startswith('<') and not text.startswith('http'):
+            feature_data[attribute.get('Name', '')] = text
+    return feature_data
+
+
+def parse_gugik_feature_info_layers(xml_content):
+    # Features per layer ("dzialki", "budynki"), for GetFeatureInfo over several layers at once
+    try:
+        root = _parse(xml_content)
+        layers = {}
+
+        for feature_member in _FEATURE_MEMBERS(root):
+            for layer in feature_member.iterchildren(etree.Element):
+                feature_data = _gugik_feature(layer)
+                if feature_data:
+                    layers.setdefault(layer.get('Name', ''), []).append(feature_data)
+
+        return layers
+    except Exception:
+        return {}
+
+
+def parse_gml_layers(xml_content):
+    # Attributes of the first feature of every layer in a MapServer GML GetFeatureInfo response
+    # (<LAYER_layer><LAYER_feature>...), so layers queried together do not overwrite each other
+    try:
+        root = _parse(xml_content)
+        layers = {}
+
+        for layer in root.iterchildren(etree.Element):
+            name = _local_name(layer.tag).removesuffix('_layer')
+            for feature in layer.iterchildren(f'{name}_feature'):
+                data = {}
+                for elem in feature.iterchildren(etree.Element):
+                    text = (elem.text or '').strip()
+                    tag = _local_name(elem.tag)
+                    if text and tag not in GML_SKIPPED_TAGS:
+                        data[tag] = text
+                if data:
+                    layers[name] = data
+                    break
+
+        return layers
+    except Exception:
+        return {}
+
+
+def _wfs_feature_data(feature):
+    data = {}
+    for child in feature.iterchildren(etree.Element):
+        tag = _local_name(child.tag)
+        if child.text and tag not in WFS_SKIPPED_TAGS:
+            data[tag] = child.text.strip()
+    return data
+
+
+def _feature_parser(layer_name):
+    return etree.XMLPullParser(events=('end',), tag=f"{{{WFS_NAMESPACES['ms']}}}{layer_name}", **PARSER_OPTIONS)
+
+
+def _converted_features(parser):
+    for _, feature in parser.read_events():
+        data = _wfs_feature_data(feature)
+        _discard(feature)
+        yield data
+
+
+def iter_wfs_features(chunks, layer_name):
+    parser = _feature_parser(layer_name)
+
+    for chunk in chunks:
+        parser.feed(chunk)
+        yield from _converted_features(parser)
+
+    parser.close()
+    yield from _converted_features(parser)
+
+
+async def aiter_wfs_features(chunks, layer_name):
+    parser = _feature_parser(layer_name)
+
+    async for chunk in chunks:
+        parser.feed(chunk)
+        for data in _converted_features(parser):
+            yield data
+
+    parser.close()
+    for data in _converted_features(parser):
+        yield data
+
+
+def _discard(feature):
+    member = feature.getparent()
+    feature.clear(keep_tail=False)
+    for node in (feature, member):
+        if node is None:
+            continue
+        while node.getprevious() is not None:
+            del node.getparent()[0]
+
+
+async def aparse_wfs_stream(chunks, layer_name):
+    try:
+        async with aclosing(aiter_wfs_features(chunks, layer_name)) as features:
+            async for data in features:
+                return data
+        return None
+    except etree.XMLSyntaxError:
+        return None
+
+
+async def aparse_wfs_multi_stream(chunks, layer_name):
+    results = []
+    try:
+        async for data in aiter_wfs_features(chunks, layer_name):
+            if data:
+                results.append(data)
+    except etree.XMLSyntaxError:
+        return []
+    return results
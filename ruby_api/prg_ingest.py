@@ -0,0 +1,165 @@
+import re
+import time
+import zipfile
+from functools import partial
+from pathlib import Path
+
+from django.core.cache import cache
+
+from ruby_api import prg_snapshot
+from ruby_api.administrative import LEVELS, PRG_LAYERS, cache_key
+from ruby_api.http_cache import entry_keys
+
+# Loading PRG into the local snapshot, either from a PRG export (GML, GeoPackage or Shapefile, as
+# downloaded from geoportal.gov.pl, optionally still zipped) or from PRG WFS (prg_snapshot.fetch_units).
+#
+# Updates are incremental: the new units of the ingested levels are compared with the current snapshot
+# by per-unit hashes of attributes and boundary. Levels that were not ingested are carried over, nothing
+# is published when nothing changed, and only the cached by-ID responses of units whose attributes
+# changed (or that disappeared) are invalidated. The units files of a new version are always written
+# whole, but derived artifacts whose inputs did not change are hard-linked from the previous version
+# (prg_snapshot.build_artifacts); units are kept in PRG layer order, so re-ingesting some levels does
+# not move the others.
+
+SOURCE_SUFFIXES = {'.gml', '.gpkg', '.shp', '.zip'}
+# Position of every level in units.json, A01 first
+LEVEL_ORDER = {level: position for position, level in enumerate(PRG_LAYERS.values())}
+_LAYER_CODE = re.compile(r'^(A0[1-6])', re.IGNORECASE)
+
+
+def layer_level(name):
+    match = _LAYER_CODE.match(Path(name).name)
+    return PRG_LAYERS.get(match.group(1).upper()) if match else None
+
+
+def _datasets(source):
+    source = Path(source)
+    paths = sorted(path for path in source.iterdir() if path.suffix.lower() in SOURCE_SUFFIXES) \
+        if source.is_dir() else [source]
+    for path in paths:
+        if path.suffix.lower() != '.zip':
+            yield str(path)
+            continue
+        with zipfile.ZipFile(path) as archive:
+            names = sorted(archive.namelist())
+        for name in names:
+            if Path(name).suffix.lower() in SOURCE_SUFFIXES - {'.zip'}:
+                yield f'/vsizip/{path}/{name}'
+
+
+def read_source(source, levels=None, encoding=None):
+    # (level, GeoDataFrame) for every PRG layer found in `source`, attribute columns renamed to the
+    # canonical PRG names whatever their case in the file
+    import pyogrio
+
+    wanted = {attribute.upper(): attribute for attribute in prg_snapshot.ATTRIBUTES.values()}
+    for dataset in _datasets(source):
+        for layer, _ in pyogrio.list_layers(dataset):
+            level = layer_level(layer) or layer_level(dataset.rsplit('/', 1)[-1])
+            if level is None or (levels and level not in levels):
+                continue
+            fields = pyogrio.read_info(dataset, layer=layer, encoding=encoding)['fields']
+            columns = {field: wanted[field.upper()] for field in fields if field.upper() in wanted}
+            frame = pyogrio.read_dataframe(dataset, layer=layer, columns=list(columns), encoding=encoding)
+            yield level, frame.rename(columns=columns)
+
+
+def read_units(source, levels=None, encoding=None):
+    units = []
+    found = set()
+    for level, frame in read_source(source, levels, encoding):
+        found.add(level)
+        units.extend(prg_snapshot.units_from_frame(frame, level))
+    return units, found
+
+
+def diff(previous, current):
+    # Unit ids added, with changed attributes, with only a changed boundary, and removed
+    added, attributes, boundaries = [], [], []
+    for unit_id, hashes in current.items():
+        old = previous.get(unit_id)
+        if old is None:
+            added.append(unit_id)
+        elif old[0] != hashes[0]:
+            attributes.append(unit_id)
+        elif old[1] != hashes[1]:
+            boundaries.append(unit_id)
+    removed = [unit_id for unit_id in previous if unit_id not in current]
+    return added, attributes, boundaries, removed
+
+
+def invalidate(unit_ids):
+    keys = []
+    for unit_id in unit_ids:
+        level, teryt = unit_id.split(':', 1)
+        if level in LEVELS:
+            keys.extend(entry_keys(cache_key(level, teryt)))
+    for offset in range(0, len(keys), 1000):
+        cache.delete_many(keys[offset:offset + 1000])
+    return len(keys)
+
+
+def publish_units(units, source, levels, force=False, keep_boundaries=False):
+    # `units` replace every unit of `levels` in the current snapshot. With keep_boundaries, units that come
+    # without a boundary (attribute-only refreshes) keep the one the snapshot has.
+    current = prg_snapshot.current_dir()
+    previous_units = prg_snapshot.read_units(current, geometry=True) if current else []
+    previous_hashes = prg_snapshot.read_hashes(current) if current else {}
+
+    if keep_boundaries:
+        boundaries = {prg_snapshot.unit_id(unit): unit.get('geometry') for unit in previous_units}
+        for unit in units:
+            if not unit.get('geometry'):
+                unit['geometry'] = boundaries.get(prg_snapshot.unit_id(unit))
+
+    merged = [unit for unit in previous_units if unit['level'] not in levels]
+    seen = set()
+    for unit in units:
+        # Like the views, the first feature with a given code wins
+        if unit['teryt'] and prg_snapshot.unit_id(unit) not in seen:
+            seen.add(prg_snapshot.unit_id(unit))
+            merged.append(unit)
+    merged.sort(key=lambda unit: LEVEL_ORDER.get(unit['level'], len(LEVEL_ORDER)))
+
+    hashes = {prg_snapshot.unit_id(unit): prg_snapshot.unit_hashes(unit) for unit in merged}
+    added, attributes, boundaries, removed = diff(previous_hashes, hashes)
+    changes = {
+        'previous': current.name if current else None,
+        'added': len(added),
+        'attributes': len(attributes),
+        'boundaries': len(boundaries),
+        'removed': len(removed),
+    }
+
+    if current and previous_hashes and not force and not (added or attributes or boundaries or removed):
+        manifest = prg_snapshot.read_manifest(current)
+        manifest.update({'published': False, 'changes': changes, 'invalidated': 0})
+        return manifest
+
+    # Forced publications rebuild every artifact
+    build = partial(prg_snapshot.build_artifacts, previous=None if force else current)
+    manifest = prg_snapshot.write_snapshot(merged, source, build=build, changes=changes)
+    manifest.update({'published': True, 'invalidated': invalidate(attributes + removed)})
+    return manifest
+
+
+def ingest(source, levels=None, encoding=None, force=False):
+    started = time.perf_counter()
+    units, found = read_units(source, levels, encoding)
+    if not found:
+        raise ValueError(f'No PRG layers (A01-A06) found in {source}')
+
+    manifest = publish_units(units, {'type': 'export', 'path': str(source), 'levels': sorted(found)}, found, force)
+    manifest['duration_s'] = round(time.perf_counter() - started, 2)
+    return manifest
+
+
+def summary(manifest):
+    counts = ', '.join(f'{level}={count}' for level, count in manifest['units'].items())
+    changes = manifest.get('changes') or {}
+    changed = (f"+{changes.get('added', 0)} added, {changes.get('attributes', 0)} with new attributes, "
+               f"{changes.get('boundaries', 0)} with new boundaries, -{changes.get('removed', 0)} removed")
+    if not manifest.get('published', True):
+        return f"PRG snapshot {manifest['version']} is up to date ({counts}), checked in {manifest['duration_s']} s"
+    return (f"Published PRG snapshot {manifest['version']} ({counts}) in {manifest['duration_s']} s: {changed}; "
+            f"{manifest.get('invalidated', 0)} cache entries invalidated")
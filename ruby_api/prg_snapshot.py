@@ -0,0 +1,344 @@
+import hashlib
+import math
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timezone
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+import orjson
+import shapely
+from django.conf import settings
+
+from ruby_api.administrative import LEVELS
+
+# A PRG snapshot is a directory of files describing every administrative unit at one point in time:
+#
+#   <PRG_SNAPSHOT_DIR>/versions/<version>/manifest.json   version, source, unit counts per level
+#   <PRG_SNAPSHOT_DIR>/versions/<version>/units.json      [[level, teryt, name, regon, type], ...]
+#   <PRG_SNAPSHOT_DIR>/versions/<version>/geometries.npy  WKB boundaries in EPSG:2180, concatenated ...
+#   <PRG_SNAPSHOT_DIR>/versions/<version>/geometry_offsets.npy  ... with the start of every unit's (same
+#                                                         order as units.json, empty when unknown) plus the end
+#   <PRG_SNAPSHOT_DIR>/versions/<version>/hashes.json     {"<level>:<teryt>": [attributes hash, geometry hash]}
+#   <PRG_SNAPSHOT_DIR>/versions/<version>/artifacts.json  {"<artifact directory>": digest of the unit hashes it
+#                                                         was built from}
+#   <PRG_SNAPSHOT_DIR>/current -> versions/<version>
+#
+# A version is written to a staging directory and published by atomically replacing the `current`
+# symlink, so a worker never sees a half-written snapshot. Files derived from the units (the autocomplete
+# arrays, ...) are built into the staging directory too; those whose inputs did not change since the
+# previous version are hard-linked from it instead. Workers build their in-memory structures (name
+# index, ...) from the version `current` points to, and rebuild them when it changes.
+
+MANIFEST_FILE = 'manifest.json'
+UNITS_FILE = 'units.json'
+GEOMETRIES_FILE = 'geometries.npy'
+GEOMETRY_OFFSETS_FILE = 'geometry_offsets.npy'
+HASHES_FILE = 'hashes.json'
+ARTIFACTS_FILE = 'artifacts.json'
+CURRENT = 'current'
+VERSIONS = 'versions'
+
+UNIT_FIELDS = ('level', 'teryt', 'name', 'regon', 'type')
+# PRG attribute each unit field comes from
+ATTRIBUTES = {'teryt': 'JPT_KOD_JE', 'name': 'JPT_NAZWA_', 'regon': 'REGON', 'type': 'JPT_SJR_KO'}
+SNAPSHOT_EPSG = 2180
+
+
+def root():
+    return Path(settings.PRG_SNAPSHOT_DIR)
+
+
+def current_dir():
+    link = root() / CURRENT
+    if not link.exists():
+        return None
+    return link.resolve()
+
+
+def read_manifest(path):
+    return orjson.loads((path / MANIFEST_FILE).read_bytes())
+
+
+def unit_id(unit):
+    return f"{unit['level']}:{unit['teryt']}"
+
+
+def unit_hashes(unit):
+    # Attributes and boundary separately: only attribute changes affect the cached by-ID responses
+    attributes = '\0'.join(unit.get(field) or '' for field in UNIT_FIELDS).encode()
+    return [hashlib.blake2b(attributes, digest_size=12).hexdigest(),
+            hashlib.blake2b(unit.get('geometry') or b'', digest_size=12).hexdigest()]
+
+
+def read_hashes(path):
+    if not (path / HASHES_FILE).exists():
+        return {}
+    return orjson.loads((path / HASHES_FILE).read_bytes())
+
+
+def hashes_digest(entries):
+    return hashlib.blake2b(orjson.dumps(entries), digest_size=12).hexdigest()
+
+
+def unit_level(unit_id):
+    return unit_id.split(':', 1)[0]
+
+
+def read_units(path, geometry=False):
+    units = [dict(zip(UNIT_FIELDS, row)) for row in orjson.loads((path / UNITS_FILE).read_bytes())]
+    if geometry and has_geometries(path):
+        blob = np.load(path / GEOMETRIES_FILE, mmap_mode='r')
+        offsets = np.load(path / GEOMETRY_OFFSETS_FILE, mmap_mode='r')
+        for position, unit in enumerate(units):
+            unit['geometry'] = bytes(blob[offsets[position]:offsets[position + 1]]) or None
+    return units
+
+
+def units_by_teryt(path):
+    # {level: {teryt: unit}}; like the views, the first unit with a given code wins
+    levels = {}
+    for unit in read_units(path):
+        levels.setdefault(unit['level'], {}).setdefault(unit['teryt'], unit)
+    return levels
+
+
+def write_units(path, units):
+    rows = [[unit.get(field) or '' for field in UNIT_FIELDS] for unit in units]
+    (path / UNITS_FILE).write_bytes(orjson.dumps(rows))
+    (path / HASHES_FILE).write_bytes(orjson.dumps({unit_id(unit): unit_hashes(unit) for unit in units}))
+
+    if any(unit.get('geometry') for unit in units):
+        wkbs = [unit.get('geometry') or b'' for unit in units]
+        offsets = np.zeros(len(wkbs) + 1, dtype=np.uint64)
+        np.cumsum([len(wkb) for wkb in wkbs], out=offsets[1:])
+        np.save(path / GEOMETRIES_FILE, np.frombuffer(b''.join(wkbs), dtype=np.uint8))
+        np.save(path / GEOMETRY_OFFSETS_FILE, offsets)
+
+
+def has_geometries(path):
+    return (path / GEOMETRIES_FILE).exists()
+
+
+def read_geometries(path, positions):
+    # Shapely geometries of the units at `positions` (indexes into units.json), None where unknown
+    blob = np.load(path / GEOMETRIES_FILE, mmap_mode='r')
+    offsets = np.load(path / GEOMETRY_OFFSETS_FILE, mmap_mode='r')
+    wkbs = np.empty(len(positions), dtype=object)
+    wkbs[:] = [bytes(blob[offsets[position]:offsets[position + 1]]) or None for position in positions]
+    return shapely.from_wkb(wkbs)
+
+
+def snapshot_age(manifest):
+    return time.time() - datetime.fromisoformat(manifest['created_at']).timestamp()
+
+
+def write_snapshot(units, source, build=None, changes=None):
+    version = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%f')
+    versions = root() / VERSIONS
+    versions.mkdir(parents=True, exist_ok=True)
+    staging = versions / f'.staging-{version}'
+    staging.mkdir()
+
+    try:
+        write_units(staging, units)
+        built = build(staging) if build is not None else None
+        counts = {level: 0 for level in LEVELS}
+        geometries = {level: 0 for level in LEVELS}
+        for unit in units:
+            counts[unit['level']] = counts.get(unit['level'], 0) + 1
+            if unit.get('geometry'):
+                geometries[unit['level']] = geometries.get(unit['level'], 0) + 1
+        manifest = {
+            'version': version,
+            'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'source': source,
+            'units': counts,
+            'geometries': geometries,
+        }
+        if changes is not None:
+            manifest['changes'] = changes
+        if built:
+            manifest['artifacts'] = built
+        (staging / MANIFEST_FILE).write_bytes(orjson.dumps(manifest, option=orjson.OPT_INDENT_2))
+        os.rename(staging, versions / version)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    publish(version)
+    return manifest
+
+
+def publish(version):
+    link = root() / CURRENT
+    staging_link = root() / f'.{CURRENT}-{version}'
+    os.symlink(Path(VERSIONS) / version, staging_link)
+    os.replace(staging_link, link)
+    prune()
+
+
+def prune():
+    # Workers may still be reading the previous version, so a few are kept around
+    keep = settings.PRG_SNAPSHOT_KEEP
+    versions = sorted(path for path in (root() / VERSIONS).iterdir() if not path.name.startswith('.'))
+    current = current_dir()
+    for path in versions[:-keep] if keep else []:
+        if path != current:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+class Artifacts:
+    # Per-process structures derived from the current snapshot, rebuilt when `current` moves.
+    # The symlink is checked at most every PRG_SNAPSHOT_CHECK_INTERVAL seconds.
+
+    def __init__(self):
+        # Reentrant: building one artifact may need another (the region grid uses the region boundaries)
+        self.lock = threading.RLock()
+        self.path = None
+        self.checked_at = 0.0
+        self.built = {}
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self.path is not None and now - self.checked_at < settings.PRG_SNAPSHOT_CHECK_INTERVAL:
+            return self.path
+        path = current_dir()
+        with self.lock:
+            self.checked_at = now
+            if path != self.path:
+                self.path = path
+                self.built = {}
+        return path
+
+    def get(self, name, build):
+        path = self._refresh()
+        if path is None:
+            return None
+        artifact = self.built.get(name)
+        if artifact is None:
+            with self.lock:
+                artifact = self.built.get(name)
+                if artifact is None:
+                    artifact = build(path)
+                    if self.path == path:
+                        self.built[name] = artifact
+        return artifact
+
+    def peek(self, name):
+        # The artifact if it is built for the current snapshot, without building it
+        if self._refresh() is None:
+            return None
+        return self.built.get(name)
+
+    def reset(self):
+        with self.lock:
+            self.path = None
+            self.checked_at = 0.0
+            self.built = {}
+
+
+artifacts = Artifacts()
+
+
+def _text(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def units_from_frame(frame, level):
+    # GeoDataFrame of one PRG layer -> snapshot units, reprojected to EPSG:2180 here so lookups never have to
+    # Shapefile .prj files of PUWG 1992 often identify as EPSG:2180 only with a lower confidence
+    if frame.crs is not None and frame.crs.to_epsg(min_confidence=25) != SNAPSHOT_EPSG:
+        frame = frame.to_crs(SNAPSHOT_EPSG)
+    columns = {field: frame[attribute] if attribute in frame.columns else None for field, attribute in ATTRIBUTES.items()}
+    # Normalized, so the same boundary read from GML, GeoPackage or Shapefile hashes the same
+    wkbs = shapely.to_wkb(shapely.normalize(frame.geometry.values))
+
+    units = []
+    for row in range(len(frame)):
+        unit = {'level': level}
+        for field, column in columns.items():
+            unit[field] = _text(column.iat[row]) if column is not None else ''
+        unit['geometry'] = wkbs[row]
+        units.append(unit)
+    return units
+
+
+def read_frame(body):
+    import pyogrio
+
+    # GDAL sees no layer at all in a FeatureCollection without members (the page after the last one)
+    if not len(pyogrio.list_layers(body)):
+        return None
+    return pyogrio.read_dataframe(body, columns=list(ATTRIBUTES.values()),
+                                  SWAP_COORDINATES=settings.PRG_WFS_SWAP_COORDINATES)
+
+
+def read_units_page(body, level):
+    frame = read_frame(body)
+    return units_from_frame(frame, level) if frame is not None else []
+
+
+def fetch_units(levels=None, page_size=None, geometry=True):
+    from ruby_api.warmup import iter_pages
+
+    page_size = page_size or settings.ADMINISTRATIVE_WARMUP_PAGE_SIZE
+    units = []
+    for level in levels or LEVELS:
+        if geometry:
+            pages = iter_pages(LEVELS[level], page_size, properties=None, read=partial(read_units_page, level=level))
+        else:
+            pages = ([
+                {'level': level, **{field: _text(data.get(attribute)) for field, attribute in ATTRIBUTES.items()}}
+                for data in page
+            ] for page in iter_pages(LEVELS[level], page_size))
+
+        seen = set()
+        for page in pages:
+            for unit in page:
+                if not unit['teryt'] or unit['teryt'] in seen:
+                    continue
+                seen.add(unit['teryt'])
+                units.append(unit)
+    return units
+
+
+def build_artifacts(path, previous=None):
+    # Builds the derived files of a new version, or hard-links those of `previous` (the version it replaces)
+    # whose digest of the unit hashes they read is unchanged; returns what was done per artifact
+    from ruby_api import autocomplete, geometry_pyramid, region_grid, teryt_dictionary
+
+    hashes = read_hashes(path)
+    previous_digests = {}
+    if previous is not None and (previous / ARTIFACTS_FILE).exists():
+        previous_digests = orjson.loads((previous / ARTIFACTS_FILE).read_bytes())
+
+    digests, done = {}, {}
+    for module in (autocomplete, region_grid, teryt_dictionary, geometry_pyramid):
+        name = module.DIRECTORY
+        digests[name] = module.source_digest(hashes)
+        if previous_digests.get(name) == digests[name] and (previous / name).exists():
+            shutil.copytree(previous / name, path / name, copy_function=os.link)
+            done[name] = 'reused'
+        else:
+            module.build(path)
+            done[name] = 'built'
+    (path / ARTIFACTS_FILE).write_bytes(orjson.dumps(digests))
+    return done
+
+
+def refresh_from_wfs(page_size=None, geometry=True, force=False):
+    from ruby_api.prg_ingest import publish_units
+
+    started = time.perf_counter()
+    manifest = publish_units(fetch_units(page_size=page_size, geometry=geometry),
+                             {'type': 'wfs', 'url': settings.PRG_WFS_URL}, LEVELS, force)
+    manifest['duration_s'] = round(time.perf_counter() - started, 2)
+    return manifest
@@ -0,0 +1,172 @@
+import math
+import os
+import shutil
+
+import numpy as np
+import orjson
+import shapely
+from django.conf import settings
+
+from ruby_api import prg_snapshot
+from ruby_api.administrative import HIERARCHY, REGION, parent_teryts
+
+# Constant-time point lookups for bulk geocoding: a grid over the obręby of the PRG snapshot, in EPSG:2180,
+# PRG_GRID_RESOLUTION metres per cell, memory-mapped from the snapshot version directory:
+#
+#   grid/cells.npy    rows x columns from the south-west corner; 0 outside every obręb, the largest value
+#                     of the dtype where a boundary crosses the cell, otherwise 1 + the position of the
+#                     obręb in the region BoundaryIndex
+#   grid/grid.json    origin, resolution and shape
+#
+# Only points in boundary cells need an exact polygon test. The commune, county and voivodeship of a point
+# follow from the TERYT code of its obręb.
+
+DIRECTORY = 'grid'
+CELLS_FILE = 'cells.npy'
+GRID_FILE = 'grid.json'
+# Boundary chunks processed at once, to bound the memory of the crossing computation
+CHUNK = 2000
+
+
+def _crossed_cells(boundaries, x0, y0, resolution):
+    # (rows, columns) of every cell a boundary passes through: each segment is split where it crosses a
+    # grid line, and the middle of every piece lies inside exactly one crossed cell
+    coords, index = shapely.get_coordinates(shapely.get_parts(boundaries), return_index=True)
+    same = index[1:] == index[:-1]
+    u = (coords[:, 0] - x0) / resolution
+    v = (coords[:, 1] - y0) / resolution
+    ua, ub, va, vb = u[:-1][same], u[1:][same], v[:-1][same], v[1:][same]
+
+    segments = [np.arange(len(ua)), np.arange(len(ua))]
+    ts = [np.zeros(len(ua)), np.ones(len(ua))]
+    for a, b in ((ua, ub), (va, vb)):
+        low = np.floor(np.minimum(a, b)).astype(np.int64)
+        count = np.maximum(np.ceil(np.maximum(a, b)).astype(np.int64) - low - 1, 0)
+        segment = np.repeat(np.arange(len(a)), count)
+        line = low[segment] + 1 + (np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count))
+        segments.append(segment)
+        ts.append((line - a[segment]) / (b[segment] - a[segment]))
+
+    segments, ts = np.concatenate(segments), np.concatenate(ts)
+    order = np.lexsort((ts, segments))
+    segments, ts = segments[order], ts[order]
+    inner = segments[1:] == segments[:-1]
+    segment, middle = segments[1:][inner], (ts[1:][inner] + ts[:-1][inner]) / 2
+    columns = np.floor(ua[segment] + middle * (ub[segment] - ua[segment])).astype(np.int64)
+    rows = np.floor(va[segment] + middle * (vb[segment] - va[segment])).astype(np.int64)
+    return rows, columns
+
+
+def rasterize(geometries, resolution):
+    xmin, ymin, xmax, ymax = shapely.total_bounds(geometries)
+    x0, y0 = math.floor(xmin / resolution) * resolution, math.floor(ymin / resolution) * resolution
+    shape = (math.ceil((ymax - y0) / resolution), math.ceil((xmax - x0) / resolution))
+    # One value is reserved for outside, one for boundary cells
+    dtype = np.uint16 if len(geometries) + 2 <= np.iinfo(np.uint16).max else np.uint32
+    boundary = np.iinfo(dtype).max
+    cells = np.zeros(shape, dtype=dtype)
+
+    # A cell no boundary crosses lies wholly inside one obręb (or outside all), so its centre decides
+    for position, geometry in enumerate(geometries):
+        gxmin, gymin, gxmax, gymax = geometry.bounds
+        c0, c1 = int((gxmin - x0) // resolution), min(int((gxmax - x0) // resolution) + 1, shape[1])
+        r0, r1 = int((gymin - y0) // resolution), min(int((gymax - y0) // resolution) + 1, shape[0])
+        xs = x0 + (np.arange(c0, c1) + 0.5) * resolution
+        ys = y0 + (np.arange(r0, r1) + 0.5) * resolution
+        shapely.prepare(geometry)
+        inside = shapely.contains_xy(geometry, *np.meshgrid(xs, ys))
+        cells[r0:r1, c0:c1][inside] = position + 1
+        shapely.destroy_prepared(geometry)
+
+    for offset in range(0, len(geometries), CHUNK):
+        rows, columns = _crossed_cells(shapely.boundary(geometries[offset:offset + CHUNK]), x0, y0, resolution)
+        keep = (rows >= 0) & (rows < shape[0]) & (columns >= 0) & (columns < shape[1])
+        cells[rows[keep], columns[keep]] = boundary
+
+    return cells, {'x0': x0, 'y0': y0, 'resolution': resolution, 'rows': shape[0], 'columns': shape[1],
+                   'boundary': int(boundary)}
+
+
+def source_digest(hashes):
+    # What build reads: the obręb boundaries, in order, as the cells hold positions in the region BoundaryIndex
+    regions = [(unit_id, unit_hashes[1]) for unit_id, unit_hashes in hashes.items()
+               if prg_snapshot.unit_level(unit_id) == REGION]
+    return prg_snapshot.hashes_digest([settings.PRG_GRID_RESOLUTION, regions])
+
+
+def build(path):
+    from ruby_api.boundaries import BoundaryIndex
+
+    resolution = settings.PRG_GRID_RESOLUTION
+    if not resolution or not prg_snapshot.has_geometries(path):
+        return
+    regions = BoundaryIndex.open(path, REGION)
+    if not len(regions):
+        return
+
+    cells, grid = rasterize(regions.geometries, resolution)
+    staging = path / f'.{DIRECTORY}-{os.getpid()}'
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir()
+    np.save(staging / CELLS_FILE, cells)
+    (staging / GRID_FILE).write_bytes(orjson.dumps(grid))
+    os.rename(staging, path / DIRECTORY)
+
+
+class RegionGrid:
+    def __init__(self, path, regions):
+        directory = path / DIRECTORY
+        grid = orjson.loads((directory / GRID_FILE).read_bytes())
+        self.cells = np.asarray(np.load(directory / CELLS_FILE, mmap_mode='r'))
+        self.x0, self.y0, self.resolution = grid['x0'], grid['y0'], grid['resolution']
+        self.boundary = grid['boundary']
+        self.regions = regions
+        self.units = prg_snapshot.artifacts.get('units_by_teryt', prg_snapshot.units_by_teryt)
+
+    @classmethod
+    def open(cls, path):
+        from ruby_api.boundaries import get_boundary_index
+
+        # False rather than None, so a snapshot without a grid is remembered as such
+        if not (path / DIRECTORY / GRID_FILE).exists():
+            return False
+        regions = get_boundary_index(REGION)
+        return cls(path, regions) if regions is not None else False
+
+    def locate(self, x, y):
+        # Position of the obręb at the point in the region BoundaryIndex, None outside every obręb
+        row, column = int((y - self.y0) // self.resolution), int((x - self.x0) // self.resolution)
+        if not (0 <= row < self.cells.shape[0] and 0 <= column < self.cells.shape[1]):
+            return None
+        value = int(self.cells[row, column])
+        if value == self.boundary:
+            return self.regions.find_position(x, y)
+        return value - 1 if value else None
+
+    def locate_many(self, xs, ys):
+        # Vectorized locate; -1 outside every obręb
+        xs, ys = np.asarray(xs, dtype=float), np.asarray(ys, dtype=float)
+        rows = np.floor((ys - self.y0) / self.resolution).astype(np.int64)
+        columns = np.floor((xs - self.x0) / self.resolution).astype(np.int64)
+        inside = (rows >= 0) & (rows < self.cells.shape[0]) & (columns >= 0) & (columns < self.cells.shape[1])
+        values = np.zeros(len(xs), dtype=np.int64)
+        values[inside] = self.cells[rows[inside], columns[inside]]
+
+        positions = values - 1
+        edge = values == self.boundary
+        if edge.any():
+            positions[edge] = self.regions.find_positions(xs[edge], ys[edge])
+        return positions
+
+    def unit(self, position, level):
+        # The unit of `level` containing the obręb at `position`, from its TERYT code
+        region = self.regions.units[position]
+        if level == REGION:
+            return region
+        return self.units.get(level, {}).get(parent_teryts(REGION, region['teryt'])[level])
+
+    def resolve(self, x, y):
+        position = self.locate(x, y)
+        if position is None:
+            return {}
+        return {level: self.unit(position, level) for level in HIERARCHY}
@@ -0,0 +1,55 @@
+import decimal
+
+import orjson
+from PyQt5.QtCore import QByteArray, QDate, QDateTime, QTime, QVariant
+from django.utils.functional import Promise
+from rest_framework.renderers import BaseRenderer
+
+# orjson serializes str/int/float/bool/None, dict, list, tuple, datetime, date, time, UUID, dataclasses
+# and numpy arrays natively. Everything else reaches `default`, which must return one of those.
+OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def default(obj):
+    # Attribute values from county WFS layers (see qvariant_to_python)
+    if isinstance(obj, QDateTime):
+        return obj.toPyDateTime() if obj.isValid() else None
+    if isinstance(obj, QDate):
+        return obj.toPyDate() if obj.isValid() else None
+    if isinstance(obj, QTime):
+        return obj.toPyTime() if obj.isValid() else None
+    if isinstance(obj, QByteArray):
+        obj = bytes(obj)
+    if isinstance(obj, QVariant):
+        return None if obj.isNull() else obj.value()
+    # Same conversions as rest_framework.utils.encoders.JSONEncoder
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        return bytes(obj).decode('utf-8', errors='replace')
+    if isinstance(obj, Promise):
+        return str(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+def dumps(data, option=0):
+    return orjson.dumps(data, default=default, option=OPTIONS | option)
+
+
+class ORJSONRenderer(BaseRenderer):
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        option = 0
+        renderer_context = renderer_context or {}
+        # orjson only knows one indentation width; any requested indent (browsable API, `; indent=4`) gets 2
+        if renderer_context.get('indent') or 'indent=' in (accepted_media_type or ''):
+            option |= orjson.OPT_INDENT_2
+        return dumps(data, option)
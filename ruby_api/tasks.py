@@ -0,0 +1,30 @@
+from celery import shared_task
+
+from ruby_api import prg_snapshot, teryt_dictionary
+from ruby_api.prg_ingest import ingest
+from ruby_api.warmup import warm
+
+
+@shared_task
+def warm_administrative_cache(levels=None):
+    return warm(levels)
+
+
+@shared_task
+def refresh_prg_snapshot(geometry=True):
+    return prg_snapshot.refresh_from_wfs(geometry=geometry)
+
+
+@shared_task
+def ingest_prg_export(source, levels=None, encoding=None):
+    return ingest(source, levels, encoding)
+
+
+@shared_task
+def refresh_teryt_dictionary():
+    return teryt_dictionary.refresh()
+
+
+@shared_task
+def check_teryt_dictionary():
+    return teryt_dictionary.check()
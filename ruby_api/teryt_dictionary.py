@@ -0,0 +1,182 @@
+import hashlib
+import os
+import shutil
+import time
+
+import numpy as np
+import orjson
+from django.conf import settings
+
+from ruby_api import prg_snapshot
+from ruby_api.administrative import COMMUNE, COUNTY, VOIVODESHIP
+
+# The voivodeship, county and commune by-ID endpoints answered from a dictionary of the TERYT codes, names,
+# REGON numbers and types of those units: under 3000 entries nationwide, a few hundred kilobytes. It is
+# written into every PRG snapshot version directory, so it is versioned and published with the snapshot,
+# and opened with mmap, so the workers of a host share one copy:
+#
+#   teryt/keys.npy          sorted "<level>:<teryt>" keys (fixed width)
+#   teryt/names.npy         names (UTF-8), concatenated, with the start of every one plus the end
+#   teryt/name_offsets.npy
+#   teryt/regons.npy        REGON numbers (fixed width)
+#   teryt/types.npy         JPT_SJR_KO of communes (fixed width)
+#   teryt/dictionary.json   digest of the entries, entries per level
+#
+# A lookup is a binary search over the keys. A level the dictionary has no entries for is left to PRG WFS.
+# refresh() updates the entries from PRG WFS without touching the boundaries of the snapshot, and check()
+# compares them with PRG WFS without publishing anything.
+
+DIRECTORY = 'teryt'
+MANIFEST_FILE = 'dictionary.json'
+LEVELS = (VOIVODESHIP, COUNTY, COMMUNE)
+ARRAYS = ('keys', 'names', 'name_offsets', 'regons', 'types')
+
+
+def _key(level, teryt):
+    return prg_snapshot.unit_id({'level': level, 'teryt': teryt}).encode()
+
+
+def digest(units):
+    # Over the attribute hashes in key order, so equal dictionaries have equal digests wherever they were built
+    hashes = sorted((prg_snapshot.unit_id(unit), prg_snapshot.unit_hashes(unit)[0]) for unit in units)
+    return hashlib.blake2b(orjson.dumps(hashes), digest_size=12).hexdigest()
+
+
+def source_digest(hashes):
+    # What build reads: the attributes of the dictionary's units, in any order
+    return prg_snapshot.hashes_digest(sorted(
+        (unit_id, unit_hashes[0]) for unit_id, unit_hashes in hashes.items()
+        if prg_snapshot.unit_level(unit_id) in LEVELS
+    ))
+
+
+def _fixed(values):
+    # At least one byte wide, as numpy cannot save a zero-width string dtype
+    return np.array(values, dtype=f'S{max((len(value) for value in values), default=0) or 1}')
+
+
+def arrays(units):
+    units = sorted((unit for unit in units if unit['level'] in LEVELS), key=lambda unit: _key(unit['level'], unit['teryt']))
+    names = [(unit['name'] or '').encode() for unit in units]
+    name_offsets = np.zeros(len(names) + 1, dtype=np.uint32)
+    np.cumsum([len(name) for name in names], out=name_offsets[1:])
+    return {
+        'keys': _fixed([_key(unit['level'], unit['teryt']) for unit in units]),
+        'names': np.frombuffer(b''.join(names), dtype=np.uint8),
+        'name_offsets': name_offsets,
+        'regons': _fixed([(unit['regon'] or '').encode() for unit in units]),
+        'types': _fixed([(unit['type'] or '').encode() for unit in units]),
+    }
+
+
+def build(path):
+    # Written next to the snapshot files and renamed into place, so a reader never opens a partial dictionary
+    target = path / DIRECTORY
+    staging = path / f'.{DIRECTORY}-{os.getpid()}'
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir()
+    try:
+        levels = prg_snapshot.units_by_teryt(path)
+        units = [unit for level in LEVELS for unit in levels.get(level, {}).values()]
+        for name, values in arrays(units).items():
+            np.save(staging / f'{name}.npy', values)
+        manifest = {
+            'digest': digest(units),
+            'units': {level: sum(unit['level'] == level for unit in units) for level in LEVELS},
+        }
+        (staging / MANIFEST_FILE).write_bytes(orjson.dumps(manifest, option=orjson.OPT_INDENT_2))
+        os.rename(staging, target)
+    except OSError:
+        shutil.rmtree(staging, ignore_errors=True)
+        # Another worker published it first
+        if not target.exists():
+            raise
+
+
+class TerytDictionary:
+    def __init__(self, path):
+        directory = path / DIRECTORY
+        for name in ARRAYS:
+            # Plain ndarray views of the mapped files: slicing np.memmap objects is several times slower
+            setattr(self, name, np.asarray(np.load(directory / f'{name}.npy', mmap_mode='r')))
+        self.manifest = orjson.loads((directory / MANIFEST_FILE).read_bytes())
+        self.version = path.name
+
+    @classmethod
+    def open(cls, path):
+        # Snapshots published before the dictionary existed get it on first use
+        if not (path / DIRECTORY).exists():
+            build(path)
+        return cls(path)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def covers(self, level):
+        return bool(self.manifest['units'].get(level))
+
+    def _unit(self, position):
+        level, teryt = bytes(self.keys[position]).decode().split(':', 1)
+        return {
+            'level': level,
+            'teryt': teryt,
+            'name': bytes(self.names[self.name_offsets[position]:self.name_offsets[position + 1]]).decode(),
+            'regon': bytes(self.regons[position]).decode(),
+            'type': bytes(self.types[position]).decode(),
+        }
+
+    def find(self, level, teryt):
+        key = _key(level, teryt)
+        position = int(np.searchsorted(self.keys, key))
+        if position < len(self.keys) and self.keys[position] == key:
+            return self._unit(position)
+        return None
+
+    def units(self):
+        return [self._unit(position) for position in range(len(self))]
+
+
+def get_dictionary():
+    return prg_snapshot.artifacts.get('teryt_dictionary', TerytDictionary.open)
+
+
+def properties(unit):
+    # The PRG attributes the result builders of ruby_api.administrative read
+    return {attribute: unit[field] for field, attribute in prg_snapshot.ATTRIBUTES.items()}
+
+
+def fetch_units(page_size=None):
+    # Attributes only: the three levels are a few WFS pages
+    return prg_snapshot.fetch_units(LEVELS, page_size, geometry=False)
+
+
+def refresh(page_size=None, force=False):
+    from ruby_api.prg_ingest import publish_units
+
+    started = time.perf_counter()
+    manifest = publish_units(fetch_units(page_size), {'type': 'wfs', 'url': settings.PRG_WFS_URL, 'levels': list(LEVELS)},
+                             LEVELS, force, keep_boundaries=True)
+    manifest['duration_s'] = round(time.perf_counter() - started, 2)
+    return manifest
+
+
+def check(page_size=None):
+    # Entries of the current dictionary that differ from PRG WFS, by "<level>:<teryt>"
+    started = time.perf_counter()
+    dictionary = get_dictionary()
+    local = {prg_snapshot.unit_id(unit): prg_snapshot.unit_hashes(unit)[0] for unit in (dictionary.units() if dictionary else [])}
+    remote = {prg_snapshot.unit_id(unit): prg_snapshot.unit_hashes(unit)[0] for unit in fetch_units(page_size)}
+
+    added = sorted(remote.keys() - local.keys())
+    changed = sorted(unit_id for unit_id in remote.keys() & local.keys() if remote[unit_id] != local[unit_id])
+    removed = sorted(local.keys() - remote.keys())
+    return {
+        'version': dictionary.version if dictionary else None,
+        'digest': dictionary.manifest['digest'] if dictionary else None,
+        'checked': len(remote),
+        'added': added,
+        'changed': changed,
+        'removed': removed,
+        'drift': bool(added or changed or removed),
+        'duration_s': round(time.perf_counter() - started, 2),
+    }
@@ -0,0 +1,149 @@
+from xml.etree import ElementTree as ET
+
+from lxml import etree
+
+from benchmarks.stub_server import FIXTURES_DIR
+from ruby_api import parsers
+
+# xml.etree implementations the views used before ruby_api.parsers, kept as the reference the lxml parsers are
+# checked against in ruby_api.tests.test_parsers and timed against in benchmarks.parsers
+
+
+def legacy_parse_gugik_feature_info(xml_content):
+    try:
+        root = ET.fromstring(xml_content)
+        features = []
+
+        for feature_member in root.findall('.//{http://www.opengis.net/gml}featureMember'):
+            feature_data = {}
+            for layer in feature_member:
+                for attribute in layer:
+                    name = attribute.get('Name', '')
+                    text = attribute.text or ''
+                    text = text.strip()
+                    if text and not text.startswith('<') and not text.startswith('http'):
+                        feature_data[name] = text
+
+            if feature_data:
+                features.append(feature_data)
+
+        return features
+    except Exception:
+        return []
+
+
+def legacy_parse_gml_response(xml_content):
+    try:
+        root = ET.fromstring(xml_content)
+        data = {}
+
+        for elem in root.iter():
+            tag = elem.tag.split('}')[-1] if '}' in elem.tag else elem.tag
+
+            if elem.text and elem.text.strip() and tag not in ['FeatureCollection', 'featureMember', 'boundedBy', 'Box',
+                                                               'coordinates']:
+                data[tag] = elem.text.strip()
+
+        return data
+    except Exception:
+        return {}
+
+
+def _legacy_wfs_features(xml_content, layer_name):
+    root = ET.fromstring(xml_content)
+    namespaces = {
+        'wfs': 'http://www.opengis.net/wfs/2.0',
+        'ms': 'http://mapserver.gis.umn.edu/mapserver',
+        'gml': 'http://www.opengis.net/gml/3.2'
+    }
+    return root.findall(f'.//ms:{layer_name}', namespaces)
+
+
+def _legacy_wfs_data(feature):
+    data = {}
+    for child in feature:
+        tag = child.tag.split('}')[-1] if '}' in child.tag else child.tag
+        if child.text and tag not in ['GEOMETRY', 'SHAPE', 'geometry', 'boundedBy']:
+            data[tag] = child.text.strip()
+    return data
+
+
+def legacy_parse_wfs_response(xml_content, layer_name):
+    try:
+        features = _legacy_wfs_features(xml_content, layer_name)
+        if not features:
+            return None
+        return _legacy_wfs_data(features[0])
+    except Exception:
+        return None
+
+
+def legacy_parse_wfs_multi_response(xml_content, layer_name):
+    try:
+        results = []
+        for feature in _legacy_wfs_features(xml_content, layer_name):
+            data = _legacy_wfs_data(feature)
+            if data:
+                results.append(data)
+        return results
+    except Exception:
+        return []
+
+
+# What the views make of a whole body with the parsers they use, in the shape of the references above
+
+def gugik_features(xml_content):
+    layers = parsers.parse_gugik_feature_info_layers(xml_content)
+    return [feature for features in layers.values() for feature in features]
+
+
+def gml_attributes(xml_content):
+    return {key: value for data in parsers.parse_gml_layers(xml_content).values() for key, value in data.items()}
+
+
+def legacy_gml_attributes(xml_content):
+    # Without the layer's gml:name, which parse_gml_layers keys the layers by instead
+    data = legacy_parse_gml_response(xml_content)
+    data.pop('name', None)
+    return data
+
+
+def first_wfs_feature(xml_content, layer_name):
+    try:
+        return next(parsers.iter_wfs_features([xml_content], layer_name), None)
+    except etree.XMLSyntaxError:
+        return None
+
+
+def wfs_features(xml_content, layer_name):
+    try:
+        return [data for data in parsers.iter_wfs_features([xml_content], layer_name) if data]
+    except etree.XMLSyntaxError:
+        return []
+
+
+def cases():
+    for path in sorted((FIXTURES_DIR / 'gugik').glob('*.xml')):
+        yield f'gugik/{path.name}', path.read_bytes(), (), legacy_parse_gugik_feature_info, gugik_features
+
+    for path in sorted((FIXTURES_DIR / 'prg_wms').glob('*.xml')):
+        yield f'prg_wms/{path.name}', path.read_bytes(), (), legacy_gml_attributes, gml_attributes
+
+    for path in sorted((FIXTURES_DIR / 'prg_wfs').glob('*.xml')):
+        layer = path.stem
+        content = path.read_bytes()
+        yield f'prg_wfs/{path.name}', content, (layer,), legacy_parse_wfs_response, first_wfs_feature
+        yield f'prg_wfs/{path.name} (multi)', content, (layer,), legacy_parse_wfs_multi_response, wfs_features
+
+    # County EGiB WFS responses; the layer is the file name, capabilities.xml and hits.xml have no features
+    for path in sorted((FIXTURES_DIR / 'county').glob('*.xml')):
+        layer = path.stem if path.stem in ('dzialki', 'budynki') else 'dzialki'
+        content = path.read_bytes()
+        yield f'county/{path.name}', content, (layer,), legacy_parse_wfs_response, first_wfs_feature
+        yield f'county/{path.name} (multi)', content, (layer,), legacy_parse_wfs_multi_response, wfs_features
+
+    for content in (b'', b'<broken', b'<root/>'):
+        yield f'malformed {content!r}', content, (), legacy_gml_attributes, gml_attributes
+        yield f'malformed {content!r}', content, (), legacy_parse_gugik_feature_info, gugik_features
+        yield (f'malformed {content!r}', content, ('A01_Granice_wojewodztw',), legacy_parse_wfs_response,
+               first_wfs_feature)
@@ -0,0 +1,39 @@
+import gzip
+import tempfile
+
+from django.test import SimpleTestCase, override_settings
+
+from ruby_api import archive
+
+URL = 'https://mapy.geoportal.gov.pl/wss/PRG?SERVICE=WFS&REQUEST=GetFeature&TYPENAME=ms:A01_Granice_wojewodztw'
+BODY = b'<wfs:FeatureCollection/>'
+
+
+class ArchiveTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(UPSTREAM_ARCHIVE_DIR=directory.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_only_kept_headers_are_recorded(self):
+        # The body is stored decoded, as iter_content yields it
+        headers = {'Content-Type': 'text/xml', 'Content-Encoding': 'gzip',
+                   'Content-Length': str(len(gzip.compress(BODY))), 'ETag': '"1"', 'Server': 'MapServer'}
+        entry = archive.store(URL, 200, headers, BODY)
+        self.assertEqual(entry['headers'], {'Content-Type': 'text/xml', 'ETag': '"1"'})
+        self.assertEqual(archive.lookup(URL)['headers'], entry['headers'])
+
+    def test_replay(self):
+        archive.store(URL, 200, {'Content-Type': 'text/xml', 'Content-Encoding': 'gzip'}, BODY)
+        # Parameter order and host case do not matter
+        response = archive.replay(URL.replace('mapy.geoportal', 'MAPY.geoportal').replace(
+            'SERVICE=WFS&REQUEST=GetFeature', 'REQUEST=GetFeature&SERVICE=WFS'))
+        self.assertEqual((response.status_code, response.content), (200, BODY))
+        self.assertEqual(dict(response.headers), {'Content-Type': 'text/xml'})
+        self.assertEqual(b''.join(response.iter_content(8)), BODY)
+
+    def test_miss(self):
+        with self.assertRaises(archive.ArchiveMiss):
+            archive.replay(URL)
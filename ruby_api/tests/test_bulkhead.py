@@ -0,0 +1,132 @@
+import asyncio
+import time
+from unittest import mock
+
+import fakeredis
+import redis
+from django.test import SimpleTestCase, override_settings
+
+from ruby_api import bulkhead
+from ruby_api.bulkhead import BulkheadFull, RedisBackend
+
+HOST = 'wms.powiat.krakow.pl'
+URL = f'https://{HOST}/iip/ows'
+LEASE_SECONDS = 150
+
+
+class FailingBackend:
+    # A Redis backend whose server is unreachable
+    def __init__(self):
+        self.calls = 0
+
+    def try_acquire(self, host, limit):
+        self.calls += 1
+        raise redis.ConnectionError('Timeout connecting to server')
+
+    def release(self, host, token):
+        self.calls += 1
+        raise redis.ConnectionError('Timeout connecting to server')
+
+
+@override_settings(BULKHEAD_BACKEND='redis', BULKHEAD_LIMITS={HOST: 2}, BULKHEAD_DEFAULT_LIMIT=8,
+                   BULKHEAD_MAX_WAIT=0.05, BULKHEAD_RETRY_AFTER=5, BULKHEAD_LEASE_SECONDS=LEASE_SECONDS,
+                   BULKHEAD_BREAKER_SECONDS=5)
+class BulkheadTestCase(SimpleTestCase):
+    def use_backend(self, backend):
+        patcher = mock.patch.object(bulkhead, '_backend', backend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        bulkhead._breaker['open_until'] = 0.0
+        self.addCleanup(bulkhead._breaker.update, open_until=0.0)
+
+
+class RedisBackendTests(BulkheadTestCase):
+    def setUp(self):
+        with mock.patch.object(redis, 'Redis', fakeredis.FakeRedis):
+            self.backend = RedisBackend('redis://localhost:6379/0')
+        # Fake clients of one URL share a server
+        self.backend.client.flushall()
+        self.use_backend(self.backend)
+
+    def slots(self):
+        return self.backend.client.zrange(f'bulkhead:{HOST}', 0, -1)
+
+    def test_limit_is_shared(self):
+        tokens = [bulkhead.try_acquire(HOST), bulkhead.try_acquire(HOST)]
+        self.assertTrue(all(tokens))
+        self.assertIsNone(bulkhead.try_acquire(HOST))
+        bulkhead.release(HOST, tokens[0])
+        self.assertEqual(self.slots(), [tokens[1].encode()])
+        self.assertTrue(bulkhead.try_acquire(HOST))
+
+    def test_other_hosts_have_their_own_slots(self):
+        for _ in range(2):
+            bulkhead.try_acquire(HOST)
+        self.assertTrue(bulkhead.try_acquire('integracja.gugik.gov.pl'))
+
+    def test_leases_expire(self):
+        # Slots of a worker killed mid-request, acquired more than a lease ago
+        stale = (time.time() - LEASE_SECONDS - 1) * 1000
+        self.backend.client.zadd(f'bulkhead:{HOST}', {'killed-1': stale, 'killed-2': stale})
+        token = bulkhead.try_acquire(HOST)
+        self.assertTrue(token)
+        self.assertEqual(self.slots(), [token.encode()])
+        self.assertLessEqual(self.backend.client.pttl(f'bulkhead:{HOST}'), LEASE_SECONDS * 1000)
+
+    def test_full_bulkhead_raises_after_the_wait(self):
+        for _ in range(2):
+            bulkhead.try_acquire(HOST)
+        with self.assertRaises(BulkheadFull) as raised:
+            with bulkhead.guard(URL):
+                pass
+        self.assertEqual(raised.exception.retry_after, 5)
+
+        async def aguard():
+            async with bulkhead.aguard(URL):
+                pass
+
+        with self.assertRaises(BulkheadFull):
+            asyncio.run(aguard())
+
+    def test_guard_releases_its_slot(self):
+        with bulkhead.guard(URL):
+            self.assertEqual(len(self.slots()), 1)
+        self.assertEqual(self.slots(), [])
+
+        async def aguard():
+            async with bulkhead.aguard(URL):
+                self.assertEqual(len(self.slots()), 1)
+
+        asyncio.run(aguard())
+        self.assertEqual(self.slots(), [])
+
+
+class BreakerTests(BulkheadTestCase):
+    def setUp(self):
+        self.backend = FailingBackend()
+        self.use_backend(self.backend)
+
+    def test_fails_open(self):
+        with bulkhead.guard(URL):
+            pass
+        self.assertEqual(self.backend.calls, 1)
+
+    def test_redis_is_skipped_while_open(self):
+        for _ in range(10):
+            self.assertEqual(bulkhead.try_acquire(HOST), '')
+        self.assertEqual(self.backend.calls, 1)
+
+        # Past BULKHEAD_BREAKER_SECONDS Redis is tried again
+        bulkhead._breaker['open_until'] = time.monotonic() - 1
+        self.assertEqual(bulkhead.try_acquire(HOST), '')
+        self.assertEqual(self.backend.calls, 2)
+
+    def test_release_skips_redis_while_open(self):
+        bulkhead.try_acquire(HOST)
+        bulkhead.release(HOST, 'token')
+        self.assertEqual(self.backend.calls, 1)
+
+    def test_failed_release_opens_the_breaker(self):
+        bulkhead.release(HOST, 'token')
+        self.assertEqual(bulkhead.try_acquire(HOST), '')
+        self.assertEqual(self.backend.calls, 1)
@@ -0,0 +1,98 @@
+import asyncio
+import json
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APIRequestFactory
+
+from ruby_api.entities import PARCEL, xy_entity_body, xy_entity_result
+from ruby_api.renderers import ORJSONRenderer, dumps
+from ruby_api.views import search_parcel_by_id, search_parcel_by_xy
+
+PARCEL_ID = '120614_2.0001.123/1'
+LOCAL_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'entities'}}
+ENTITY = {
+    'parcel_id': PARCEL_ID,
+    'attributes': {'ID': PARCEL_ID, 'Położenie': 'Buków', 'POLE': 0.1234, 'KW': None, 'NUMERY': [1, 2]},
+    'geometry': 'POLYGON((0 0,1 0,1 1,0 0))',
+}
+
+
+def feature(entity_id):
+    return {'layer_name': 'ms:dzialki', 'attributes': {'ID': entity_id}, 'geometry': 'POLYGON((0 0,1 0,1 1,0 0))'}
+
+
+def content(response):
+    if hasattr(response, 'render'):
+        response.render()
+    return response.content
+
+
+class SpliceTests(SimpleTestCase):
+    def test_splice_renders_the_result(self):
+        for x, y, epsg, teryt in ((566010.0, 244020.0, '2180', '1206'), (19.95, 50.06, '4326', '1206'),
+                                  (-1e-7, 1e21, '2180', '')):
+            with self.subTest(x=x, y=y):
+                body = ORJSONRenderer().render(ENTITY, 'application/json', {})
+                spliced = xy_entity_body(x, y, epsg, teryt, body)
+                self.assertEqual(spliced, dumps(xy_entity_result(PARCEL, x, y, epsg, teryt, ENTITY)))
+                self.assertEqual(json.loads(spliced), xy_entity_result(PARCEL, x, y, epsg, teryt, ENTITY))
+
+
+@override_settings(CACHES=LOCAL_CACHE, CACHE_RENDERED_RESPONSES=True, CACHE_NAMESPACE_CHECK_INTERVAL=0)
+class PointerResponseTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.fetched = []
+        patchers = [
+            mock.patch('ruby_api.views.parcel_by_xy.afetch_point_features',
+                       return_value={'dzialki': [{'Identyfikator działki': PARCEL_ID}]}),
+            mock.patch('ruby_api.views.parcel_by_xy.afind_parcel', side_effect=self.afetch),
+            mock.patch('ruby_api.views.parcel_by_id.find_parcel', side_effect=self.fetch),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def fetch(self, service, entity_id):
+        self.fetched.append(entity_id)
+        return feature(entity_id)
+
+    async def afetch(self, service, entity_id):
+        return self.fetch(service, entity_id)
+
+    def get(self, x='566010.0', **headers):
+        meta = {f"HTTP_{name.upper().replace('-', '_')}": value for name, value in headers.items()}
+        response = asyncio.run(search_parcel_by_xy(APIRequestFactory().get('/', {'x': x, 'y': '244020.0'}, **meta)))
+        return response, content(response)
+
+    def test_pointer_hit_matches_the_miss(self):
+        miss, miss_body = self.get()
+        hit, hit_body = self.get()
+        self.assertEqual(self.fetched, [PARCEL_ID])
+        self.assertEqual((hit.status_code, hit['ETag'], hit_body), (200, miss['ETag'], miss_body))
+        self.assertEqual(json.loads(hit_body)['coordinates'], {'x': 566010.0, 'y': 244020.0, 'epsg': '2180'})
+
+    def test_pointer_hit_is_not_modified(self):
+        etag = self.get()[0]['ETag']
+        response, body = self.get(**{'If-None-Match': etag})
+        self.assertEqual((response.status_code, response['ETag'], body), (304, etag, b''))
+
+    def test_points_share_the_entity_but_not_the_etag(self):
+        first, first_body = self.get()
+        second, second_body = self.get(x='566011.0')
+        self.assertEqual(self.fetched, [PARCEL_ID])
+        self.assertNotEqual(first['ETag'], second['ETag'])
+        first_data, second_data = json.loads(first_body), json.loads(second_body)
+        self.assertEqual(second_data['coordinates']['x'], 566011.0)
+        self.assertEqual({**first_data, 'coordinates': None}, {**second_data, 'coordinates': None})
+
+    def test_parcel_fetched_by_id_is_reused(self):
+        by_id = content(search_parcel_by_id(APIRequestFactory().get('/', {'parcel_id': PARCEL_ID})))
+        _, body = self.get()
+        _, hit_body = self.get()
+        self.assertEqual(self.fetched, [PARCEL_ID])
+        self.assertEqual(body, hit_body)
+        self.assertTrue(hit_body.endswith(by_id[1:]))
@@ -0,0 +1,73 @@
+import asyncio
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from ruby_api import feature_info
+
+LOCAL_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'feature_info'}}
+
+COMMUNE = {'JPT_KOD_JE': '1206142', 'JPT_NAZWA_': 'Mogilany'}
+
+
+class SlowPrg:
+    # afetch_prg_units answering after a delay, counting the requests it got
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    async def __call__(self, x, y, epsg, layers):
+        with self.lock:
+            self.calls += 1
+        await asyncio.sleep(self.delay)
+        return {'A03_Granice_gmin': COMMUNE}
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class SharedFetchTests(SimpleTestCase):
+    def setUp(self):
+        self.prg = SlowPrg()
+        patcher = mock.patch.object(feature_info, 'afetch_prg_units', self.prg)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_concurrent_lookups_in_a_loop_share_one_request(self):
+        async def lookups():
+            return await asyncio.gather(*(feature_info.afetch_administrative_units(566010.0, 244020.0, '2180')
+                                          for _ in range(8)))
+
+        results = asyncio.run(lookups())
+        self.assertEqual(self.prg.calls, 1)
+        self.assertTrue(all(units['commune'] == COMMUNE for units in results))
+
+    def test_float_noise_shares_the_request(self):
+        async def lookups():
+            return await asyncio.gather(feature_info.afetch_administrative_units(566010.0, 244020.0, '2180'),
+                                        feature_info.afetch_administrative_units(566010.0000001, 244020.0, '2180'))
+
+        asyncio.run(lookups())
+        self.assertEqual(self.prg.calls, 1)
+
+    def test_concurrent_lookups_on_several_loops(self):
+        # Under WSGI every request thread runs its own event loop
+        start = threading.Barrier(8)
+        results, errors = [], []
+
+        def lookup():
+            start.wait()
+            try:
+                results.append(asyncio.run(feature_info.afetch_administrative_units(566010.0, 244020.0, '2180')))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=lookup) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(results), 8)
+        self.assertTrue(all(units['commune'] == COMMUNE for units in results))
@@ -0,0 +1,112 @@
+import gzip
+import json
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APIRequestFactory
+
+from ruby_api.http_cache import accepts_gzip, etag_matches, gzip_etag, payload_etag
+from ruby_api.views import search_parcel_by_id
+
+PARCEL_ID = '120614_2.0001.123/1'
+LOCAL_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'http_cache'}}
+
+
+def feature(entity_id):
+    return {'layer_name': 'ms:dzialki', 'attributes': {'ID': entity_id}, 'geometry': 'POLYGON((0 0,1 0,1 1,0 0))'}
+
+
+def request(parcel_id=PARCEL_ID, **headers):
+    meta = {f"HTTP_{name.upper().replace('-', '_')}": value for name, value in headers.items()}
+    return APIRequestFactory().get('/', {'parcel_id': parcel_id}, **meta)
+
+
+def content(response):
+    if hasattr(response, 'render'):
+        response.render()
+    return response.content
+
+
+@override_settings(CACHES=LOCAL_CACHE, CACHE_RENDERED_RESPONSES=True, CACHE_NAMESPACE_CHECK_INTERVAL=0)
+class ConditionalRequestTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        patcher = mock.patch('ruby_api.views.parcel_by_id.find_parcel',
+                             side_effect=lambda service, entity_id: feature(entity_id))
+        self.find = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, parcel_id=PARCEL_ID, **headers):
+        response = search_parcel_by_id(request(parcel_id, **headers))
+        return response, content(response)
+
+    def test_etag_is_the_payload_hash(self):
+        response, body = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], payload_etag(json.loads(body)))
+        self.assertEqual(response['Cache-Control'], 'public, max-age=3600')
+
+    def test_cache_hit_keeps_the_etag(self):
+        first, first_body = self.get()
+        second, second_body = self.get()
+        self.assertEqual(self.find.call_count, 1)
+        self.assertEqual((second['ETag'], second_body), (first['ETag'], first_body))
+
+    def test_matching_etag_is_not_modified(self):
+        etag = self.get()[0]['ETag']
+        for header in (etag, f'W/{etag}', f'"other", {etag}', '*'):
+            with self.subTest(header=header):
+                response, body = self.get(**{'If-None-Match': header})
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], etag)
+                self.assertEqual(body, b'')
+        self.assertEqual(self.find.call_count, 1)
+
+    def test_other_etag_gets_the_body(self):
+        etag = self.get()[0]['ETag']
+        response, body = self.get(**{'If-None-Match': '"0123456789abcdef0123456789abcdef"'})
+        self.assertEqual((response.status_code, response['ETag']), (200, etag))
+        self.assertTrue(body)
+
+    def test_gzip_body_has_its_own_etag(self):
+        identity, identity_body = self.get()
+        response, body = self.get(**{'Accept-Encoding': 'gzip, deflate'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['ETag'], gzip_etag(identity['ETag']))
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(body), identity_body)
+
+        response, body = self.get(**{'If-None-Match': gzip_etag(identity['ETag']), 'Accept-Encoding': 'gzip'})
+        self.assertEqual((response.status_code, response['ETag']), (304, gzip_etag(identity['ETag'])))
+
+    def test_refused_gzip(self):
+        self.get()
+        response, _ = self.get(**{'Accept-Encoding': 'gzip;q=0, identity'})
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_uncached_result_has_validators(self):
+        # IDs with an invalid commune code are answered without caching
+        parcel_id = '1206_1.0001.123/1'
+        response, body = self.get(parcel_id)
+        self.assertEqual(response['ETag'], payload_etag(json.loads(body)))
+        response, _ = self.get(parcel_id, **{'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+
+class HeaderTests(SimpleTestCase):
+    def test_etag_matches(self):
+        etag = '"abc"'
+        cases = {'"abc"': etag, 'W/"abc"': etag, '"abc-gz"': '"abc-gz"', '"x", W/"abc-gz"': '"abc-gz"', '*': etag,
+                 '"abcd"': None, '': None}
+        for header, expected in cases.items():
+            with self.subTest(header=header):
+                self.assertEqual(etag_matches(request(**{'If-None-Match': header}), etag), expected)
+
+    def test_accepts_gzip(self):
+        cases = {'gzip': True, 'br, GZIP;q=0.5': True, '*': True, 'gzip;q=0': False, 'gzip; q=0.000': False,
+                 'deflate': False, '': False}
+        for header, expected in cases.items():
+            with self.subTest(header=header):
+                self.assertEqual(accepts_gzip(request(**{'Accept-Encoding': header})), expected)
@@ -0,0 +1,262 @@
+import asyncio
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APIRequestFactory
+
+from ruby_api import namespaces
+from ruby_api.administrative import COMMUNE, COUNTY, VOIVODESHIP
+from ruby_api.entities import BUILDING, KINDS, PARCEL, entity_key
+from ruby_api.namespaces import EPOCH_KEY, counter_key
+from ruby_api.views import (
+    search_building_by_id, search_building_by_xy, search_parcel_by_id, search_parcel_by_xy
+)
+
+PARCEL_ID = '120614_2.0001.123/1'
+BUILDING_ID = '120614_2.0001.123/1.1_BUD'
+# Voivodeship, county and commune of both
+UNITS = ('12', '1206', '120614_2')
+
+CHECK_INTERVAL = 5
+LOCAL_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'namespaces'}}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+def feature(entity_id):
+    return {'layer_name': 'ms:dzialki', 'attributes': {'ID': entity_id}, 'geometry': 'POLYGON((0 0,1 0,1 1,0 0))'}
+
+
+def invalidate_elsewhere(teryt):
+    # namespaces.invalidate run by another worker: the state of this one is left as it was
+    checked_at = namespaces._state['checked_at']
+    namespaces.invalidate(teryt, KINDS)
+    namespaces._state['checked_at'] = checked_at
+
+
+@override_settings(CACHES=LOCAL_CACHE, CACHE_NAMESPACE_CHECK_INTERVAL=CHECK_INTERVAL)
+class NamespaceTestCase(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.clock = Clock()
+        patcher = mock.patch.object(namespaces, 'time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        namespaces._state.update(epoch=None, checked_at=None, generations={})
+        self.addCleanup(namespaces._state.update, epoch=None, checked_at=None, generations={})
+
+
+class CounterTests(NamespaceTestCase):
+    def test_generation_is_the_sum_of_the_unit_counters(self):
+        self.assertEqual(namespaces.generation(PARCEL, PARCEL_ID), 0)
+        for teryt in UNITS:
+            namespaces.invalidate(teryt, [PARCEL])
+        namespaces.invalidate('120614_2', [PARCEL])
+        self.assertEqual(namespaces.generation(PARCEL, PARCEL_ID), 4)
+        self.assertEqual(cache.get(counter_key(PARCEL, '120614_2')), 2)
+
+    def test_counters_are_per_kind(self):
+        self.assertEqual(namespaces.invalidate('1206', [BUILDING]), {BUILDING: 1})
+        self.assertEqual(namespaces.generation(PARCEL, PARCEL_ID), 0)
+        self.assertEqual(namespaces.generation(BUILDING, BUILDING_ID), 1)
+        self.assertEqual(namespaces.generations('1206', KINDS), {PARCEL: 0, BUILDING: 1})
+
+    def test_counters_do_not_expire(self):
+        namespaces.invalidate('12', KINDS)
+        self.assertIsNone(cache._expire_info[cache.make_key(counter_key(PARCEL, '12'))])
+        self.assertIsNone(cache._expire_info[cache.make_key(EPOCH_KEY)])
+
+    def test_every_invalidation_increments_the_epoch(self):
+        namespaces.invalidate('12', KINDS)
+        namespaces.invalidate('1206', [PARCEL])
+        self.assertEqual(cache.get(EPOCH_KEY), 2)
+
+    def test_units_of_other_branches_are_not_counted(self):
+        for teryt in ('14', '1261', '120615_2'):
+            namespaces.invalidate(teryt, KINDS)
+        self.assertEqual(namespaces.generation(PARCEL, PARCEL_ID), 0)
+
+    def test_entity_key_carries_a_non_zero_generation(self):
+        self.assertEqual(entity_key(PARCEL, PARCEL_ID), f'parcel_{PARCEL_ID}')
+        namespaces.invalidate('1206', [PARCEL])
+        self.assertEqual(entity_key(PARCEL, PARCEL_ID), f'parcel_{PARCEL_ID}_g1')
+
+    def test_stamps(self):
+        namespaces.invalidate('12', [PARCEL])
+        stamps = asyncio.run(namespaces.astamps([(PARCEL, PARCEL_ID), (PARCEL, PARCEL_ID)]))
+        self.assertEqual(stamps, [(PARCEL, PARCEL_ID, 1)])
+        self.assertTrue(namespaces.current(stamps))
+        namespaces.invalidate('120614_2', [PARCEL])
+        self.assertFalse(namespaces.current(stamps))
+        self.assertFalse(asyncio.run(namespaces.acurrent(stamps)))
+
+    def test_level(self):
+        self.assertEqual([namespaces.level(teryt) for teryt in UNITS], [VOIVODESHIP, COUNTY, COMMUNE])
+        for teryt in ('1', '120', '120614', '120614_22', '1206_1', '12a4'):
+            self.assertIsNone(namespaces.level(teryt))
+
+
+class InvalidIdTests(NamespaceTestCase):
+    IDS = ('1206_1.0001.123/1', '12x614_2.0001.1', '120614.0001.1', '1206142.0001.1', 'ab')
+
+    def test_no_generation(self):
+        for entity_id in self.IDS:
+            self.assertIsNone(namespaces.generation(PARCEL, entity_id))
+            self.assertIsNone(asyncio.run(namespaces.ageneration(PARCEL, entity_id)))
+            self.assertIsNone(entity_key(PARCEL, entity_id))
+
+    def test_stamps_holding_one_are_never_current(self):
+        stamps = asyncio.run(namespaces.astamps([(PARCEL, PARCEL_ID), (PARCEL, '1206_1.0001.123/1')]))
+        self.assertFalse(namespaces.cacheable(stamps))
+        self.assertFalse(namespaces.current(stamps))
+        self.assertFalse(asyncio.run(namespaces.acurrent(stamps)))
+
+    def test_not_cached_by_id(self):
+        with mock.patch('ruby_api.views.parcel_by_id.find_parcel', return_value=feature('1206_1.0001.123/1')) as find:
+            for _ in range(2):
+                request = APIRequestFactory().get('/', {'parcel_id': '1206_1.0001.123/1'})
+                self.assertEqual(search_parcel_by_id(request).status_code, 200)
+        self.assertEqual(find.call_count, 2)
+        self.assertEqual(list(cache._cache), [])
+
+
+class WorkerCacheTests(NamespaceTestCase):
+    def test_counters_are_read_once_per_epoch(self):
+        namespaces.generation(PARCEL, PARCEL_ID)
+        with mock.patch.object(cache, 'get_many', wraps=cache.get_many) as get_many, \
+                mock.patch.object(cache, 'get', wraps=cache.get) as get:
+            namespaces.generation(PARCEL, PARCEL_ID)
+            self.assertEqual((get_many.call_count, get.call_count), (0, 0))
+            # Past the interval only the epoch is read, as it has not changed
+            self.clock.now += CHECK_INTERVAL
+            namespaces.generation(PARCEL, PARCEL_ID)
+            self.assertEqual((get_many.call_count, get.call_count), (0, 1))
+
+    def test_other_workers_invalidation_is_seen_after_the_interval(self):
+        self.assertEqual(namespaces.generation(PARCEL, PARCEL_ID), 0)
+        invalidate_elsewhere('1206')
+        self.clock.now += CHECK_INTERVAL - 1
+        self.assertEqual(namespaces.generation(PARCEL, PARCEL_ID), 0)
+        self.clock.now += 1
+        self.assertEqual(namespaces.generation(PARCEL, PARCEL_ID), 1)
+
+    def test_own_invalidation_is_seen_at_once(self):
+        self.assertEqual(namespaces.generation(PARCEL, PARCEL_ID), 0)
+        namespaces.invalidate('1206', KINDS)
+        self.assertEqual(namespaces.generation(PARCEL, PARCEL_ID), 1)
+
+    def test_new_epoch_drops_the_counters(self):
+        namespaces.generation(PARCEL, PARCEL_ID)
+        cache.set(EPOCH_KEY, 7, None)
+        self.clock.now += CHECK_INTERVAL
+        with mock.patch.object(cache, 'get_many', wraps=cache.get_many) as get_many:
+            namespaces.generation(PARCEL, PARCEL_ID)
+        self.assertEqual(get_many.call_count, 1)
+        self.assertEqual(namespaces._state['epoch'], 7)
+
+
+class InvalidationTests(NamespaceTestCase):
+    def setUp(self):
+        super().setUp()
+        self.fetched = []
+        for target in ('ruby_api.views.parcel_by_id.find_parcel', 'ruby_api.views.building_by_id.find_building'):
+            patcher = mock.patch(target, side_effect=self.fetch)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def fetch(self, service, entity_id):
+        self.fetched.append(entity_id)
+        return feature(entity_id)
+
+    def request_both(self):
+        factory = APIRequestFactory()
+        responses = (search_parcel_by_id(factory.get('/', {'parcel_id': PARCEL_ID})),
+                     search_building_by_id(factory.get('/', {'building_id': BUILDING_ID})))
+        self.assertEqual([response.status_code for response in responses], [200, 200])
+
+    def fetches(self):
+        fetched, self.fetched = self.fetched, []
+        return fetched
+
+    def test_invalidating_a_unit_drops_the_entities_below_it(self):
+        self.request_both()
+        self.assertEqual(self.fetches(), [PARCEL_ID, BUILDING_ID])
+        for teryt in UNITS:
+            with self.subTest(teryt=teryt):
+                self.request_both()
+                self.assertEqual(self.fetches(), [])
+                namespaces.invalidate(teryt, KINDS)
+                self.request_both()
+                self.assertEqual(self.fetches(), [PARCEL_ID, BUILDING_ID])
+
+    def test_invalidating_one_kind_keeps_the_other(self):
+        self.request_both()
+        self.fetches()
+        namespaces.invalidate('120614_2', [BUILDING])
+        self.request_both()
+        self.assertEqual(self.fetches(), [BUILDING_ID])
+
+    def test_invalidating_another_unit_keeps_the_entities(self):
+        self.request_both()
+        self.fetches()
+        for teryt in ('14', '1261', '120615_2'):
+            namespaces.invalidate(teryt, KINDS)
+        self.request_both()
+        self.assertEqual(self.fetches(), [])
+
+    def test_other_workers_invalidation_misses_within_the_interval(self):
+        for teryt in UNITS:
+            with self.subTest(teryt=teryt):
+                self.request_both()
+                self.fetches()
+                invalidate_elsewhere(teryt)
+                self.request_both()
+                self.assertEqual(self.fetches(), [])
+                self.clock.now += CHECK_INTERVAL
+                self.request_both()
+                self.assertEqual(self.fetches(), [PARCEL_ID, BUILDING_ID])
+
+
+class XYInvalidationTests(NamespaceTestCase):
+    def setUp(self):
+        super().setUp()
+        self.fetched = []
+        layers = {
+            'dzialki': [{'Identyfikator działki': PARCEL_ID}],
+            'budynki': [{'Identyfikator budynku': BUILDING_ID}],
+        }
+        patchers = [mock.patch(f'ruby_api.views.{kind}_by_xy.afetch_point_features', return_value=layers)
+                    for kind in ('parcel', 'building')]
+        patchers += [mock.patch(f'ruby_api.views.{kind}_by_xy.afind_{kind}', side_effect=self.fetch)
+                     for kind in ('parcel', 'building')]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def fetch(self, service, entity_id):
+        self.fetched.append(entity_id)
+        return feature(entity_id)
+
+    def request_both(self):
+        factory = APIRequestFactory()
+        for view in (search_parcel_by_xy, search_building_by_xy):
+            response = asyncio.run(view(factory.get('/', {'x': '566010.0', 'y': '244020.0'})))
+            self.assertEqual(response.status_code, 200)
+        fetched, self.fetched = self.fetched, []
+        return fetched
+
+    def test_invalidating_a_unit_drops_the_entities_below_it(self):
+        self.assertEqual(self.request_both(), [PARCEL_ID, BUILDING_ID])
+        for teryt in UNITS:
+            with self.subTest(teryt=teryt):
+                self.assertEqual(self.request_both(), [])
+                namespaces.invalidate(teryt, KINDS)
+                self.assertEqual(self.request_both(), [PARCEL_ID, BUILDING_ID])
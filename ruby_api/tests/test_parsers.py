@@ -0,0 +1,168 @@
+import asyncio
+
+import requests
+from django.test import SimpleTestCase
+from lxml import etree
+
+from benchmarks.stub_server import FIXTURES_DIR
+from ruby_api import parsers
+from ruby_api.tests.parser_references import (
+    cases, legacy_parse_gugik_feature_info, legacy_parse_wfs_multi_response, legacy_parse_wfs_response
+)
+from ruby_api.upstream import AsyncStreamedResponse, ResponseTooLarge, StreamedResponse, _iter_body
+
+WFS_FIXTURES = {
+    **{path: path.stem for path in sorted((FIXTURES_DIR / 'prg_wfs').glob('*.xml'))},
+    **{path: path.stem for path in (FIXTURES_DIR / 'county' / 'dzialki.xml', FIXTURES_DIR / 'county' / 'budynki.xml')},
+}
+
+FEATURE = (b'<wfs:member><ms:A03_Granice_gmin><ms:JPT_KOD_JE>%d</ms:JPT_KOD_JE>'
+           b'<ms:JPT_NAZWA_>gmina %d</ms:JPT_NAZWA_></ms:A03_Granice_gmin></wfs:member>')
+
+
+def chunked(body, size=97):
+    return [body[offset:offset + size] for offset in range(0, len(body), size)]
+
+
+def collection(count):
+    # A PRG WFS response with `count` communes, the first with code 0
+    return (b'<wfs:FeatureCollection xmlns:wfs="http://www.opengis.net/wfs/2.0" '
+            b'xmlns:ms="http://mapserver.gis.umn.edu/mapserver">'
+            + b''.join(FEATURE % (number, number) for number in range(count))
+            + b'</wfs:FeatureCollection>')
+
+
+def streamed(body, limit):
+    response = requests.Response()
+    response.status_code = 200
+    response._content = body
+    response._content_consumed = True
+    return StreamedResponse(response, 'http://upstream.test/wfs', limit)
+
+
+class CountingChunks:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.consumed = 0
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            self.consumed += 1
+            yield chunk
+
+
+async def acounting(chunks, counter):
+    try:
+        for chunk in chunks:
+            counter['consumed'] += 1
+            yield chunk
+    finally:
+        counter['closed'] = True
+
+
+async def aiterate(chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+class ParserParityTests(SimpleTestCase):
+    def test_lxml_parsers_match_the_etree_reference(self):
+        for name, content, args, legacy, current in cases():
+            with self.subTest(name):
+                self.assertEqual(current(content, *args), legacy(content, *args))
+
+    def test_every_fixture_is_covered(self):
+        covered = {name.split(' ')[0] for name, *_ in cases()}
+        for path in FIXTURES_DIR.glob('*/*.xml'):
+            with self.subTest(path.name):
+                self.assertIn(f'{path.parent.name}/{path.name}', covered)
+
+    def test_gugik_layers_hold_the_same_features(self):
+        for path in sorted((FIXTURES_DIR / 'gugik').glob('*.xml')):
+            with self.subTest(path.name):
+                content = path.read_bytes()
+                layers = parsers.parse_gugik_feature_info_layers(content)
+                features = [feature for features in layers.values() for feature in features]
+                merged = {key: value for feature in features for key, value in feature.items()}
+                expected = {key: value for feature in legacy_parse_gugik_feature_info(content)
+                            for key, value in feature.items()}
+                self.assertEqual(merged, expected)
+                self.assertTrue(set(layers) <= {'dzialki', 'budynki'})
+
+
+class StreamingParserTests(SimpleTestCase):
+    def test_stream_matches_the_reference(self):
+        for path, layer in WFS_FIXTURES.items():
+            with self.subTest(path.name):
+                content = path.read_bytes()
+                self.assertEqual(next(parsers.iter_wfs_features(chunked(content), layer), None),
+                                 legacy_parse_wfs_response(content, layer))
+                self.assertEqual([data for data in parsers.iter_wfs_features(chunked(content), layer) if data],
+                                 legacy_parse_wfs_multi_response(content, layer))
+
+    def test_async_stream_matches_the_reference(self):
+        for path, layer in WFS_FIXTURES.items():
+            with self.subTest(path.name):
+                content = path.read_bytes()
+                self.assertEqual(asyncio.run(parsers.aparse_wfs_stream(aiterate(chunked(content)), layer)),
+                                 legacy_parse_wfs_response(content, layer))
+                self.assertEqual(asyncio.run(parsers.aparse_wfs_multi_stream(aiterate(chunked(content)), layer)),
+                                 legacy_parse_wfs_multi_response(content, layer))
+
+    def test_first_feature_stops_reading(self):
+        chunks = CountingChunks(chunked(collection(1000)))
+        data = next(parsers.iter_wfs_features(chunks, 'A03_Granice_gmin'))
+        self.assertEqual(data, {'JPT_KOD_JE': '0', 'JPT_NAZWA_': 'gmina 0'})
+        self.assertLess(chunks.consumed, len(chunks.chunks) // 100)
+
+    def test_async_first_feature_stops_reading_and_closes_the_source(self):
+        chunks = chunked(collection(1000))
+        counter = {'consumed': 0, 'closed': False}
+        data = asyncio.run(parsers.aparse_wfs_stream(acounting(chunks, counter), 'A03_Granice_gmin'))
+        self.assertEqual(data, {'JPT_KOD_JE': '0', 'JPT_NAZWA_': 'gmina 0'})
+        self.assertLess(counter['consumed'], len(chunks) // 100)
+        self.assertTrue(counter['closed'])
+
+    def test_every_feature_of_a_large_stream(self):
+        features = list(parsers.iter_wfs_features(chunked(collection(1000)), 'A03_Granice_gmin'))
+        self.assertEqual([data['JPT_KOD_JE'] for data in features], [str(number) for number in range(1000)])
+
+    def test_malformed_stream(self):
+        with self.assertRaises(etree.XMLSyntaxError):
+            list(parsers.iter_wfs_features([b'<broken'], 'A03_Granice_gmin'))
+        self.assertIsNone(asyncio.run(parsers.aparse_wfs_stream(aiterate([b'<broken']), 'A03_Granice_gmin')))
+        self.assertEqual(asyncio.run(parsers.aparse_wfs_multi_stream(aiterate([b'<broken']), 'A03_Granice_gmin')), [])
+
+
+class OversizedStreamTests(SimpleTestCase):
+    body = collection(1000)
+    limit = len(collection(1000)) // 2
+
+    def test_oversized_body_raises(self):
+        response = streamed(self.body, self.limit)
+        with self.assertRaises(ResponseTooLarge):
+            list(parsers.iter_wfs_features(response.iter_content(1024), 'A03_Granice_gmin'))
+        self.assertTrue(response.oversized)
+
+    def test_async_oversized_body_raises(self):
+        async def parse():
+            response = AsyncStreamedResponse('http://upstream.test/wfs', 'http://upstream.test/wfs', 200, {},
+                                             _iter_body(self.body, 1024), self.limit)
+            return [data async for data in parsers.aiter_wfs_features(response.aiter_content(), 'A03_Granice_gmin')]
+
+        with self.assertRaises(ResponseTooLarge):
+            asyncio.run(parse())
+
+    def test_first_feature_of_an_oversized_body(self):
+        # Stopping after the first feature never reads up to the limit
+        response = streamed(self.body, self.limit)
+        data = next(parsers.iter_wfs_features(response.iter_content(1024), 'A03_Granice_gmin'))
+        self.assertEqual(data['JPT_KOD_JE'], '0')
+        self.assertFalse(response.oversized)
+
+    def test_async_first_feature_of_an_oversized_body(self):
+        response = AsyncStreamedResponse('http://upstream.test/wfs', 'http://upstream.test/wfs', 200, {},
+                                         _iter_body(self.body, 1024), self.limit)
+        data = asyncio.run(parsers.aparse_wfs_stream(response.aiter_content(), 'A03_Granice_gmin'))
+        self.assertEqual(data['JPT_KOD_JE'], '0')
+        self.assertFalse(response.oversized)
@@ -0,0 +1,88 @@
+import asyncio
+import json
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APIRequestFactory
+
+from ruby_api.administrative import (
+    CADASTRAL_UNIT, CITY, COMMUNE, COUNTY, HIERARCHY, REGION, VOIVODESHIP, WMS_LAYERS
+)
+from ruby_api.views import get_point_by_xy
+
+LOCAL_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'point_by_xy'}}
+
+TERYTS = {
+    VOIVODESHIP: '12', COUNTY: '1206', COMMUNE: '1206142', CITY: '1206011', CADASTRAL_UNIT: '120614_2',
+    REGION: '120614_2.0001',
+}
+UNITS = {level: {'JPT_NAZWA_': f'{level} name', 'JPT_KOD_JE': teryt} for level, teryt in TERYTS.items()}
+
+
+def snapshot(levels):
+    # afind_administrative_unit of a snapshot holding `levels`
+    async def afind_administrative_unit(level, x, y, epsg):
+        return UNITS[level] if level in levels else None
+    return afind_administrative_unit
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class PointUnitsTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.prg_units = mock.AsyncMock(side_effect=lambda x, y, epsg, layers: {
+            layer: UNITS[level] for level, layer in WMS_LAYERS.items() if layer in layers
+        })
+        self.administrative_units = mock.AsyncMock(return_value=UNITS)
+        for name, value in (('afetch_point_features', mock.AsyncMock(return_value={})),
+                            ('afetch_prg_units', self.prg_units),
+                            ('afetch_administrative_units', self.administrative_units)):
+            patcher = mock.patch(f'ruby_api.views.point_by_xy.{name}', value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def request(self, levels):
+        with mock.patch('ruby_api.views.point_by_xy.afind_administrative_unit', snapshot(levels)):
+            request = APIRequestFactory().get('/', {'x': '566010.0', 'y': '244020.0'})
+            response = asyncio.run(get_point_by_xy(request))
+        self.assertEqual(response.status_code, 200)
+        if hasattr(response, 'render'):
+            response.render()
+        return json.loads(response.content)
+
+    def assert_all_levels(self, result):
+        for level, teryt in TERYTS.items():
+            self.assertEqual(result[level]['teryt'], teryt)
+
+    def test_snapshot_with_every_level(self):
+        self.assert_all_levels(self.request(TERYTS))
+        self.prg_units.assert_not_called()
+        self.administrative_units.assert_not_called()
+
+    def test_cities_and_cadastral_units_from_wms(self):
+        # A snapshot refreshed from PRG WFS holds the hierarchy only
+        self.assert_all_levels(self.request(HIERARCHY))
+        self.prg_units.assert_awaited_once()
+        self.assertEqual(list(self.prg_units.call_args.args[3]), [WMS_LAYERS[CITY], WMS_LAYERS[CADASTRAL_UNIT]])
+        self.administrative_units.assert_not_called()
+
+    def test_no_city_at_the_point(self):
+        self.prg_units.side_effect = lambda x, y, epsg, layers: {WMS_LAYERS[CADASTRAL_UNIT]: UNITS[CADASTRAL_UNIT]}
+        result = self.request(HIERARCHY)
+        self.assertIsNone(result[CITY])
+        self.assertEqual(result[CADASTRAL_UNIT]['teryt'], TERYTS[CADASTRAL_UNIT])
+
+    def test_no_snapshot(self):
+        self.assert_all_levels(self.request(()))
+        self.administrative_units.assert_awaited_once()
+        self.prg_units.assert_not_called()
+
+    def test_wms_failure_is_not_cached(self):
+        self.prg_units.side_effect = None
+        self.prg_units.return_value = None
+        result = self.request(HIERARCHY)
+        self.assertEqual([result[level] for level in (CITY, CADASTRAL_UNIT)], [None, None])
+        self.assertEqual(result[COMMUNE]['teryt'], TERYTS[COMMUNE])
+        self.assertIsNone(cache.get('point_xy_566010.0_244020.0_2180'))
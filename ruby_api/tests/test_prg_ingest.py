@@ -0,0 +1,84 @@
+import tempfile
+
+import shapely
+from django.test import SimpleTestCase, override_settings
+
+from ruby_api import prg_snapshot
+from ruby_api.administrative import COMMUNE, COUNTY, REGION, VOIVODESHIP
+from ruby_api.prg_ingest import publish_units
+
+LOCAL_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'prg_ingest'}}
+ARTIFACTS = ('autocomplete', 'grid', 'teryt', 'pyramid')
+
+
+def unit(level, teryt, name, box):
+    return {'level': level, 'teryt': teryt, 'name': name, 'regon': '', 'type': '',
+            'geometry': shapely.to_wkb(shapely.box(*box))}
+
+
+def units(commune_name='Mogilany'):
+    return [
+        unit(VOIVODESHIP, '12', 'małopolskie', (0, 0, 2000, 2000)),
+        unit(COUNTY, '1206', 'krakowski', (0, 0, 2000, 2000)),
+        unit(COMMUNE, '1206142', commune_name, (0, 0, 1000, 2000)),
+        unit(COMMUNE, '1206152', 'Skawina', (1000, 0, 2000, 2000)),
+        unit(REGION, '120614_2.0001', 'Mogilany', (0, 0, 1000, 2000)),
+        unit(REGION, '120615_2.0001', 'Skawina', (1000, 0, 2000, 2000)),
+    ]
+
+
+def inodes(version, name):
+    return sorted(path.stat().st_ino for path in (version / name).iterdir())
+
+
+class ArtifactReuseTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(CACHES=LOCAL_CACHE, PRG_SNAPSHOT_DIR=directory.name, PRG_SNAPSHOT_KEEP=3,
+                                     PRG_GRID_RESOLUTION=500.0, PRG_PYRAMID_TOLERANCES=[10.0])
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def publish(self, published, levels, **kwargs):
+        manifest = publish_units(published, {'type': 'test'}, levels, **kwargs)
+        return manifest, prg_snapshot.current_dir()
+
+    def test_first_publication_builds_every_artifact(self):
+        manifest, version = self.publish(units(), [VOIVODESHIP, COUNTY, COMMUNE, REGION])
+        self.assertEqual(manifest['artifacts'], dict.fromkeys(ARTIFACTS, 'built'))
+        for name in ARTIFACTS:
+            self.assertTrue((version / name).is_dir(), name)
+
+    def test_attribute_change_reuses_the_boundary_artifacts(self):
+        _, first = self.publish(units(), [VOIVODESHIP, COUNTY, COMMUNE, REGION])
+        # An attribute-only refresh of the dictionary levels, as teryt_dictionary.refresh does
+        changed = [dict(item, geometry=None) for item in units('Mogilany nowe') if item['level'] != REGION]
+        manifest, second = self.publish(changed, [VOIVODESHIP, COUNTY, COMMUNE], keep_boundaries=True)
+
+        self.assertNotEqual(first, second)
+        self.assertEqual(manifest['changes']['attributes'], 1)
+        self.assertEqual(manifest['artifacts'],
+                         {'autocomplete': 'built', 'grid': 'reused', 'teryt': 'built', 'pyramid': 'reused'})
+        for name in ('grid', 'pyramid'):
+            self.assertEqual(inodes(first, name), inodes(second, name))
+        self.assertNotEqual(inodes(first, 'teryt'), inodes(second, 'teryt'))
+
+    def test_boundary_changes(self):
+        self.publish(units(), [VOIVODESHIP, COUNTY, COMMUNE, REGION])
+        communes = [item for item in units() if item['level'] == COMMUNE]
+        communes[0]['geometry'] = shapely.to_wkb(shapely.box(0, 0, 1000, 1500))
+        manifest, _ = self.publish(communes, [COMMUNE])
+        self.assertEqual(manifest['artifacts'],
+                         {'autocomplete': 'reused', 'grid': 'reused', 'teryt': 'reused', 'pyramid': 'built'})
+
+        regions = [item for item in units() if item['level'] == REGION]
+        regions[0]['geometry'] = shapely.to_wkb(shapely.box(0, 0, 1000, 1500))
+        manifest, _ = self.publish(regions, [REGION])
+        self.assertEqual(manifest['artifacts'],
+                         {'autocomplete': 'reused', 'grid': 'built', 'teryt': 'reused', 'pyramid': 'built'})
+
+    def test_forced_publication_rebuilds_everything(self):
+        self.publish(units(), [VOIVODESHIP, COUNTY, COMMUNE, REGION])
+        manifest, _ = self.publish(units(), [VOIVODESHIP, COUNTY, COMMUNE, REGION], force=True)
+        self.assertEqual(manifest['artifacts'], dict.fromkeys(ARTIFACTS, 'built'))
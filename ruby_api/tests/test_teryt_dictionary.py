@@ -0,0 +1,107 @@
+import asyncio
+import json
+import tempfile
+from contextlib import asynccontextmanager
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APIRequestFactory
+
+from ruby_api import prg_snapshot
+from ruby_api.administrative import COMMUNE, COUNTY, VOIVODESHIP
+from ruby_api.views import get_commune_by_id, get_county_by_id
+
+LOCAL_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'teryt'}}
+UNITS = [
+    {'level': VOIVODESHIP, 'teryt': '12', 'name': 'małopolskie', 'regon': '351555662', 'type': 'WOJ'},
+    {'level': COUNTY, 'teryt': '1206', 'name': 'powiat krakowski', 'regon': '351555752', 'type': 'POW'},
+    {'level': COMMUNE, 'teryt': '120614_2', 'name': 'Mogilany', 'regon': '351555550', 'type': 'GM'},
+]
+# What PRG WFS answers for a commune missing from the dictionary
+WFS_COMMUNE = {'JPT_KOD_JE': '120615_2', 'JPT_NAZWA_': 'Skawina', 'JPT_SJR_KO': 'GM', 'REGON': '351556060'}
+
+
+def content(response):
+    if hasattr(response, 'render'):
+        response.render()
+    return json.loads(response.content)
+
+
+class UpstreamResponse:
+    def raise_for_status(self):
+        pass
+
+    async def aiter_content(self):
+        yield b''
+
+
+@override_settings(CACHES=LOCAL_CACHE, PRG_SNAPSHOT_CHECK_INTERVAL=0)
+class DictionaryLookupTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(PRG_SNAPSHOT_DIR=directory.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        prg_snapshot.artifacts.reset()
+        self.addCleanup(prg_snapshot.artifacts.reset)
+
+        self.requested = []
+        self.wfs_data = WFS_COMMUNE
+        patchers = [
+            mock.patch('ruby_api.views.administrative_by_id.upstream.astream', self.astream),
+            mock.patch('ruby_api.views.administrative_by_id.aparse_wfs_stream', side_effect=self.aparse),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    @asynccontextmanager
+    async def astream(self, url, params=None, timeout=None):
+        self.requested.append(params['TYPENAME'])
+        yield UpstreamResponse()
+
+    async def aparse(self, chunks, layer_name):
+        return self.wfs_data
+
+    def publish(self, units):
+        prg_snapshot.write_snapshot(units, {'type': 'test'}, build=prg_snapshot.build_artifacts)
+
+    def get(self, view, **params):
+        response = asyncio.run(view(APIRequestFactory().get('/', params)))
+        return response.status_code, content(response)
+
+    def test_found_in_the_dictionary(self):
+        self.publish(UNITS)
+        status, data = self.get(get_commune_by_id, commune_id='120614_2')
+        self.assertEqual(status, 200)
+        self.assertEqual(data['commune'], {'name': 'Mogilany', 'teryt': '120614_2', 'type': 'GM', 'regon': '351555550'})
+        self.assertEqual(self.requested, [])
+
+    def test_missing_from_a_covered_level_is_not_found(self):
+        # The dictionary holds every commune, so PRG WFS would not know this one either
+        self.publish(UNITS)
+        status, data = self.get(get_commune_by_id, commune_id='120615_2')
+        self.assertEqual((status, data['commune_id']), (404, '120615_2'))
+        self.assertEqual(self.requested, [])
+
+    def test_level_missing_from_the_dictionary_falls_back_to_wfs(self):
+        self.publish([unit for unit in UNITS if unit['level'] != COMMUNE])
+        status, data = self.get(get_commune_by_id, commune_id='120615_2')
+        self.assertEqual((status, data['commune']['name']), (200, 'Skawina'))
+        self.assertEqual(self.requested, ['ms:A03_Granice_gmin'])
+
+        status, _ = self.get(get_county_by_id, county_id='1206')
+        self.assertEqual(status, 200)
+        self.assertEqual(self.requested, ['ms:A03_Granice_gmin'])
+
+    def test_no_snapshot_falls_back_to_wfs(self):
+        status, data = self.get(get_commune_by_id, commune_id='120615_2')
+        self.assertEqual((status, data['commune']['name']), (200, 'Skawina'))
+        self.wfs_data = None
+        status, _ = self.get(get_commune_by_id, commune_id='120616_2')
+        self.assertEqual(status, 404)
+        self.assertEqual(self.requested, ['ms:A03_Granice_gmin', 'ms:A03_Granice_gmin'])
@@ -0,0 +1,96 @@
+import threading
+from unittest import mock
+
+import fakeredis
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from ruby_api import ttl, warmup
+from ruby_api.administrative import COMMUNE, cache_key
+from ruby_api.entities import BUILDING, PARCEL
+
+LOCAL_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'ttl'}}
+CACHE_TTLS = {PARCEL: 3600, BUILDING: 3600, ttl.ADMINISTRATIVE: 86400}
+PARCEL_ID = '120614_2.0001.123/1'
+COMMUNES = [{'JPT_KOD_JE': '120614_2', 'JPT_NAZWA_': 'Mogilany'}, {'JPT_KOD_JE': '120615_2', 'JPT_NAZWA_': 'Skawina'}]
+
+
+@override_settings(CACHES=LOCAL_CACHE, CACHE_TTLS=CACHE_TTLS, CACHE_TTL_POLICY_CHECK_INTERVAL=0)
+class OverrideTestCase(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        ttl._policy.update(overrides={}, checked_at=None)
+        self.addCleanup(ttl._policy.update, overrides={}, checked_at=None)
+
+
+class RedisOverrideTests(OverrideTestCase):
+    def setUp(self):
+        super().setUp()
+        server = fakeredis.FakeServer()
+        # A client per call, like the connection pool of the Redis cache backend
+        patcher = mock.patch.object(ttl, '_redis', lambda: fakeredis.FakeRedis(server=server))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_most_specific_prefix_wins(self):
+        ttl.set_override(PARCEL, 600)
+        ttl.set_override(PARCEL, 300, '12')
+        ttl.set_override(PARCEL, 60, '120614_2')
+        self.assertEqual(ttl.policy(PARCEL, PARCEL_ID), 60)
+        self.assertEqual(ttl.policy(PARCEL, '1206'), 300)
+        self.assertEqual(ttl.policy(PARCEL, '14'), 600)
+        self.assertEqual(ttl.policy(BUILDING, PARCEL_ID), 3600)
+
+    def test_remove(self):
+        ttl.set_override(PARCEL, 300, '12')
+        ttl.set_override(BUILDING, 300, '12')
+        self.assertEqual(ttl.remove_override(PARCEL, '12'), {BUILDING: {'12': 300}})
+        self.assertEqual(ttl.policy(PARCEL, PARCEL_ID), 3600)
+
+    def test_concurrent_changes_are_all_kept(self):
+        prefixes = [f'{voivodeship:02d}' for voivodeship in range(2, 34, 2)]
+        start = threading.Barrier(len(prefixes))
+
+        def set_override(prefix):
+            start.wait()
+            ttl.set_override(PARCEL, 100 + int(prefix), prefix)
+
+        threads = [threading.Thread(target=set_override, args=(prefix,)) for prefix in prefixes]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(ttl.overrides(), {PARCEL: {prefix: 100 + int(prefix) for prefix in prefixes}})
+
+
+class LocalOverrideTests(OverrideTestCase):
+    def test_set_and_remove(self):
+        ttl.set_override(ttl.ADMINISTRATIVE, 600, '1206')
+        self.assertEqual(ttl.policy(ttl.ADMINISTRATIVE, '120614_2'), 600)
+        ttl.remove_override(ttl.ADMINISTRATIVE, '1206')
+        self.assertEqual(ttl.overrides(), {})
+        self.assertEqual(ttl.policy(ttl.ADMINISTRATIVE, '120614_2'), 86400)
+
+
+@override_settings(CACHE_TTL_GROWTH=2, CACHE_TTL_MAX_FACTOR=24, CACHE_TTL_CEILING=10 ** 9)
+class WarmupLearningTests(OverrideTestCase):
+    def warm(self, communes):
+        with mock.patch.object(warmup, 'iter_pages', return_value=[communes]):
+            report = warmup.warm_level(COMMUNE, 1000)
+        self.assertEqual(report['cached'], len(communes))
+        return {data['JPT_KOD_JE']: cache._expire_info[cache.make_key(cache_key(COMMUNE, data['JPT_KOD_JE']))]
+                for data in communes}
+
+    def test_unchanged_units_get_longer_ttls(self):
+        with mock.patch('time.time', return_value=1000.0):
+            self.assertEqual(self.warm(COMMUNES), {'120614_2': 87400.0, '120615_2': 87400.0})
+            changed = [COMMUNES[0], dict(COMMUNES[1], JPT_NAZWA_='Skawina nowa')]
+            self.assertEqual(self.warm(changed), {'120614_2': 173800.0, '120615_2': 87400.0})
+
+    def test_like_the_views(self):
+        key = cache_key(COMMUNE, '120614_2')
+        self.warm(COMMUNES)
+        self.assertEqual(cache.get(ttl.history_key(key))[1], 86400)
+        result = cache.get(key)
+        self.assertEqual(ttl.learn(key, result, 86400), 172800)
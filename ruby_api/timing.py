@@ -0,0 +1,92 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+SPAN_DESCRIPTIONS = {
+    'cache': 'Cache lookup',
+    'bulkhead': 'Upstream bulkhead wait',
+    'gfi': 'GUGiK GetFeatureInfo',
+    'prg_wms': 'PRG WMS GetFeatureInfo',
+    'prg_wfs': 'PRG WFS GetFeature',
+    'wfs_layer': 'WFS layer construction',
+    'features': 'Feature iteration',
+    'geometry': 'Geometry serialization',
+    'name_index': 'Local name index search',
+    'autocomplete': 'Autocomplete index lookup',
+    'boundary_index': 'Local boundary index lookup',
+    'region_grid': 'Region grid lookup',
+    'teryt_dictionary': 'TERYT dictionary lookup',
+    'render': 'Response rendering',
+}
+
+_current = ContextVar('ruby_api_timing', default=None)
+
+
+class Timing:
+    def __init__(self):
+        self.spans = []
+        self.upstream = []
+
+    def add_span(self, name, duration):
+        self.spans.append((name, duration))
+
+    def add_upstream(self, url, status, duration):
+        self.upstream.append({
+            'url': url,
+            'status': status,
+            'duration_ms': round(duration * 1000, 2),
+        })
+
+    def totals(self):
+        totals = {}
+        for name, duration in self.spans:
+            totals[name] = totals.get(name, 0.0) + duration
+        return totals
+
+    def header(self):
+        entries = []
+        for name, duration in self.totals().items():
+            entry = f'{name};dur={duration * 1000:.2f}'
+            description = SPAN_DESCRIPTIONS.get(name)
+            if description:
+                entry += f';desc="{description}"'
+            entries.append(entry)
+        return ', '.join(entries)
+
+    def as_dict(self):
+        return {
+            'spans': {name: round(duration * 1000, 2) for name, duration in self.totals().items()},
+            'upstream': self.upstream,
+        }
+
+
+def activate(timing):
+    return _current.set(timing)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+def current_timing():
+    return _current.get()
+
+
+@contextmanager
+def span(name):
+    timing = _current.get()
+    if timing is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.add_span(name, time.perf_counter() - started)
+
+
+def record_upstream(url, status, duration):
+    timing = _current.get()
+    if timing is not None:
+        timing.add_upstream(url, status, duration)
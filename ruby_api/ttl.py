@@ -0,0 +1,151 @@
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from ruby_api.http_cache import payload_etag
+
+# Cache lifetimes by kind of entry (parcel, building, administrative unit, ...) and TERYT region.
+#
+# Every kind has a base TTL in CACHE_TTLS. Overrides for a kind, optionally limited to a TERYT prefix
+# (voivodeship "12", county "1206", commune "120614_2"), are kept in a Redis hash under POLICY_KEY, one
+# "<kind>:<prefix>" field each, so `manage.py cache_ttl` retunes every worker at runtime and two changes
+# at once never overwrite each other; the most specific prefix wins. Workers re-read them every
+# CACHE_TTL_POLICY_CHECK_INTERVAL seconds.
+#
+# On top of that, lifetimes are learned per key. Each write after an upstream fetch records the ETag of
+# what was fetched under "ttl_history_<key>". When a refresh brings back the same content, the next
+# lifetime is CACHE_TTL_GROWTH times the previous one, up to CACHE_TTL_MAX_FACTOR times the base TTL (and
+# at most CACHE_TTL_CEILING); when the content changed, it goes back to the base TTL. Keys that keep
+# changing therefore stay at the base TTL of their region, keys that never change are fetched ever more
+# rarely.
+
+POLICY_KEY = 'ttl_overrides'
+HISTORY_PREFIX = 'ttl_history_'
+
+# Kinds besides the parcel and building entities (ruby_api.entities)
+ADMINISTRATIVE = 'administrative'
+# GetFeatureInfo-only parcel and building results, without geometry
+FEATURES = 'features'
+# Parsed GUGiK GetFeatureInfo layers shared by the parcel and building XY endpoints
+FEATURE_INFO = 'feature_info'
+
+_policy = {'overrides': {}, 'checked_at': None}
+
+
+def _stale():
+    checked_at = _policy['checked_at']
+    return checked_at is None or time.monotonic() - checked_at >= settings.CACHE_TTL_POLICY_CHECK_INTERVAL
+
+
+def _loaded(overrides):
+    _policy['overrides'] = overrides or {}
+    _policy['checked_at'] = time.monotonic()
+
+
+def _ttl(kind, teryt):
+    overrides = _policy['overrides'].get(kind, {})
+    prefix = max((prefix for prefix in overrides if (teryt or '').startswith(prefix)), key=len, default=None)
+    return overrides[prefix] if prefix is not None else settings.CACHE_TTLS[kind]
+
+
+def policy(kind, teryt=''):
+    # Base TTL of an entry of `kind` for the unit, parcel or building with this TERYT code (or ID)
+    if _stale():
+        _loaded(overrides())
+    return _ttl(kind, teryt)
+
+
+async def apolicy(kind, teryt=''):
+    if _stale():
+        _loaded(await sync_to_async(overrides, thread_sensitive=False)())
+    return _ttl(kind, teryt)
+
+
+def history_key(cache_key):
+    return f'{HISTORY_PREFIX}{cache_key}'
+
+
+def _learned(history, etag, base):
+    # `history` is the (etag, ttl) of the previous fetch of the key
+    if not history or history[0] != etag:
+        return base
+    longest = min(base * settings.CACHE_TTL_MAX_FACTOR, max(settings.CACHE_TTL_CEILING, base))
+    return int(max(base, min(history[1] * settings.CACHE_TTL_GROWTH, longest)))
+
+
+def _history_timeout(ttl):
+    # Outlives the entry, so the next fetch after it expires can be compared
+    return ttl * 2
+
+
+def learn(cache_key, result, base):
+    # The TTL to cache freshly fetched `result` under `cache_key` with, given the base TTL of its policy
+    etag = payload_etag(result)
+    ttl = _learned(cache.get(history_key(cache_key)), etag, base)
+    cache.set(history_key(cache_key), (etag, ttl), _history_timeout(ttl))
+    return ttl
+
+
+async def alearn(cache_key, result, base):
+    etag = payload_etag(result)
+    ttl = _learned(await cache.aget(history_key(cache_key)), etag, base)
+    await cache.aset(history_key(cache_key), (etag, ttl), _history_timeout(ttl))
+    return ttl
+
+
+def learn_many(results):
+    # learn() for a batch: `results` maps cache keys to (result, base TTL); returns the TTL of each key
+    histories = cache.get_many([history_key(cache_key) for cache_key in results])
+    ttls, records = {}, {}
+    for cache_key, (result, base) in results.items():
+        etag = payload_etag(result)
+        ttls[cache_key] = _learned(histories.get(history_key(cache_key)), etag, base)
+        records.setdefault(_history_timeout(ttls[cache_key]), {})[history_key(cache_key)] = (etag, ttls[cache_key])
+    for timeout, group in records.items():
+        cache.set_many(group, timeout=timeout)
+    return ttls
+
+
+def _redis():
+    # Client of the Redis cache backend; None for other backends (locmem in tests), which are per process
+    client = getattr(cache, '_cache', None)
+    return client.get_client(write=True) if hasattr(client, 'get_client') else None
+
+
+def _fields():
+    client = _redis()
+    if client is None:
+        return cache.get(POLICY_KEY) or {}
+    fields = client.hgetall(cache.make_and_validate_key(POLICY_KEY))
+    return {field.decode(): int(ttl) for field, ttl in fields.items()}
+
+
+def overrides():
+    current = {}
+    for field, ttl in _fields().items():
+        kind, prefix = field.split(':', 1)
+        current.setdefault(kind, {})[prefix] = ttl
+    return current
+
+
+def set_override(kind, ttl, prefix=''):
+    # Kept without expiry; takes effect in every worker within CACHE_TTL_POLICY_CHECK_INTERVAL seconds
+    client = _redis()
+    if client is None:
+        cache.set(POLICY_KEY, {**_fields(), f'{kind}:{prefix}': ttl}, None)
+    else:
+        client.hset(cache.make_and_validate_key(POLICY_KEY), f'{kind}:{prefix}', ttl)
+    return overrides()
+
+
+def remove_override(kind, prefix=''):
+    client = _redis()
+    if client is None:
+        fields = _fields()
+        fields.pop(f'{kind}:{prefix}', None)
+        cache.set(POLICY_KEY, fields, None)
+    else:
+        client.hdel(cache.make_and_validate_key(POLICY_KEY), f'{kind}:{prefix}')
+    return overrides()
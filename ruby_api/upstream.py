@@ -0,0 +1,262 @@
+import asyncio
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager, nullcontext
+
+import httpx
+import requests
+from django.conf import settings
+from requests.structures import CaseInsensitiveDict
+
+from ruby_api import archive, bulkhead
+from ruby_api.timing import record_upstream
+
+LIVE = 'live'
+RECORD = 'record'
+REPLAY = 'replay'
+SEED = 'seed'
+
+CHUNK_SIZE = 64 * 1024
+
+
+class ResponseTooLarge(requests.RequestException):
+    pass
+
+
+def mode():
+    return settings.UPSTREAM_MODE
+
+
+class StreamedResponse:
+    def __init__(self, response, request_url, limit, record=False):
+        self.response = response
+        # What the archive is keyed by: replay looks responses up by the URL requested, not the one
+        # redirects ended at
+        self.request_url = request_url
+        self.limit = limit
+        self.received = 0
+        self.exhausted = False
+        self.oversized = False
+        self._chunks = [] if record else None
+
+    @property
+    def status_code(self):
+        return self.response.status_code
+
+    @property
+    def headers(self):
+        return self.response.headers
+
+    @property
+    def url(self):
+        return self.response.url
+
+    def raise_for_status(self):
+        self.response.raise_for_status()
+
+    def iter_content(self, chunk_size=CHUNK_SIZE):
+        for chunk in self.response.iter_content(chunk_size):
+            self.received += len(chunk)
+            if self.limit and self.received > self.limit:
+                self.oversized = True
+                raise ResponseTooLarge(f'Response from {self.url} exceeds {self.limit} bytes')
+            if self._chunks is not None:
+                self._chunks.append(chunk)
+            yield chunk
+        self.exhausted = True
+
+    def read(self):
+        return b''.join(self.iter_content())
+
+    def close(self):
+        # Recording needs the whole body, even when the consumer stopped after the first feature
+        if self._chunks is not None and not self.oversized:
+            if not self.exhausted:
+                for _ in self.iter_content():
+                    pass
+            archive.store(self.request_url, self.status_code, self.headers, b''.join(self._chunks))
+        self._chunks = None
+        self.response.close()
+
+
+def _check_declared_length(response, limit):
+    declared = response.headers.get('Content-Length')
+    if limit and declared and declared.isdigit() and int(declared) > limit:
+        response.close()
+        raise ResponseTooLarge(f'Response from {response.url} declares {declared} bytes, limit is {limit}')
+
+
+def _open(request_url, timeout):
+    current = mode()
+    limit = settings.UPSTREAM_MAX_RESPONSE_BYTES
+
+    if current == REPLAY or (current == SEED and archive.lookup(request_url) is not None):
+        return StreamedResponse(archive.replay(request_url), request_url, limit)
+
+    response = requests.get(request_url, timeout=timeout, stream=True)
+    _check_declared_length(response, limit)
+    return StreamedResponse(response, request_url, limit, record=current in (RECORD, SEED))
+
+
+@contextmanager
+def stream(url, params=None, timeout=30):
+    started = time.perf_counter()
+    request_url = requests.Request('GET', url, params=params).prepare().url
+    status = None
+    streamed = None
+    guard = nullcontext() if mode() == REPLAY else bulkhead.guard(request_url)
+    try:
+        with guard:
+            try:
+                streamed = _open(request_url, timeout)
+                status = streamed.status_code
+                yield streamed
+            finally:
+                if streamed is not None:
+                    streamed.close()
+    finally:
+        record_upstream(request_url, status, time.perf_counter() - started)
+
+
+def get(url, params=None, timeout=30):
+    with stream(url, params=params, timeout=timeout) as streamed:
+        response = streamed.response
+        response._content = streamed.read()
+        response._content_consumed = True
+    return response
+
+
+# Async client. The views served under ASGI use these. Errors are raised as the same requests
+# exceptions as the sync path, so views handle both alike.
+
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _async_client():
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=settings.UPSTREAM_ASYNC_MAX_CONNECTIONS),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+class AsyncStreamedResponse:
+    def __init__(self, request_url, url, status_code, headers, chunks, limit, record=False, close=None):
+        # Archived under the URL requested, like StreamedResponse; `url` is where redirects ended
+        self.request_url = request_url
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.limit = limit
+        self.received = 0
+        self.exhausted = False
+        self.oversized = False
+        self._source = chunks
+        self._close = close
+        self._chunks = [] if record else None
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f'{self.status_code} Error for url: {self.url}')
+
+    async def aiter_content(self):
+        try:
+            async for chunk in self._source:
+                self.received += len(chunk)
+                if self.limit and self.received > self.limit:
+                    self.oversized = True
+                    raise ResponseTooLarge(f'Response from {self.url} exceeds {self.limit} bytes')
+                if self._chunks is not None:
+                    self._chunks.append(chunk)
+                yield chunk
+        except httpx.HTTPError as e:
+            raise _as_requests_error(e) from e
+        self.exhausted = True
+
+    async def read(self):
+        return b''.join([chunk async for chunk in self.aiter_content()])
+
+    async def aclose(self):
+        if self._chunks is not None and not self.oversized:
+            if not self.exhausted:
+                async for _ in self.aiter_content():
+                    pass
+            # File writes and hashing; kept off the event loop
+            await asyncio.to_thread(archive.store, self.request_url, self.status_code, self.headers,
+                                    b''.join(self._chunks))
+        self._chunks = None
+        if self._close is not None:
+            await self._close()
+
+
+def _as_requests_error(error):
+    if isinstance(error, httpx.TimeoutException):
+        return requests.Timeout(str(error))
+    return requests.ConnectionError(str(error))
+
+
+async def _iter_body(body, chunk_size=CHUNK_SIZE):
+    for offset in range(0, len(body), chunk_size):
+        yield body[offset:offset + chunk_size]
+
+
+async def _aopen(request_url, timeout):
+    current = mode()
+    limit = settings.UPSTREAM_MAX_RESPONSE_BYTES
+
+    if current == REPLAY or (current == SEED and await asyncio.to_thread(archive.lookup, request_url) is not None):
+        replayed = await asyncio.to_thread(archive.replay, request_url)
+        return AsyncStreamedResponse(request_url, request_url, replayed.status_code, replayed.headers,
+                                     _iter_body(replayed.content), limit)
+
+    client = _async_client()
+    try:
+        response = await client.send(client.build_request('GET', request_url, timeout=timeout), stream=True)
+    except httpx.HTTPError as e:
+        raise _as_requests_error(e) from e
+
+    declared = response.headers.get('Content-Length')
+    if limit and declared and declared.isdigit() and int(declared) > limit:
+        await response.aclose()
+        raise ResponseTooLarge(f'Response from {request_url} declares {declared} bytes, limit is {limit}')
+
+    return AsyncStreamedResponse(request_url, str(response.url), response.status_code, response.headers,
+                                 response.aiter_bytes(CHUNK_SIZE), limit,
+                                 record=current in (RECORD, SEED), close=response.aclose)
+
+
+@asynccontextmanager
+async def astream(url, params=None, timeout=30):
+    started = time.perf_counter()
+    request_url = requests.Request('GET', url, params=params).prepare().url
+    status = None
+    streamed = None
+    guard = nullcontext() if mode() == REPLAY else bulkhead.aguard(request_url)
+    try:
+        async with guard:
+            try:
+                streamed = await _aopen(request_url, timeout)
+                status = streamed.status_code
+                yield streamed
+            finally:
+                if streamed is not None:
+                    await streamed.aclose()
+    finally:
+        record_upstream(request_url, status, time.perf_counter() - started)
+
+
+async def aget(url, params=None, timeout=30):
+    async with astream(url, params=params, timeout=timeout) as streamed:
+        body = await streamed.read()
+
+    response = requests.Response()
+    response.status_code = streamed.status_code
+    response.headers = CaseInsensitiveDict(streamed.headers)
+    response.url = streamed.url
+    response._content = body
+    response._content_consumed = True
+    return response
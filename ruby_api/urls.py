@@ -14,9 +14,12 @@ urlpatterns = [
     path('county-xy/', get_county_by_xy, name='get_county_by_xy'),
     path('voivodeship-xy/', get_voivodeship_by_xy, name='get_voivodeship_by_xy'),
     path('region-xy/', get_region_by_xy, name='get_region_by_xy'),
+    path('point-xy/', get_point_by_xy, name='get_point_by_xy'),
     path('region/', get_region_by_id, name='get_region_by_id'),
     path('region-search/', get_region_by_name_or_id, name='get_region_by_name_or_id'),
+    path('autocomplete/', autocomplete_administrative, name='autocomplete_administrative'),
     path('commune/', get_commune_by_id, name='get_commune_by_id'),
     path('county/', get_county_by_id, name='get_county_by_id'),
     path('voivodeship/', get_voivodeship_by_id, name='get_voivodeship_by_id'),
+    path('cache/invalidate/', invalidate_cache, name='invalidate_cache'),
 ]
@@ -2,8 +2,11 @@ from .administrative_by_id import (
     get_region_by_id, get_region_by_name_or_id,
     get_commune_by_id, get_county_by_id, get_voivodeship_by_id
 )
+from .autocomplete import autocomplete_administrative
 from .administrative_by_xy import get_commune_by_xy, get_county_by_xy, get_voivodeship_by_xy, get_region_by_xy
 from .building_by_id import search_building_by_id
 from .building_by_xy import search_building_by_xy
+from .cache import invalidate_cache
 from .parcel_by_id import search_parcel_by_id
 from .parcel_by_xy import search_parcel_by_xy
+from .point_by_xy import get_point_by_xy
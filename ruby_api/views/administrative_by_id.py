@@ -1,63 +1,114 @@
-from xml.etree import ElementTree as ET
-
 import requests
-from django.core.cache import cache
+from adrf.decorators import api_view
+from django.conf import settings
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiResponse, OpenApiExample
-from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
+from ruby_api import upstream
+from ruby_api.administrative import (
+    REGION, COMMUNE, COUNTY, VOIVODESHIP, RESULT_BUILDERS, region_result, commune_result, county_result,
+    voivodeship_result
+)
+from ruby_api.bulkhead import BulkheadFull, unavailable_response
+from ruby_api.geometry_pyramid import geometry_extension
+from ruby_api.http_cache import acached_response, acache_response, fresh_response
+from ruby_api.name_index import get_index
+from ruby_api.parsers import aparse_wfs_stream, aparse_wfs_multi_stream
+from ruby_api.teryt_dictionary import get_dictionary, properties
+from ruby_api.timing import span
+from ruby_api.ttl import ADMINISTRATIVE, alearn, apolicy
+
+
+GEOMETRY_PARAMETERS = [
+    OpenApiParameter(
+        name='include',
+        type=str,
+        location=OpenApiParameter.QUERY,
+        required=False,
+        description='Dodatkowe dane: "geometry" dodaje granicę jednostki (WKT, EPSG:2180) z lokalnej migawki PRG',
+        enum=['geometry']
+    ),
+    OpenApiParameter(
+        name='resolution',
+        type=float,
+        location=OpenApiParameter.QUERY,
+        required=False,
+        description='Rozdzielczość mapy w metrach na piksel; granica jest uproszczona z największą tolerancją nie '
+                    'większą niż ta wartość. Bez resolution i zoom granica ma pełną rozdzielczość.',
+        examples=[OpenApiExample('Cały kraj', value=1000), OpenApiExample('Gmina', value=10)]
+    ),
+    OpenApiParameter(
+        name='zoom',
+        type=float,
+        location=OpenApiParameter.QUERY,
+        required=False,
+        description='Poziom powiększenia mapy (Web Mercator), zamiast resolution',
+        examples=[OpenApiExample('Województwo', value=8)]
+    ),
+]
+
+
+async def adictionary_response(request, level, unit_id, extend=None):
+    # The answer of the TERYT dictionary in the PRG snapshot, or None when it has no entries for the level.
+    # A lookup takes microseconds, so it skips the Redis cache like the snapshot XY lookups do.
+    dictionary = get_dictionary()
+    if not dictionary or not dictionary.covers(level):
+        return None
+    with span('teryt_dictionary'):
+        unit = dictionary.find(level, unit_id)
+    if unit is None:
+        return Response({'error': f'{level.capitalize()} not found', f'{level}_id': unit_id}, status=404)
+    result = RESULT_BUILDERS[level](unit_id, properties(unit))
+    return fresh_response(request, extend(result) if extend else result, await apolicy(ADMINISTRATIVE, unit_id))
 
-def parse_wfs_response(xml_content, layer_name):
-    try:
-        root = ET.fromstring(xml_content)
-        namespaces = {
-            'wfs': 'http://www.opengis.net/wfs/2.0',
-            'ms': 'http://mapserver.gis.umn.edu/mapserver',
-            'gml': 'http://www.opengis.net/gml/3.2'
-        }
 
-        features = root.findall(f'.//ms:{layer_name}', namespaces)
+async def get_region_response(request, region_id):
+    parts = region_id.split('_')
+    if len(parts) != 2 or '.' not in parts[1]:
+        return Response({'error': 'Invalid region_id format. Expected format: WWPPGG_R.OOOO'}, status=400)
 
-        if not features:
-            return None
+    try:
+        extend = geometry_extension(request, REGION)
+    except ValueError:
+        return Response({'error': 'Invalid resolution or zoom'}, status=400)
 
-        feature = features[0]
-        data = {}
+    cache_key = f'region_{region_id}'
+    with span('cache'):
+        cached = await acached_response(request, cache_key, extend)
+    if cached is not None:
+        return cached
 
-        for child in feature:
-            tag = child.tag.split('}')[-1] if '}' in child.tag else child.tag
-            if child.text and tag not in ['GEOMETRY', 'SHAPE', 'geometry', 'boundedBy']:
-                data[tag] = child.text.strip()
+    try:
+        params = {
+            'SERVICE': 'WFS',
+            'VERSION': '2.0.0',
+            'REQUEST': 'GetFeature',
+            'TYPENAME': 'ms:A06_Granice_obrebow_ewidencyjnych',
+            'FILTER': f"<Filter><PropertyIsEqualTo><PropertyName>JPT_KOD_JE</PropertyName><Literal>{region_id}</Literal></PropertyIsEqualTo></Filter>",
+            'OUTPUTFORMAT': 'GML3'
+        }
 
-        return data
-    except Exception:
-        return None
+        url = settings.PRG_WFS_URL
 
+        with span('prg_wfs'):
+            async with upstream.astream(url, params=params, timeout=30) as response:
+                response.raise_for_status()
+                data = await aparse_wfs_stream(response.aiter_content(), 'A06_Granice_obrebow_ewidencyjnych')
 
-def parse_wfs_multi_response(xml_content, layer_name):
-    try:
-        root = ET.fromstring(xml_content)
-        namespaces = {
-            'wfs': 'http://www.opengis.net/wfs/2.0',
-            'ms': 'http://mapserver.gis.umn.edu/mapserver',
-            'gml': 'http://www.opengis.net/gml/3.2'
-        }
+        if not data:
+            return Response({'error': 'Region not found', 'region_id': region_id}, status=404)
 
-        features = root.findall(f'.//ms:{layer_name}', namespaces)
+        result = region_result(region_id, data)
 
-        results = []
-        for feature in features:
-            data = {}
-            for child in feature:
-                tag = child.tag.split('}')[-1] if '}' in child.tag else child.tag
-                if child.text and tag not in ['GEOMETRY', 'SHAPE', 'geometry', 'boundedBy']:
-                    data[tag] = child.text.strip()
-            if data:
-                results.append(data)
+        timeout = await alearn(cache_key, result, await apolicy(ADMINISTRATIVE, region_id))
+        return await acache_response(request, cache_key, result, timeout, extend)
 
-        return results
-    except Exception:
-        return []
+    except BulkheadFull as e:
+        return unavailable_response(e, region_id=region_id)
+    except requests.RequestException as e:
+        return Response({'error': f'Request failed: {str(e)}', 'region_id': region_id}, status=500)
+    except Exception as e:
+        return Response({'error': f'Error: {str(e)}', 'region_id': region_id}, status=500)
 
 
 @extend_schema(
@@ -74,7 +125,8 @@ def parse_wfs_multi_response(xml_content, layer_name):
                 OpenApiExample('Przykład Kraków', value='126301_1.0001'),
                 OpenApiExample('Przykład Warszawa', value='146501_1.0001'),
             ]
-        )
+        ),
+        *GEOMETRY_PARAMETERS
     ],
     responses={
         200: OpenApiResponse(
@@ -101,63 +153,60 @@ def parse_wfs_multi_response(xml_content, layer_name):
     tags=['Podziały administracyjne']
 )
 @api_view(['GET'])
-def get_region_by_id(request):
+async def get_region_by_id(request):
     region_id = request.query_params.get('region_id')
 
     if not region_id:
         return Response({'error': 'region_id required'}, status=400)
 
-    parts = region_id.split('_')
-    if len(parts) != 2 or '.' not in parts[1]:
-        return Response({'error': 'Invalid region_id format. Expected format: WWPPGG_R.OOOO'}, status=400)
+    return await get_region_response(request, region_id)
 
-    cache_key = f'region_{region_id}'
-    cached_data = cache.get(cache_key)
-    if cached_data:
-        return Response(cached_data)
 
-    try:
-        params = {
-            'SERVICE': 'WFS',
-            'VERSION': '2.0.0',
-            'REQUEST': 'GetFeature',
-            'TYPENAME': 'ms:A06_Granice_obrebow_ewidencyjnych',
-            'FILTER': f"<Filter><PropertyIsEqualTo><PropertyName>JPT_KOD_JE</PropertyName><Literal>{region_id}</Literal></PropertyIsEqualTo></Filter>",
-            'OUTPUTFORMAT': 'GML3'
-        }
-
-        url = 'https://mapy.geoportal.gov.pl/wss/service/PZGIK/PRG/WFS/AdministrativeBoundaries'
-
-        response = requests.get(url, params=params, timeout=30)
-        response.raise_for_status()
+SEARCH_LEVELS = {
+    'region': [REGION],
+    'commune': [COMMUNE],
+    'county': [COUNTY],
+    'all': [REGION, COMMUNE, COUNTY],
+}
 
-        data = parse_wfs_response(response.content, 'A06_Granice_obrebow_ewidencyjnych')
-
-        if not data:
-            return Response({'error': 'Region not found', 'region_id': region_id}, status=404)
 
-        result = {
-            'region_id': region_id,
-            'region': {
-                'name': data.get('JPT_NAZWA_', ''),
-                'teryt': data.get('JPT_KOD_JE', ''),
-                'regon': data.get('REGON', '')
-            },
-            'source': 'PRG'
-        }
+def search_name_index(request, index, query):
+    level = request.query_params.get('level', 'region')
+    if level not in SEARCH_LEVELS:
+        return Response({'error': f"Invalid level. Expected one of: {', '.join(SEARCH_LEVELS)}"}, status=400)
 
-        cache.set(cache_key, result, timeout=3600)
-        return Response(result)
-
-    except requests.RequestException as e:
-        return Response({'error': f'Request failed: {str(e)}', 'region_id': region_id}, status=500)
-    except Exception as e:
-        return Response({'error': f'Error: {str(e)}', 'region_id': region_id}, status=500)
+    try:
+        page = int(request.query_params.get('page', '1'))
+        page_size = int(request.query_params.get('page_size', '10'))
+    except ValueError:
+        return Response({'error': 'page and page_size must be integers'}, status=400)
+    if page < 1 or not 1 <= page_size <= 100:
+        return Response({'error': 'page must be >= 1 and page_size between 1 and 100'}, status=400)
+
+    with span('name_index'):
+        total, units = index.search(query, SEARCH_LEVELS[level], (page - 1) * page_size, page_size)
+
+    if not total:
+        return Response({'error': 'No regions found', 'query': query}, status=404)
+
+    return Response({
+        'query': query,
+        'regions': [
+            {'name': unit['name'], 'teryt': unit['teryt'], 'regon': unit['regon'], 'level': unit['level']}
+            for unit in units
+        ],
+        'page': page,
+        'page_size': page_size,
+        'total': total,
+        'source': 'PRG'
+    })
 
 
 @extend_schema(
     summary="Wyszukaj obręb ewidencyjny po nazwie lub ID",
-    description="Zwraca listę obrębów ewidencyjnych pasujących do zapytania (po nazwie) lub pojedynczy obręb (po ID TERYT).",
+    description="Zwraca listę obrębów ewidencyjnych pasujących do zapytania (po nazwie) lub pojedynczy obręb (po ID TERYT). "
+                "Gdy dostępny jest snapshot PRG, wyszukiwanie odbywa się w lokalnym indeksie nazw (bez rozróżniania polskich znaków), "
+                "z paginacją i możliwością przeszukania gmin i powiatów.",
     parameters=[
         OpenApiParameter(
             name='query',
@@ -169,6 +218,31 @@ def get_region_by_id(request):
                 OpenApiExample('Wyszukiwanie po nazwie', value='Krowodrza'),
                 OpenApiExample('Wyszukiwanie po ID', value='126301_1.0001'),
             ]
+        ),
+        OpenApiParameter(
+            name='level',
+            type=str,
+            location=OpenApiParameter.QUERY,
+            required=False,
+            description='Poziom jednostek przeszukiwanych w lokalnym indeksie nazw: region, commune, county lub all',
+            default='region',
+            enum=['region', 'commune', 'county', 'all']
+        ),
+        OpenApiParameter(
+            name='page',
+            type=int,
+            location=OpenApiParameter.QUERY,
+            required=False,
+            description='Numer strony wyników (lokalny indeks nazw)',
+            default=1
+        ),
+        OpenApiParameter(
+            name='page_size',
+            type=int,
+            location=OpenApiParameter.QUERY,
+            required=False,
+            description='Liczba wyników na stronie, maksymalnie 100 (lokalny indeks nazw)',
+            default=10
         )
     ],
     responses={
@@ -183,9 +257,13 @@ def get_region_by_id(request):
                             {
                                 'name': 'Krowodrza',
                                 'teryt': '126301_1.0001',
-                                'regon': '12345678901234'
+                                'regon': '12345678901234',
+                                'level': 'region'
                             }
                         ],
+                        'page': 1,
+                        'page_size': 10,
+                        'total': 1,
                         'source': 'PRG'
                     }
                 ),
@@ -210,22 +288,24 @@ def get_region_by_id(request):
     tags=['Podziały administracyjne']
 )
 @api_view(['GET'])
-def get_region_by_name_or_id(request):
+async def get_region_by_name_or_id(request):
     query = request.query_params.get('query')
 
     if not query:
         return Response({'error': 'query parameter required'}, status=400)
 
     if '_' in query and '.' in query:
-        request.query_params._mutable = True
-        request.query_params['region_id'] = query
-        request.query_params._mutable = False
-        return get_region_by_id(request)
+        return await get_region_response(request, query)
+
+    index = get_index()
+    if index is not None:
+        return search_name_index(request, index, query)
 
     cache_key = f'region_search_{query}'
-    cached_data = cache.get(cache_key)
-    if cached_data:
-        return Response(cached_data)
+    with span('cache'):
+        cached = await acached_response(request, cache_key)
+    if cached is not None:
+        return cached
 
     try:
         params = {
@@ -238,12 +318,12 @@ def get_region_by_name_or_id(request):
             'COUNT': '10'
         }
 
-        url = 'https://mapy.geoportal.gov.pl/wss/service/PZGIK/PRG/WFS/AdministrativeBoundaries'
-
-        response = requests.get(url, params=params, timeout=30)
-        response.raise_for_status()
+        url = settings.PRG_WFS_URL
 
-        results_data = parse_wfs_multi_response(response.content, 'A06_Granice_obrebow_ewidencyjnych')
+        with span('prg_wfs'):
+            async with upstream.astream(url, params=params, timeout=30) as response:
+                response.raise_for_status()
+                results_data = await aparse_wfs_multi_stream(response.aiter_content(), 'A06_Granice_obrebow_ewidencyjnych')
 
         if not results_data:
             return Response({'error': 'No regions found', 'query': query}, status=404)
@@ -262,9 +342,11 @@ def get_region_by_name_or_id(request):
             'source': 'PRG'
         }
 
-        cache.set(cache_key, result, timeout=3600)
-        return Response(result)
+        timeout = await alearn(cache_key, result, await apolicy(ADMINISTRATIVE))
+        return await acache_response(request, cache_key, result, timeout)
 
+    except BulkheadFull as e:
+        return unavailable_response(e, query=query)
     except requests.RequestException as e:
         return Response({'error': f'Request failed: {str(e)}', 'query': query}, status=500)
     except Exception as e:
@@ -273,7 +355,8 @@ def get_region_by_name_or_id(request):
 
 @extend_schema(
     summary="Pobierz gminę po ID",
-    description="Zwraca informacje o gminie na podstawie identyfikatora TERYT z usługi PRG.",
+    description="Zwraca informacje o gminie na podstawie identyfikatora TERYT z lokalnego słownika TERYT "
+                "(migawka PRG), a gdy go brak, z usługi PRG WFS.",
     parameters=[
         OpenApiParameter(
             name='commune_id',
@@ -285,7 +368,8 @@ def get_region_by_name_or_id(request):
                 OpenApiExample('Przykład Kraków', value='126301_1'),
                 OpenApiExample('Przykład Warszawa', value='146501_1'),
             ]
-        )
+        ),
+        *GEOMETRY_PARAMETERS
     ],
     responses={
         200: OpenApiResponse(
@@ -313,7 +397,7 @@ def get_region_by_name_or_id(request):
     tags=['Podziały administracyjne']
 )
 @api_view(['GET'])
-def get_commune_by_id(request):
+async def get_commune_by_id(request):
     commune_id = request.query_params.get('commune_id')
 
     if not commune_id:
@@ -322,10 +406,20 @@ def get_commune_by_id(request):
     if '_' not in commune_id:
         return Response({'error': 'Invalid commune_id format. Expected format: WWPPGG_R'}, status=400)
 
+    try:
+        extend = geometry_extension(request, COMMUNE)
+    except ValueError:
+        return Response({'error': 'Invalid resolution or zoom'}, status=400)
+
+    local = await adictionary_response(request, COMMUNE, commune_id, extend)
+    if local is not None:
+        return local
+
     cache_key = f'commune_{commune_id}'
-    cached_data = cache.get(cache_key)
-    if cached_data:
-        return Response(cached_data)
+    with span('cache'):
+        cached = await acached_response(request, cache_key, extend)
+    if cached is not None:
+        return cached
 
     try:
         params = {
@@ -337,30 +431,23 @@ def get_commune_by_id(request):
             'OUTPUTFORMAT': 'GML3'
         }
 
-        url = 'https://mapy.geoportal.gov.pl/wss/service/PZGIK/PRG/WFS/AdministrativeBoundaries'
-
-        response = requests.get(url, params=params, timeout=30)
-        response.raise_for_status()
+        url = settings.PRG_WFS_URL
 
-        data = parse_wfs_response(response.content, 'A03_Granice_gmin')
+        with span('prg_wfs'):
+            async with upstream.astream(url, params=params, timeout=30) as response:
+                response.raise_for_status()
+                data = await aparse_wfs_stream(response.aiter_content(), 'A03_Granice_gmin')
 
         if not data:
             return Response({'error': 'Commune not found', 'commune_id': commune_id}, status=404)
 
-        result = {
-            'commune_id': commune_id,
-            'commune': {
-                'name': data.get('JPT_NAZWA_', ''),
-                'teryt': data.get('JPT_KOD_JE', ''),
-                'type': data.get('JPT_SJR_KO', ''),
-                'regon': data.get('REGON', '')
-            },
-            'source': 'PRG'
-        }
+        result = commune_result(commune_id, data)
 
-        cache.set(cache_key, result, timeout=3600)
-        return Response(result)
+        timeout = await alearn(cache_key, result, await apolicy(ADMINISTRATIVE, commune_id))
+        return await acache_response(request, cache_key, result, timeout, extend)
 
+    except BulkheadFull as e:
+        return unavailable_response(e, commune_id=commune_id)
     except requests.RequestException as e:
         return Response({'error': f'Request failed: {str(e)}', 'commune_id': commune_id}, status=500)
     except Exception as e:
@@ -369,7 +456,8 @@ def get_commune_by_id(request):
 
 @extend_schema(
     summary="Pobierz powiat po ID",
-    description="Zwraca informacje o powiecie na podstawie identyfikatora TERYT z usługi PRG.",
+    description="Zwraca informacje o powiecie na podstawie identyfikatora TERYT z lokalnego słownika TERYT "
+                "(migawka PRG), a gdy go brak, z usługi PRG WFS.",
     parameters=[
         OpenApiParameter(
             name='county_id',
@@ -381,7 +469,8 @@ def get_commune_by_id(request):
                 OpenApiExample('Przykład Kraków', value='1206'),
                 OpenApiExample('Przykład Warszawa', value='1465'),
             ]
-        )
+        ),
+        *GEOMETRY_PARAMETERS
     ],
     responses={
         200: OpenApiResponse(
@@ -408,7 +497,7 @@ def get_commune_by_id(request):
     tags=['Podziały administracyjne']
 )
 @api_view(['GET'])
-def get_county_by_id(request):
+async def get_county_by_id(request):
     county_id = request.query_params.get('county_id')
 
     if not county_id:
@@ -417,10 +506,20 @@ def get_county_by_id(request):
     if len(county_id) != 4:
         return Response({'error': 'Invalid county_id format. Expected format: WWPP'}, status=400)
 
+    try:
+        extend = geometry_extension(request, COUNTY)
+    except ValueError:
+        return Response({'error': 'Invalid resolution or zoom'}, status=400)
+
+    local = await adictionary_response(request, COUNTY, county_id, extend)
+    if local is not None:
+        return local
+
     cache_key = f'county_{county_id}'
-    cached_data = cache.get(cache_key)
-    if cached_data:
-        return Response(cached_data)
+    with span('cache'):
+        cached = await acached_response(request, cache_key, extend)
+    if cached is not None:
+        return cached
 
     try:
         params = {
@@ -432,29 +531,23 @@ def get_county_by_id(request):
             'OUTPUTFORMAT': 'GML3'
         }
 
-        url = 'https://mapy.geoportal.gov.pl/wss/service/PZGIK/PRG/WFS/AdministrativeBoundaries'
-
-        response = requests.get(url, params=params, timeout=30)
-        response.raise_for_status()
+        url = settings.PRG_WFS_URL
 
-        data = parse_wfs_response(response.content, 'A02_Granice_powiatow')
+        with span('prg_wfs'):
+            async with upstream.astream(url, params=params, timeout=30) as response:
+                response.raise_for_status()
+                data = await aparse_wfs_stream(response.aiter_content(), 'A02_Granice_powiatow')
 
         if not data:
             return Response({'error': 'County not found', 'county_id': county_id}, status=404)
 
-        result = {
-            'county_id': county_id,
-            'county': {
-                'name': data.get('JPT_NAZWA_', ''),
-                'teryt': data.get('JPT_KOD_JE', ''),
-                'regon': data.get('REGON', '')
-            },
-            'source': 'PRG'
-        }
+        result = county_result(county_id, data)
 
-        cache.set(cache_key, result, timeout=3600)
-        return Response(result)
+        timeout = await alearn(cache_key, result, await apolicy(ADMINISTRATIVE, county_id))
+        return await acache_response(request, cache_key, result, timeout, extend)
 
+    except BulkheadFull as e:
+        return unavailable_response(e, county_id=county_id)
     except requests.RequestException as e:
         return Response({'error': f'Request failed: {str(e)}', 'county_id': county_id}, status=500)
     except Exception as e:
@@ -463,7 +556,8 @@ def get_county_by_id(request):
 
 @extend_schema(
     summary="Pobierz województwo po ID",
-    description="Zwraca informacje o województwie na podstawie identyfikatora TERYT z usługi PRG.",
+    description="Zwraca informacje o województwie na podstawie identyfikatora TERYT z lokalnego słownika TERYT "
+                "(migawka PRG), a gdy go brak, z usługi PRG WFS.",
     parameters=[
         OpenApiParameter(
             name='voivodeship_id',
@@ -475,7 +569,8 @@ def get_county_by_id(request):
                 OpenApiExample('Małopolskie', value='12'),
                 OpenApiExample('Mazowieckie', value='14'),
             ]
-        )
+        ),
+        *GEOMETRY_PARAMETERS
     ],
     responses={
         200: OpenApiResponse(
@@ -502,7 +597,7 @@ def get_county_by_id(request):
     tags=['Podziały administracyjne']
 )
 @api_view(['GET'])
-def get_voivodeship_by_id(request):
+async def get_voivodeship_by_id(request):
     voivodeship_id = request.query_params.get('voivodeship_id')
 
     if not voivodeship_id:
@@ -511,10 +606,20 @@ def get_voivodeship_by_id(request):
     if len(voivodeship_id) != 2:
         return Response({'error': 'Invalid voivodeship_id format. Expected format: WW'}, status=400)
 
+    try:
+        extend = geometry_extension(request, VOIVODESHIP)
+    except ValueError:
+        return Response({'error': 'Invalid resolution or zoom'}, status=400)
+
+    local = await adictionary_response(request, VOIVODESHIP, voivodeship_id, extend)
+    if local is not None:
+        return local
+
     cache_key = f'voivodeship_{voivodeship_id}'
-    cached_data = cache.get(cache_key)
-    if cached_data:
-        return Response(cached_data)
+    with span('cache'):
+        cached = await acached_response(request, cache_key, extend)
+    if cached is not None:
+        return cached
 
     try:
         params = {
@@ -526,29 +631,23 @@ def get_voivodeship_by_id(request):
             'OUTPUTFORMAT': 'GML3'
         }
 
-        url = 'https://mapy.geoportal.gov.pl/wss/service/PZGIK/PRG/WFS/AdministrativeBoundaries'
-
-        response = requests.get(url, params=params, timeout=30)
-        response.raise_for_status()
+        url = settings.PRG_WFS_URL
 
-        data = parse_wfs_response(response.content, 'A01_Granice_wojewodztw')
+        with span('prg_wfs'):
+            async with upstream.astream(url, params=params, timeout=30) as response:
+                response.raise_for_status()
+                data = await aparse_wfs_stream(response.aiter_content(), 'A01_Granice_wojewodztw')
 
         if not data:
             return Response({'error': 'Voivodeship not found', 'voivodeship_id': voivodeship_id}, status=404)
 
-        result = {
-            'voivodeship_id': voivodeship_id,
-            'voivodeship': {
-                'name': data.get('JPT_NAZWA_', ''),
-                'teryt': data.get('JPT_KOD_JE', ''),
-                'regon': data.get('REGON', '')
-            },
-            'source': 'PRG'
-        }
+        result = voivodeship_result(voivodeship_id, data)
 
-        cache.set(cache_key, result, timeout=3600)
-        return Response(result)
+        timeout = await alearn(cache_key, result, await apolicy(ADMINISTRATIVE, voivodeship_id))
+        return await acache_response(request, cache_key, result, timeout, extend)
 
+    except BulkheadFull as e:
+        return unavailable_response(e, voivodeship_id=voivodeship_id)
     except requests.RequestException as e:
         return Response({'error': f'Request failed: {str(e)}', 'voivodeship_id': voivodeship_id}, status=500)
     except Exception as e:
@@ -1,56 +1,14 @@
-from xml.etree import ElementTree as ET
-
-import requests
-from django.core.cache import cache
+from adrf.decorators import api_view
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiResponse, OpenApiExample
-from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
-
-def parse_gml_response(xml_content):
-    try:
-        root = ET.fromstring(xml_content)
-        data = {}
-
-        for elem in root.iter():
-            tag = elem.tag.split('}')[-1] if '}' in elem.tag else elem.tag
-
-            if elem.text and elem.text.strip() and tag not in ['FeatureCollection', 'featureMember', 'boundedBy', 'Box',
-                                                               'coordinates']:
-                data[tag] = elem.text.strip()
-
-        return data
-    except Exception:
-        return {}
-
-
-def get_administrative_info(x, y, epsg, layer_name):
-    buffer = 100
-    bbox = f"{x - buffer},{y - buffer},{x + buffer},{y + buffer}"
-
-    params = {
-        'VERSION': '1.3.0',
-        'SERVICE': 'WMS',
-        'REQUEST': 'GetFeatureInfo',
-        'LAYERS': layer_name,
-        'QUERY_LAYERS': layer_name,
-        'CRS': f'EPSG:{epsg}',
-        'WIDTH': '101',
-        'HEIGHT': '101',
-        'I': '50',
-        'J': '50',
-        'INFO_FORMAT': 'application/vnd.ogc.gml',
-        'BBOX': bbox
-    }
-
-    url = 'https://mapy.geoportal.gov.pl/wss/service/PZGIK/PRG/WMS/AdministrativeBoundaries'
-
-    try:
-        response = requests.get(url, params=params, timeout=30)
-        response.raise_for_status()
-        return parse_gml_response(response.content)
-    except Exception:
-        return {}
+from ruby_api.administrative import VOIVODESHIP, COUNTY, COMMUNE, REGION, xy_cache_key, xy_result
+from ruby_api.boundaries import afind_administrative_unit
+from ruby_api.bulkhead import BulkheadFull, unavailable_response
+from ruby_api.feature_info import afetch_administrative_units
+from ruby_api.http_cache import acached_response, fresh_response
+from ruby_api.timing import span
+from ruby_api.ttl import ADMINISTRATIVE, apolicy
 
 
 @extend_schema(
@@ -117,7 +75,7 @@ def get_administrative_info(x, y, epsg, layer_name):
     tags=['Podziały administracyjne']
 )
 @api_view(['GET'])
-def get_commune_by_xy(request):
+async def get_commune_by_xy(request):
     x = request.query_params.get('x')
     y = request.query_params.get('y')
     epsg = request.query_params.get('epsg', '2180')
@@ -131,12 +89,18 @@ def get_commune_by_xy(request):
     except ValueError:
         return Response({'error': 'Invalid coordinates'}, status=400)
 
-    cache_key = f'commune_xy_{x}_{y}_{epsg}'
-    cached_data = cache.get(cache_key)
-    if cached_data:
-        return Response(cached_data)
+    data = await afind_administrative_unit(COMMUNE, x, y, epsg)
+    if data is None:
+        with span('cache'):
+            cached = await acached_response(request, xy_cache_key(COMMUNE, x, y, epsg))
+        if cached is not None:
+            return cached
 
-    data = get_administrative_info(x, y, epsg, 'A03_Granice_gmin')
+        try:
+            units = await afetch_administrative_units(x, y, epsg)
+        except BulkheadFull as e:
+            return unavailable_response(e, coordinates={'x': x, 'y': y, 'epsg': epsg})
+        data = units[COMMUNE] if units else None
 
     if not data:
         result = {
@@ -145,19 +109,9 @@ def get_commune_by_xy(request):
         }
         return Response(result, status=404)
 
-    result = {
-        'coordinates': {'x': x, 'y': y, 'epsg': epsg},
-        'commune': {
-            'name': data.get('JPT_NAZWA_', ''),
-            'teryt': data.get('JPT_KOD_JE', ''),
-            'type': data.get('JPT_SJR_KO', ''),
-            'regon': data.get('REGON', '')
-        },
-        'source': 'PRG'
-    }
-
-    cache.set(cache_key, result, timeout=3600)
-    return Response(result)
+    # Answered from the local snapshot, or already cached with every other level by afetch_administrative_units
+    result = xy_result(COMMUNE, x, y, epsg, data)
+    return fresh_response(request, result, await apolicy(ADMINISTRATIVE, data.get('JPT_KOD_JE', '')))
 
 
 @extend_schema(
@@ -223,7 +177,7 @@ def get_commune_by_xy(request):
     tags=['Podziały administracyjne']
 )
 @api_view(['GET'])
-def get_county_by_xy(request):
+async def get_county_by_xy(request):
     x = request.query_params.get('x')
     y = request.query_params.get('y')
     epsg = request.query_params.get('epsg', '2180')
@@ -237,12 +191,18 @@ def get_county_by_xy(request):
     except ValueError:
         return Response({'error': 'Invalid coordinates'}, status=400)
 
-    cache_key = f'county_xy_{x}_{y}_{epsg}'
-    cached_data = cache.get(cache_key)
-    if cached_data:
-        return Response(cached_data)
+    data = await afind_administrative_unit(COUNTY, x, y, epsg)
+    if data is None:
+        with span('cache'):
+            cached = await acached_response(request, xy_cache_key(COUNTY, x, y, epsg))
+        if cached is not None:
+            return cached
 
-    data = get_administrative_info(x, y, epsg, 'A02_Granice_powiatow')
+        try:
+            units = await afetch_administrative_units(x, y, epsg)
+        except BulkheadFull as e:
+            return unavailable_response(e, coordinates={'x': x, 'y': y, 'epsg': epsg})
+        data = units[COUNTY] if units else None
 
     if not data:
         result = {
@@ -251,18 +211,9 @@ def get_county_by_xy(request):
         }
         return Response(result, status=404)
 
-    result = {
-        'coordinates': {'x': x, 'y': y, 'epsg': epsg},
-        'county': {
-            'name': data.get('JPT_NAZWA_', ''),
-            'teryt': data.get('JPT_KOD_JE', ''),
-            'regon': data.get('REGON', '')
-        },
-        'source': 'PRG'
-    }
-
-    cache.set(cache_key, result, timeout=3600)
-    return Response(result)
+    # Answered from the local snapshot, or already cached with every other level by afetch_administrative_units
+    result = xy_result(COUNTY, x, y, epsg, data)
+    return fresh_response(request, result, await apolicy(ADMINISTRATIVE, data.get('JPT_KOD_JE', '')))
 
 
 @extend_schema(
@@ -328,7 +279,7 @@ def get_county_by_xy(request):
     tags=['Podziały administracyjne']
 )
 @api_view(['GET'])
-def get_voivodeship_by_xy(request):
+async def get_voivodeship_by_xy(request):
     x = request.query_params.get('x')
     y = request.query_params.get('y')
     epsg = request.query_params.get('epsg', '2180')
@@ -342,12 +293,18 @@ def get_voivodeship_by_xy(request):
     except ValueError:
         return Response({'error': 'Invalid coordinates'}, status=400)
 
-    cache_key = f'voivodeship_xy_{x}_{y}_{epsg}'
-    cached_data = cache.get(cache_key)
-    if cached_data:
-        return Response(cached_data)
+    data = await afind_administrative_unit(VOIVODESHIP, x, y, epsg)
+    if data is None:
+        with span('cache'):
+            cached = await acached_response(request, xy_cache_key(VOIVODESHIP, x, y, epsg))
+        if cached is not None:
+            return cached
 
-    data = get_administrative_info(x, y, epsg, 'A01_Granice_wojewodztw')
+        try:
+            units = await afetch_administrative_units(x, y, epsg)
+        except BulkheadFull as e:
+            return unavailable_response(e, coordinates={'x': x, 'y': y, 'epsg': epsg})
+        data = units[VOIVODESHIP] if units else None
 
     if not data:
         result = {
@@ -356,18 +313,9 @@ def get_voivodeship_by_xy(request):
         }
         return Response(result, status=404)
 
-    result = {
-        'coordinates': {'x': x, 'y': y, 'epsg': epsg},
-        'voivodeship': {
-            'name': data.get('JPT_NAZWA_', ''),
-            'teryt': data.get('JPT_KOD_JE', ''),
-            'regon': data.get('REGON', '')
-        },
-        'source': 'PRG'
-    }
-
-    cache.set(cache_key, result, timeout=3600)
-    return Response(result)
+    # Answered from the local snapshot, or already cached with every other level by afetch_administrative_units
+    result = xy_result(VOIVODESHIP, x, y, epsg, data)
+    return fresh_response(request, result, await apolicy(ADMINISTRATIVE, data.get('JPT_KOD_JE', '')))
 
 
 @extend_schema(
@@ -432,7 +380,7 @@ def get_voivodeship_by_xy(request):
     tags=['Podziały administracyjne']
 )
 @api_view(['GET'])
-def get_region_by_xy(request):
+async def get_region_by_xy(request):
     x = request.query_params.get('x')
     y = request.query_params.get('y')
     epsg = request.query_params.get('epsg', '2180')
@@ -446,12 +394,18 @@ def get_region_by_xy(request):
     except ValueError:
         return Response({'error': 'Invalid coordinates'}, status=400)
 
-    cache_key = f'region_xy_{x}_{y}_{epsg}'
-    cached_data = cache.get(cache_key)
-    if cached_data:
-        return Response(cached_data)
+    data = await afind_administrative_unit(REGION, x, y, epsg)
+    if data is None:
+        with span('cache'):
+            cached = await acached_response(request, xy_cache_key(REGION, x, y, epsg))
+        if cached is not None:
+            return cached
 
-    data = get_administrative_info(x, y, epsg, 'A06_Granice_obrebow_ewidencyjnych')
+        try:
+            units = await afetch_administrative_units(x, y, epsg)
+        except BulkheadFull as e:
+            return unavailable_response(e, coordinates={'x': x, 'y': y, 'epsg': epsg})
+        data = units[REGION] if units else None
 
     if not data:
         result = {
@@ -460,14 +414,6 @@ def get_region_by_xy(request):
         }
         return Response(result, status=404)
 
-    result = {
-        'coordinates': {'x': x, 'y': y, 'epsg': epsg},
-        'region': {
-            'name': data.get('JPT_NAZWA_', ''),
-            'teryt': data.get('JPT_KOD_JE', '')
-        },
-        'source': 'PRG'
-    }
-
-    cache.set(cache_key, result, timeout=3600)
-    return Response(result)
+    # Answered from the local snapshot, or already cached with every other level by afetch_administrative_units
+    result = xy_result(REGION, x, y, epsg, data)
+    return fresh_response(request, result, await apolicy(ADMINISTRATIVE, data.get('JPT_KOD_JE', '')))
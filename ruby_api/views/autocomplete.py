@@ -0,0 +1,106 @@
+from adrf.decorators import api_view
+from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiResponse, OpenApiExample
+from rest_framework.response import Response
+
+from ruby_api.administrative import HIERARCHY
+from ruby_api.autocomplete import get_autocomplete
+from ruby_api.timing import span
+
+
+@extend_schema(
+    summary="Podpowiedzi nazw jednostek administracyjnych",
+    description="Zwraca jednostki administracyjne (województwa, powiaty, gminy, obręby), których nazwa lub jej kolejne "
+                "słowo zaczyna się od podanego tekstu, wraz z kodami TERYT i jednostkami nadrzędnymi. "
+                "Wyszukiwanie odbywa się w lokalnym indeksie zbudowanym ze snapshotu PRG, bez rozróżniania wielkości "
+                "liter i polskich znaków.",
+    parameters=[
+        OpenApiParameter(
+            name='query',
+            type=str,
+            location=OpenApiParameter.QUERY,
+            required=True,
+            description='Początek nazwy jednostki',
+            examples=[
+                OpenApiExample('Przykład Kraków', value='krak'),
+                OpenApiExample('Przykład bez polskich znaków', value='lodz'),
+            ]
+        ),
+        OpenApiParameter(
+            name='level',
+            type=str,
+            location=OpenApiParameter.QUERY,
+            required=False,
+            description='Poziomy jednostek oddzielone przecinkami: voivodeship, county, commune, region (domyślnie wszystkie)',
+            examples=[
+                OpenApiExample('Gminy i powiaty', value='commune,county'),
+            ]
+        ),
+        OpenApiParameter(
+            name='limit',
+            type=int,
+            location=OpenApiParameter.QUERY,
+            required=False,
+            description='Maksymalna liczba podpowiedzi (1-50)',
+            default=10
+        )
+    ],
+    responses={
+        200: OpenApiResponse(
+            description='Lista podpowiedzi',
+            examples=[
+                OpenApiExample(
+                    'Sukces',
+                    value={
+                        'query': 'krak',
+                        'results': [
+                            {
+                                'name': 'Kraków',
+                                'teryt': '126101_1',
+                                'level': 'commune',
+                                'parents': {
+                                    'voivodeship': {'name': 'małopolskie', 'teryt': '12'},
+                                    'county': {'name': 'Kraków', 'teryt': '1261'}
+                                }
+                            }
+                        ],
+                        'source': 'PRG'
+                    }
+                )
+            ]
+        ),
+        400: OpenApiResponse(description='Brak parametru query lub nieprawidłowe parametry'),
+        503: OpenApiResponse(description='Snapshot PRG niedostępny')
+    },
+    tags=['Podziały administracyjne']
+)
+@api_view(['GET'])
+async def autocomplete_administrative(request):
+    query = request.query_params.get('query', '').strip()
+
+    if not query:
+        return Response({'error': 'query parameter required'}, status=400)
+
+    levels = [level for level in request.query_params.get('level', '').split(',') if level]
+    invalid = [level for level in levels if level not in HIERARCHY]
+    if invalid:
+        return Response({'error': f"Invalid level. Expected any of: {', '.join(HIERARCHY)}"}, status=400)
+
+    try:
+        limit = int(request.query_params.get('limit', '10'))
+    except ValueError:
+        return Response({'error': 'limit must be an integer'}, status=400)
+    if not 1 <= limit <= 50:
+        return Response({'error': 'limit must be between 1 and 50'}, status=400)
+
+    index = get_autocomplete()
+    if index is None:
+        return Response({'error': 'PRG snapshot not available'}, status=503)
+
+    with span('autocomplete'):
+        results = index.search(query, levels, limit)
+
+    return Response({
+        'query': query,
+        'results': results,
+        'source': 'PRG'
+    })
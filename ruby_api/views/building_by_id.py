@@ -1,12 +1,15 @@
-from django.core.cache import cache
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiResponse, OpenApiExample
-from qgis.core import QgsVectorLayer, QgsDataSourceUri
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
 from data.wfs_data import WFS_SERVICES
-from ruby.qgis_manager import QGISManager
-from ruby_api.utils import qvariant_to_python
+from ruby_api.bulkhead import BulkheadFull, unavailable_response
+from ruby_api.entities import BUILDING, entity_key, entity_result
+from ruby_api.hierarchy import hierarchy_extension
+from ruby_api.http_cache import cached_response, cache_response, fresh_response
+from ruby_api.county_wfs import find_building
+from ruby_api.timing import span
+from ruby_api.ttl import learn, policy
 
 
 @extend_schema(
@@ -23,6 +26,15 @@ from ruby_api.utils import qvariant_to_python
                 OpenApiExample('Przykład Kraków', value='1206010101.123.456'),
                 OpenApiExample('Przykład Warszawa', value='1465010101.789.012'),
             ]
+        ),
+        OpenApiParameter(
+            name='include',
+            type=str,
+            location=OpenApiParameter.QUERY,
+            required=False,
+            description='Dodatkowe dane: "hierarchy" dodaje województwo, powiat, gminę i obręb odczytane z identyfikatora '
+                        '(z lokalnej kopii PRG, bez zapytań do usług zewnętrznych)',
+            enum=['hierarchy']
         )
     ],
     responses={
@@ -66,54 +78,34 @@ def search_building_by_id(request):
     if len(building_id) < 4:
         return Response({'error': 'Invalid building_id format'}, status=400)
 
-    cache_key = f'building_{building_id}'
-    cached_data = cache.get(cache_key)
-    if cached_data:
-        return Response(cached_data)
+    # None for an ID whose voivodeship, county or commune is not a valid TERYT code: not cached
+    cache_key = entity_key(BUILDING, building_id)
+    extend = hierarchy_extension(request, BUILDING)
+    if cache_key is not None:
+        with span('cache'):
+            cached = cached_response(request, cache_key, extend)
+        if cached is not None:
+            return cached
 
     try:
-        qgs = QGISManager.get_application()
         teryt = building_id[:4]
         service = WFS_SERVICES.get(teryt)
 
         if not service:
             return Response({'error': f'Service not found for TERYT: {teryt}'}, status=404)
 
-        layer_names = ['ms:budynki', 'ewns:budynki', 'wfs:budynki']
-
-        for layer_name in layer_names:
-            uri = QgsDataSourceUri()
-            uri.setParam('url', service['url'])
-            uri.setParam('version', 'auto')
-            uri.setParam('typename', layer_name)
-            uri.setParam('filter', f"ID_BUDYNKU='{building_id}'")
-            uri.setParam('ssl_verify', 'false')
-
-            layer = QgsVectorLayer(uri.uri(), f"building_{layer_name}", "WFS")
-
-            if layer.isValid():
-                features = list(layer.getFeatures())
-
-                if features:
-                    first_feature = features[0]
-                    attributes = {field.name(): qvariant_to_python(value) for field, value in
-                                  zip(layer.fields(), first_feature.attributes())}
-                    geometry = first_feature.geometry().asWkt()
-
-                    result = {
-                        'building_id': building_id,
-                        'service': service,
-                        'layer_name': layer_name,
-                        'attributes': attributes,
-                        'geometry': geometry
-                    }
-
-                    cache.set(cache_key, result, timeout=3600)
+        feature = find_building(service, building_id)
 
-                    del layer
-                    return Response(result)
-            del layer
+        if not feature:
+            return Response({'error': 'Building not found'}, status=404)
 
-        return Response({'error': 'Building not found'}, status=404)
+        result = entity_result(BUILDING, building_id, service, feature)
+        if cache_key is None:
+            return fresh_response(request, extend(result) if extend else result, policy(BUILDING, building_id))
+        # The canonical entry, also read by the XY endpoint when a point resolves to this building
+        timeout = learn(cache_key, result, policy(BUILDING, building_id))
+        return cache_response(request, cache_key, result, timeout, extend)
+    except BulkheadFull as e:
+        return unavailable_response(e)
     except Exception as e:
         return Response({'error': f'Error: {str(e)}'}, status=500)
@@ -0,0 +1,68 @@
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiResponse, OpenApiExample
+
+from ruby_api.entities import KINDS
+from ruby_api.namespaces import invalidate, level
+
+
+@extend_schema(
+    summary="Unieważnij cache działek i budynków jednostki",
+    description="Unieważnia wszystkie zapisane w cache działki i budynki województwa, powiatu lub gminy (np. po "
+                "aktualizacji EGiB w powiecie), w stałym czasie, bez przeszukiwania Redis. Stare wpisy nie są już "
+                "odczytywane i wygasają same. Workery uwzględniają zmianę w ciągu CACHE_NAMESPACE_CHECK_INTERVAL "
+                "sekund. Wymaga konta administratora.",
+    parameters=[
+        OpenApiParameter(
+            name='teryt',
+            type=str,
+            location=OpenApiParameter.QUERY,
+            required=True,
+            description='Kod TERYT województwa (WW), powiatu (WWPP) lub gminy (WWPPGG_R)',
+            examples=[
+                OpenApiExample('Powiat krakowski', value='1206'),
+                OpenApiExample('Gmina Mogilany', value='120614_2'),
+                OpenApiExample('Województwo małopolskie', value='12'),
+            ]
+        ),
+        OpenApiParameter(
+            name='kind',
+            type=str,
+            location=OpenApiParameter.QUERY,
+            required=False,
+            description='Rodzaj obiektów: parcel lub building (domyślnie oba)',
+            enum=list(KINDS)
+        )
+    ],
+    request=None,
+    responses={
+        200: OpenApiResponse(
+            description='Nowe generacje przestrzeni nazw jednostki',
+            examples=[
+                OpenApiExample(
+                    'Sukces',
+                    value={'teryt': '1206', 'level': 'county', 'generations': {'parcel': 3, 'building': 3}}
+                )
+            ]
+        ),
+        400: OpenApiResponse(description='Nieprawidłowy kod TERYT lub rodzaj obiektów'),
+        403: OpenApiResponse(description='Brak uprawnień administratora')
+    },
+    tags=['Administracja']
+)
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def invalidate_cache(request):
+    teryt = request.query_params.get('teryt', '')
+    kind = request.query_params.get('kind')
+
+    unit_level = level(teryt)
+    if unit_level is None:
+        return Response({'error': 'Invalid TERYT code, expected WW, WWPP or WWPPGG_R'}, status=400)
+
+    if kind is not None and kind not in KINDS:
+        return Response({'error': f"Invalid kind, expected one of: {', '.join(KINDS)}"}, status=400)
+
+    generations = invalidate(teryt, [kind] if kind else KINDS)
+    return Response({'teryt': teryt, 'level': unit_level, 'generations': generations})
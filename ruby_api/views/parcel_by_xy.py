@@ -1,38 +1,69 @@
-from xml.etree import ElementTree as ET
-
 import requests
-from django.core.cache import cache
-from qgis.core import QgsVectorLayer, QgsDataSourceUri
-from rest_framework.decorators import api_view
+from adrf.decorators import api_view
 from rest_framework.response import Response
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiResponse, OpenApiExample
 
 from data.wfs_data import WFS_SERVICES
-from ruby.qgis_manager import QGISManager
-from ruby_api.utils import qvariant_to_python
+from ruby_api.bulkhead import BulkheadFull, unavailable_response
+from ruby_api.entities import (
+    PARCEL, acache_xy_response, acached_xy_response, aget_entity, entity_result, xy_entity_result
+)
+from ruby_api.hierarchy import hierarchy_extension
+from ruby_api.feature_info import afetch_point_features
+from ruby_api.county_wfs import afind_parcel
+from ruby_api.timing import span
+from ruby_api.ttl import FEATURES, apolicy
 
 
-def parse_gugik_feature_info(xml_content):
-    try:
-        root = ET.fromstring(xml_content)
-        features = []
-
-        for feature_member in root.findall('.//{http://www.opengis.net/gml}featureMember'):
-            feature_data = {}
-            for layer in feature_member:
-                for attribute in layer:
-                    name = attribute.get('Name', '')
-                    text = attribute.text or ''
-                    text = text.strip()
-                    if text and not text.startswith('<') and not text.startswith('http'):
-                        feature_data[name] = text
-
-            if feature_data:
-                features.append(feature_data)
-
-        return features
-    except Exception as e:
-        return []
+async def parcel_xy_result(x, y, epsg, features):
+    # (result, base cache TTL, parcel) for the GetFeatureInfo features at a point: no timeout when there are
+    # none, the by-ID result of the parcel when it was found with its geometry
+    if not features:
+        result = {
+            'error': 'No features found at coordinates',
+            'coordinates': {'x': x, 'y': y, 'epsg': epsg}
+        }
+        return result, None, None
+
+    parcel_id = features[0].get('Identyfikator działki', '')
+    if not parcel_id or '_' not in parcel_id:
+        result = {
+            'coordinates': {'x': x, 'y': y, 'epsg': epsg},
+            'features': features,
+            'source': 'KrajowaIntegracjaEwidencjiGruntow'
+        }
+        return result, await apolicy(FEATURES), None
+
+    teryt = parcel_id.split('_')[0][:4]
+    service = WFS_SERVICES.get(teryt)
+
+    if not service:
+        result = {
+            'coordinates': {'x': x, 'y': y, 'epsg': epsg},
+            'teryt': teryt,
+            'features': features,
+            'source': 'KrajowaIntegracjaEwidencjiGruntow',
+            'note': 'WFS service not available for geometry'
+        }
+        return result, await apolicy(FEATURES, parcel_id), None
+
+    # Fetched by either endpoint before, the parcel is cached under its ID
+    entity = await aget_entity(PARCEL, parcel_id)
+    if entity is None:
+        feature = await afind_parcel(service, parcel_id)
+        entity = entity_result(PARCEL, parcel_id, service, feature) if feature else None
+
+    if entity:
+        return xy_entity_result(PARCEL, x, y, epsg, teryt, entity), await apolicy(PARCEL, parcel_id), entity
+
+    result = {
+        'coordinates': {'x': x, 'y': y, 'epsg': epsg},
+        'teryt': teryt,
+        'features': features,
+        'source': 'KrajowaIntegracjaEwidencjiGruntow',
+        'note': 'Geometry not available from WFS'
+    }
+    return result, await apolicy(FEATURES, parcel_id), None
 
 
 @extend_schema(
@@ -72,6 +103,15 @@ def parse_gugik_feature_info(xml_content):
                 OpenApiExample('EPSG:2180 (domyślny)', value='2180'),
                 OpenApiExample('EPSG:4326 (WGS84)', value='4326'),
             ]
+        ),
+        OpenApiParameter(
+            name='include',
+            type=str,
+            location=OpenApiParameter.QUERY,
+            required=False,
+            description='Dodatkowe dane: "hierarchy" dodaje województwo, powiat, gminę i obręb odczytane z identyfikatora '
+                        '(z lokalnej kopii PRG, bez zapytań do usług zewnętrznych)',
+            enum=['hierarchy']
         )
     ],
     responses={
@@ -83,13 +123,14 @@ def parse_gugik_feature_info(xml_content):
                     value={
                         'coordinates': {'x': 500000.0, 'y': 250000.0, 'epsg': '2180'},
                         'teryt': '1206',
+                        'parcel_id': '1206_1.0001.123/1',
                         'service': {
                             'id': 'PL.PZGiK.1',
                             'organization': 'Starosta Powiatu Krakowskiego',
                             'teryt': '1206',
                             'url': 'https://wms.powiat.krakow.pl:1518/iip/ows'
                         },
-                        'parcel_id': '1206_1.0001.123/1',
+                        'layer_name': 'ms:dzialki',
                         'attributes': {
                             'ID_DZIALKI': '1206_1.0001.123/1',
                             'POWIERZCHNIA': 1234.56
@@ -121,7 +162,7 @@ def parse_gugik_feature_info(xml_content):
     tags=['Działki']
 )
 @api_view(['GET'])
-def search_parcel_by_xy(request):
+async def search_parcel_by_xy(request):
     x = request.query_params.get('x')
     y = request.query_params.get('y')
     epsg = request.query_params.get('epsg', '2180')
@@ -136,116 +177,24 @@ def search_parcel_by_xy(request):
         return Response({'error': 'Invalid coordinates'}, status=400)
 
     cache_key = f'parcel_xy_{x}_{y}_{epsg}'
-    cached_data = cache.get(cache_key)
-    if cached_data:
-        return Response(cached_data)
-
-    buffer = 50
-    width = 101
-    height = 101
-    bbox = f"{x - buffer},{y - buffer},{x + buffer},{y + buffer}"
-
-    params = {
-        'VERSION': '1.3.0',
-        'SERVICE': 'WMS',
-        'REQUEST': 'GetFeatureInfo',
-        'LAYERS': 'dzialki,budynki',
-        'QUERY_LAYERS': 'dzialki,budynki',
-        'CRS': f'EPSG:{epsg}',
-        'WIDTH': str(width),
-        'HEIGHT': str(height),
-        'I': str(width // 2),
-        'J': str(height // 2),
-        'INFO_FORMAT': 'text/xml',
-        'BBOX': bbox
-    }
-
-    url = 'https://integracja.gugik.gov.pl/cgi-bin/KrajowaIntegracjaEwidencjiGruntow'
+    extend = hierarchy_extension(request, PARCEL)
+    with span('cache'):
+        cached = await acached_xy_response(request, cache_key, x, y, epsg, extend)
+    if cached is not None:
+        return cached
 
     try:
-        response = requests.get(url, params=params, timeout=30)
-        response.raise_for_status()
-
-        features = parse_gugik_feature_info(response.content)
+        # One GetFeatureInfo for parcels and buildings, shared with the other XY endpoint
+        layers = await afetch_point_features(x, y, epsg)
+        features = [feature for features in layers.values() for feature in features]
 
-        if not features:
-            result = {
-                'error': 'No features found at coordinates',
-                'coordinates': {'x': x, 'y': y, 'epsg': epsg}
-            }
+        result, timeout, entity = await parcel_xy_result(x, y, epsg, features)
+        if timeout is None:
             return Response(result, status=404)
+        return await acache_xy_response(request, PARCEL, cache_key, result, timeout, entity, extend)
 
-        parcel_id = features[0].get('Identyfikator działki', '')
-        if not parcel_id or '_' not in parcel_id:
-            result = {
-                'coordinates': {'x': x, 'y': y, 'epsg': epsg},
-                'features': features,
-                'source': 'KrajowaIntegracjaEwidencjiGruntow'
-            }
-            cache.set(cache_key, result, timeout=1800)
-            return Response(result)
-
-        teryt = parcel_id.split('_')[0][:4]
-        service = WFS_SERVICES.get(teryt)
-
-        if not service:
-            result = {
-                'coordinates': {'x': x, 'y': y, 'epsg': epsg},
-                'teryt': teryt,
-                'features': features,
-                'source': 'KrajowaIntegracjaEwidencjiGruntow',
-                'note': 'WFS service not available for geometry'
-            }
-            cache.set(cache_key, result, timeout=1800)
-            return Response(result)
-
-        qgs = QGISManager.get_application()
-        layer_names = ['ms:dzialki', 'ewns:dzialki', 'wfs:dzialki']
-
-        for layer_name in layer_names:
-            uri = QgsDataSourceUri()
-            uri.setParam('url', service['url'])
-            uri.setParam('version', 'auto')
-            uri.setParam('typename', layer_name)
-            uri.setParam('filter', f"ID_DZIALKI='{parcel_id}'")
-            uri.setParam('ssl_verify', 'false')
-
-            layer = QgsVectorLayer(uri.uri(), f"parcel_{layer_name}", "WFS")
-
-            if layer.isValid():
-                layer_features = list(layer.getFeatures())
-
-                if layer_features:
-                    feature = layer_features[0]
-                    attributes = {field.name(): qvariant_to_python(value)
-                                  for field, value in zip(layer.fields(), feature.attributes())}
-
-                    result = {
-                        'coordinates': {'x': x, 'y': y, 'epsg': epsg},
-                        'teryt': teryt,
-                        'service': service,
-                        'parcel_id': parcel_id,
-                        'attributes': attributes,
-                        'geometry': feature.geometry().asWkt()
-                    }
-
-                    cache.set(cache_key, result, timeout=3600)
-
-                    del layer
-                    return Response(result)
-
-            del layer
-
-        result = {
-            'coordinates': {'x': x, 'y': y, 'epsg': epsg},
-            'teryt': teryt,
-            'features': features,
-            'source': 'KrajowaIntegracjaEwidencjiGruntow',
-            'note': 'Geometry not available from WFS'
-        }
-        cache.set(cache_key, result, timeout=1800)
-        return Response(result)
-
+    except BulkheadFull as e:
+        return unavailable_response(e)
     except requests.RequestException as e:
         return Response({'error': f'Request failed: {str(e)}'}, status=500)
     except Exception as e:
@@ -0,0 +1,194 @@
+import asyncio
+
+import requests
+from adrf.decorators import api_view
+from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiResponse, OpenApiExample
+from rest_framework.response import Response
+
+from ruby_api.administrative import CADASTRAL_UNIT, CITY, HIERARCHY, REGION, WMS_LAYERS, xy_unit
+from ruby_api.boundaries import afind_administrative_unit
+from ruby_api.bulkhead import BulkheadFull, unavailable_response
+from ruby_api.entities import BUILDING, PARCEL, acache_xy, layer_entities
+from ruby_api.feature_info import afetch_administrative_units, afetch_point_features, afetch_prg_units
+from ruby_api.http_cache import acached_response, acache_response
+from ruby_api.namespaces import astamps
+from ruby_api.timing import span
+from ruby_api.ttl import ADMINISTRATIVE, alearn, apolicy
+from ruby_api.views.building_by_xy import building_xy_result
+from ruby_api.views.parcel_by_xy import parcel_xy_result
+
+POINT_LEVELS = HIERARCHY + (CITY, CADASTRAL_UNIT)
+
+
+async def alocal_units(x, y, epsg):
+    # Units at the point from the local PRG snapshot: {} for a level with no unit there, None for a level it
+    # cannot tell (a snapshot refreshed from PRG WFS has no cities or cadastral units)
+    return {level: await afind_administrative_unit(level, x, y, epsg) for level in POINT_LEVELS}
+
+
+async def afetch_units(x, y, epsg):
+    # (units, complete) at the point, from PRG WMS for the levels the snapshot cannot tell: all six layers
+    # (writing the administrative XY endpoints' cache entries) when one of the hierarchy is among them, the
+    # missing ones otherwise. Not complete when PRG WMS could not be asked; those levels are then None.
+    units = await alocal_units(x, y, epsg)
+    missing = [level for level in POINT_LEVELS if units[level] is None]
+    if not missing:
+        return units, True
+    if any(level in HIERARCHY for level in missing):
+        found = await afetch_administrative_units(x, y, epsg)
+        return found or units, found is not None
+    found = await afetch_prg_units(x, y, epsg, [WMS_LAYERS[level] for level in missing])
+    if found is None:
+        return units, False
+    return {**units, **{level: found.get(WMS_LAYERS[level]) or {} for level in missing}}, True
+
+
+def _embedded(result, timeout):
+    # A single-endpoint result inside the combined one, without the repeated coordinates
+    if timeout is None:
+        return None
+    return {key: value for key, value in result.items() if key != 'coordinates'}
+
+
+@extend_schema(
+    summary="Pobierz wszystkie dane dla punktu",
+    description="Zwraca działkę, budynek oraz pełną hierarchię jednostek administracyjnych (województwo, powiat, gmina, "
+                "obręb, miasto, jednostka ewidencyjna) dla współrzędnych XY. Wykonuje jedno zapytanie GetFeatureInfo "
+                "do GUGiK i jedno do PRG WMS, równolegle, i zapisuje wyniki w cache poszczególnych endpointów XY.",
+    parameters=[
+        OpenApiParameter(
+            name='x',
+            type=float,
+            location=OpenApiParameter.QUERY,
+            required=True,
+            description='Współrzędna X',
+            examples=[
+                OpenApiExample('EPSG:2180', value=566010.0),
+                OpenApiExample('EPSG:4326', value=19.9449799),
+            ]
+        ),
+        OpenApiParameter(
+            name='y',
+            type=float,
+            location=OpenApiParameter.QUERY,
+            required=True,
+            description='Współrzędna Y',
+            examples=[
+                OpenApiExample('EPSG:2180', value=244020.0),
+                OpenApiExample('EPSG:4326', value=50.0646501),
+            ]
+        ),
+        OpenApiParameter(
+            name='epsg',
+            type=str,
+            location=OpenApiParameter.QUERY,
+            required=False,
+            description='Kod EPSG układu współrzędnych',
+            default='2180',
+            examples=[
+                OpenApiExample('EPSG:2180 (domyślny)', value='2180'),
+                OpenApiExample('EPSG:4326 (WGS84)', value='4326'),
+            ]
+        )
+    ],
+    responses={
+        200: OpenApiResponse(
+            description='Dane dla punktu',
+            examples=[
+                OpenApiExample(
+                    'Sukces',
+                    value={
+                        'coordinates': {'x': 566010.0, 'y': 244020.0, 'epsg': '2180'},
+                        'voivodeship': {'name': 'małopolskie', 'teryt': '12', 'regon': '351555662'},
+                        'county': {'name': 'powiat krakowski', 'teryt': '1206', 'regon': '351555752'},
+                        'commune': {'name': 'Mogilany', 'teryt': '120614_2', 'type': 'GM', 'regon': '351555550'},
+                        'region': {'name': 'Buków', 'teryt': '120614_2.0001'},
+                        'city': None,
+                        'cadastral_unit': {'name': 'Mogilany', 'teryt': '120614_2'},
+                        'parcel': {
+                            'teryt': '1206',
+                            'parcel_id': '120614_2.0001.123/1',
+                            'attributes': {'ID_DZIALKI': '120614_2.0001.123/1'},
+                            'geometry': 'POLYGON((...))'
+                        },
+                        'building': {
+                            'teryt': '1206',
+                            'building_id': '120614_2.0001.123/1.1_BUD',
+                            'attributes': {'ID_BUDYNKU': '120614_2.0001.123/1.1_BUD'},
+                            'geometry': 'POLYGON((...))'
+                        }
+                    }
+                )
+            ]
+        ),
+        400: OpenApiResponse(description='Nieprawidłowe współrzędne'),
+        404: OpenApiResponse(description='Nie znaleziono żadnych obiektów w podanych współrzędnych'),
+        500: OpenApiResponse(description='Błąd serwera'),
+        503: OpenApiResponse(description='Usługa źródłowa przeciążona')
+    },
+    tags=['Punkt']
+)
+@api_view(['GET'])
+async def get_point_by_xy(request):
+    x = request.query_params.get('x')
+    y = request.query_params.get('y')
+    epsg = request.query_params.get('epsg', '2180')
+
+    if not x or not y:
+        return Response({'error': 'x and y coordinates required'}, status=400)
+
+    try:
+        x = float(x)
+        y = float(y)
+    except ValueError:
+        return Response({'error': 'Invalid coordinates'}, status=400)
+
+    cache_key = f'point_xy_{x}_{y}_{epsg}'
+    with span('cache'):
+        cached = await acached_response(request, cache_key)
+    if cached is not None:
+        return cached
+
+    try:
+        gugik, (units, complete) = await asyncio.gather(afetch_point_features(x, y, epsg), afetch_units(x, y, epsg))
+
+        features = [feature for layer in gugik.values() for feature in layer]
+        (parcel, parcel_timeout, parcel_entity), (building, building_timeout, building_entity) = await asyncio.gather(
+            parcel_xy_result(x, y, epsg, features),
+            building_xy_result(x, y, epsg, gugik.get('budynki', []))
+        )
+    except BulkheadFull as e:
+        return unavailable_response(e, coordinates={'x': x, 'y': y, 'epsg': epsg})
+    except requests.RequestException as e:
+        return Response({'error': f'Request failed: {str(e)}'}, status=500)
+    except Exception as e:
+        return Response({'error': f'Error: {str(e)}'}, status=500)
+
+    result = {'coordinates': {'x': x, 'y': y, 'epsg': epsg}}
+    for level in POINT_LEVELS:
+        result[level] = xy_unit(level, units[level]) if units[level] else None
+    result['parcel'] = _embedded(parcel, parcel_timeout)
+    result['building'] = _embedded(building, building_timeout)
+
+    if not any(result[name] for name in (*POINT_LEVELS, 'parcel', 'building')):
+        return Response({'error': 'No features found at coordinates', 'coordinates': result['coordinates']},
+                        status=404)
+
+    # Fill the cache of the parcel and building XY endpoints, as each would have cached its own answer;
+    # afetch_administrative_units did the same for the administrative ones
+    writes = []
+    if parcel_timeout is not None:
+        writes.append(acache_xy(PARCEL, f'parcel_xy_{x}_{y}_{epsg}', parcel, parcel_timeout, parcel_entity))
+    if building_timeout is not None:
+        writes.append(acache_xy(BUILDING, f'building_xy_{x}_{y}_{epsg}', building, building_timeout, building_entity))
+    await asyncio.gather(*writes)
+
+    if not complete:
+        # PRG WMS failed; levels are missing, so this answer is not worth keeping
+        return Response(result)
+    administrative_timeout = await apolicy(ADMINISTRATIVE, result[REGION]['teryt'] if result[REGION] else '')
+    timeout = min(timeout for timeout in (parcel_timeout, building_timeout, administrative_timeout)
+                  if timeout is not None)
+    timeout = await alearn(cache_key, result, timeout)
+    # Dropped with the parcel and building when their unit is invalidated
+    return await acache_response(request, cache_key, result, timeout, stamps=await astamps(layer_entities(gugik)))
@@ -0,0 +1,115 @@
+import time
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+
+from ruby_api import upstream
+from ruby_api.administrative import (
+    LEVELS, PROPERTIES, RESULT_BUILDERS, VOIVODESHIP, COUNTY, COMMUNE, REGION, cache_key
+)
+from ruby_api.bulkhead import BulkheadFull
+from ruby_api.http_cache import cache_entries, meta_key
+from ruby_api.parsers import iter_wfs_features
+from ruby_api.ttl import ADMINISTRATIVE, learn_many, policy
+
+# Number of units PRG is expected to hold, for the coverage report. Obręby have no stable count.
+EXPECTED_UNITS = {VOIVODESHIP: 16, COUNTY: 380, COMMUNE: 2477}
+
+
+def page_params(layer, start, count, properties=PROPERTIES):
+    params = {
+        'SERVICE': 'WFS',
+        'VERSION': '2.0.0',
+        'REQUEST': 'GetFeature',
+        'TYPENAME': f'ms:{layer}',
+        'PROPERTYNAME': ','.join(properties or []),
+        'SORTBY': 'JPT_KOD_JE',
+        'COUNT': str(count),
+        'STARTINDEX': str(start),
+        'OUTPUTFORMAT': 'GML3'
+    }
+    if not properties:
+        # Whole features, geometry included
+        del params['PROPERTYNAME']
+    return params
+
+
+def iter_pages(layer, page_size, properties=PROPERTIES, read=None):
+    # `read` turns a whole page body into a list of features; by default the attributes are streamed
+    start = 0
+    while True:
+        params = page_params(layer, start, page_size, properties)
+        with upstream.stream(settings.PRG_WFS_URL, params=params, timeout=60) as response:
+            response.raise_for_status()
+            if read is None:
+                page = list(iter_wfs_features(response.iter_content(), layer))
+            else:
+                page = read(b''.join(response.iter_content()))
+        yield page
+        if len(page) < page_size:
+            return
+        start += page_size
+
+
+def count_cached(keys):
+    cached = 0
+    keys = list(keys)
+    for offset in range(0, len(keys), 1000):
+        cached += len(cache.get_many([meta_key(key) for key in keys[offset:offset + 1000]]))
+    return cached
+
+
+def warm_level(level, page_size):
+    started = time.perf_counter()
+    build_result = RESULT_BUILDERS[level]
+    keys = []
+    seen = set()
+    pages = 0
+    error = None
+
+    try:
+        for page in iter_pages(LEVELS[level], page_size):
+            pages += 1
+            results = {}
+            for data in page:
+                unit_id = data.get('JPT_KOD_JE')
+                key = cache_key(level, unit_id)
+                # Like the views, the first feature with a given code wins
+                if not unit_id or key in seen:
+                    continue
+                results[key] = (build_result(unit_id, data), policy(ADMINISTRATIVE, unit_id))
+                keys.append(key)
+                seen.add(key)
+            # Learned like the views' fetches, and grouped by TTL, which also depends on the region
+            entries = {}
+            for key, timeout in learn_many(results).items():
+                unit_entries, _, _ = cache_entries(key, results[key][0], timeout)
+                entries.setdefault(timeout, {}).update(unit_entries)
+            for timeout, group in entries.items():
+                cache.set_many(group, timeout=timeout)
+    except (BulkheadFull, requests.RequestException) as e:
+        error = str(e)
+
+    cached = count_cached(keys)
+    expected = EXPECTED_UNITS.get(level)
+    return {
+        'level': level,
+        'fetched': len(keys),
+        'cached': cached,
+        'expected': expected,
+        'coverage': round(cached / (expected or len(keys)), 4) if (expected or keys) else 0.0,
+        'pages': pages,
+        'duration_s': round(time.perf_counter() - started, 2),
+        'error': error,
+    }
+
+
+def warm(levels=None, page_size=None):
+    started = time.perf_counter()
+    page_size = page_size or settings.ADMINISTRATIVE_WARMUP_PAGE_SIZE
+    results = [warm_level(level, page_size) for level in (levels or LEVELS)]
+    return {
+        'levels': results,
+        'duration_s': round(time.perf_counter() - started, 2),
+    }